@@ -0,0 +1,76 @@
+"""
+Numeric kernels for semantic search
+Compiled with Numba when it is installed, plain NumPy otherwise
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # Numba not installed - use the NumPy implementation
+    njit = None
+
+
+def _top_k_representative_numpy(embeddings: np.ndarray, k: int):
+    """NumPy version of top_k_representative."""
+    doc_embedding = embeddings.mean(axis=0)
+    similarities = embeddings @ (doc_embedding / np.linalg.norm(doc_embedding))
+    return doc_embedding, np.argsort(similarities)[-k:]
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _top_k_representative_numba(embeddings, k):
+        """Numba version of top_k_representative: mean, scores and top k in one kernel."""
+        n, d = embeddings.shape
+
+        # Row by row so the sweep follows the C-contiguous layout
+        totals = np.zeros(d, dtype=np.float64)
+        for i in range(n):
+            for j in range(d):
+                totals[j] += embeddings[i, j]
+        doc_embedding = (totals / n).astype(np.float32)
+        norm = np.sqrt(np.sum(doc_embedding * doc_embedding))
+
+        similarities = np.empty(n, dtype=np.float32)
+        for i in prange(n):
+            total = 0.0
+            for j in range(d):
+                total += embeddings[i, j] * doc_embedding[j]
+            similarities[i] = total / norm
+
+        # Keep the k best rows sorted ascending, like np.argsort(...)[-k:]
+        k = min(k, n)
+        top_indices = np.empty(k, dtype=np.int64)
+        top_scores = np.empty(k, dtype=np.float32)
+        count = 0
+        for i in range(n):
+            score = similarities[i]
+            if count < k:
+                pos = count
+                while pos > 0 and top_scores[pos - 1] > score:
+                    top_scores[pos] = top_scores[pos - 1]
+                    top_indices[pos] = top_indices[pos - 1]
+                    pos -= 1
+                count += 1
+            elif score > top_scores[0]:
+                pos = 0
+                while pos + 1 < k and top_scores[pos + 1] < score:
+                    top_scores[pos] = top_scores[pos + 1]
+                    top_indices[pos] = top_indices[pos + 1]
+                    pos += 1
+            else:
+                continue
+            top_scores[pos] = score
+            top_indices[pos] = i
+
+        return doc_embedding, top_indices
+
+
+def top_k_representative(embeddings: np.ndarray, k: int):
+    """Return the mean of unit-length embeddings and the indices of the k rows most
+    similar to it, least similar first."""
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if njit is not None:
+        return _top_k_representative_numba(embeddings, k)
+    return _top_k_representative_numpy(embeddings, k)
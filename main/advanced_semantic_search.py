@@ -22,6 +22,7 @@ from django.conf import settings
 from django.core.cache import cache
 from .models import Document, DocumentChunk, Question, Answer, Citation
 from .performance_monitor import monitor_performance
+from .cache_manager import delete_cache_pattern
 
 logger = logging.getLogger(__name__)
 
@@ -552,7 +553,8 @@ class AdvancedSemanticSearchEngine:
     def clear_cache(self):
         """Clear all cached data."""
         try:
-            cache.clear()
+            delete_cache_pattern("advanced_index_*")
+            delete_cache_pattern("search_results_*")
             self.cache_hits = 0
             self.cache_misses = 0
             logger.info("Advanced search cache cleared")
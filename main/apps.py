@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        from . import signals  # noqa: F401 - registers signal handlers
+        
+        # Start periodic optimization on the first request, so only server processes run
+        # the timer (not migrate, shell, test runs or Celery workers)
+        from django.core.signals import request_started
+        from .tasks import PERIODIC_OPTIMIZATION_DISPATCH_UID, start_periodic_optimization_on_request
+        request_started.connect(start_periodic_optimization_on_request, dispatch_uid=PERIODIC_OPTIMIZATION_DISPATCH_UID)
@@ -6,12 +6,112 @@ Handles caching of analysis results, clauses, and red flags
 import hashlib
 import json
 import logging
-from typing import Dict, List, Optional, Any
-from django.core.cache import cache
+from typing import Dict, List, Optional, Any, Tuple
+from django.core.cache import cache, caches
 from django.conf import settings
 
+try:
+    from django_redis import get_redis_connection
+except ImportError:  # django-redis not installed - local memory/database cache only
+    get_redis_connection = None
+
 logger = logging.getLogger(__name__)
 
+UNLINK_BATCH_SIZE = 500
+
+def get_redis_client(alias: str = 'default'):
+    """Return the raw Redis client behind a cache alias, or None if that cache is not Redis."""
+    if get_redis_connection is None:
+        return None
+    try:
+        return get_redis_connection(alias)
+    except Exception:
+        # Raised by django-redis when the cache uses another backend
+        return None
+
+def clear_cache_nonblocking(alias: str = 'default') -> None:
+    """Clear a cache; on Redis the memory is freed in the background (FLUSHDB ASYNC)."""
+    redis_client = get_redis_client(alias)
+    if redis_client is None:
+        caches[alias].clear()
+        return
+    redis_client.flushdb(asynchronous=True)
+
+def delete_cache_pattern(pattern: str) -> None:
+    """Delete default-cache keys matching a glob pattern using SCAN + UNLINK batches."""
+    redis_client = get_redis_client()
+    if redis_client is None:
+        # Other backends cannot match keys - clear everything instead
+        cache.clear()
+        return
+    batch = []
+    for key in redis_client.scan_iter(match=cache.make_key(pattern), count=UNLINK_BATCH_SIZE):
+        batch.append(key)
+        if len(batch) >= UNLINK_BATCH_SIZE:
+            redis_client.unlink(*batch)
+            batch = []
+    if batch:
+        redis_client.unlink(*batch)
+
+# Redis sorted set of question digests scored by (decayed) ask count, plus digest -> text
+POPULAR_QUERIES_KEY = "popular_queries"
+POPULAR_QUERY_TEXTS_KEY = "popular_query_texts"
+POPULAR_QUERY_MIN_SCORE = 0.1  # decayed entries below this are dropped
+
+def record_popular_query(question_text: str) -> None:
+    """Count one ask of a question in the popular-queries sorted set."""
+    redis_client = get_redis_client()
+    if redis_client is None:
+        return
+    try:
+        digest = hashlib.blake2b(question_text.encode('utf-8'), digest_size=12).hexdigest()
+        pipe = redis_client.pipeline()
+        pipe.zincrby(POPULAR_QUERIES_KEY, 1, digest)
+        pipe.hsetnx(POPULAR_QUERY_TEXTS_KEY, digest, question_text)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Error recording popular query: {e}")
+
+def get_popular_queries(limit: int = 20) -> Optional[List[Tuple[str, float]]]:
+    """Return the top (question_text, score) pairs, or None when Redis is not available."""
+    redis_client = get_redis_client()
+    if redis_client is None:
+        return None
+    try:
+        top = redis_client.zrevrange(POPULAR_QUERIES_KEY, 0, limit - 1, withscores=True)
+        if not top:
+            return []
+        texts = redis_client.hmget(POPULAR_QUERY_TEXTS_KEY, [digest for digest, _ in top])
+        return [
+            (text.decode('utf-8'), score)
+            for (_, score), text in zip(top, texts) if text is not None
+        ]
+    except Exception as e:
+        logger.error(f"Error getting popular queries: {e}")
+        return None
+
+def decay_popular_queries(factor: float = 0.99) -> None:
+    """Age popularity scores so old questions gradually drop out of the top list."""
+    redis_client = get_redis_client()
+    if redis_client is None:
+        return
+    try:
+        redis_client.zunionstore(POPULAR_QUERIES_KEY, {POPULAR_QUERIES_KEY: factor})
+        stale = redis_client.zrangebyscore(POPULAR_QUERIES_KEY, '-inf', POPULAR_QUERY_MIN_SCORE)
+        if stale:
+            pipe = redis_client.pipeline()
+            pipe.zrem(POPULAR_QUERIES_KEY, *stale)
+            pipe.hdel(POPULAR_QUERY_TEXTS_KEY, *stale)
+            pipe.execute()
+    except Exception as e:
+        logger.error(f"Error decaying popular queries: {e}")
+
+def get_preload_cache():
+    """Return the cache for background preloads, kept apart from interactive entries."""
+    if 'preload' in getattr(settings, 'CACHES', {}):
+        return caches['preload']
+    return cache
+
 class CacheManager:
     """Manages caching for document analysis and processing results."""
     
@@ -130,7 +230,7 @@ class CacheManager:
     def clear_all_cache(cls) -> bool:
         """Clear all cache entries."""
         try:
-            cache.clear()
+            clear_cache_nonblocking()
             logger.info("Cleared all cache entries")
             return True
         except Exception as e:
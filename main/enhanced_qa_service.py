@@ -11,9 +11,10 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime
 
 from django.db import transaction, models
+from django.db.models import Prefetch
 from .models import Document, Question, Answer, Citation, DocumentChunk
 from .advanced_semantic_search import advanced_semantic_search_engine
-from .performance_optimizer import performance_optimizer, optimize_qa
+from .performance_optimizer import performance_optimizer, optimize_qa, memoize_pure
 from .performance_monitor import monitor_performance
 from .confidence_engine import confidence_analyzer, ConfidenceFactors
 from .recommendation_engine import recommendation_manager
@@ -373,7 +374,9 @@ class EnhancedQAService:
         else:
             return 'complex'
     
-    def _classify_question_type(self, question_text: str) -> str:
+    @staticmethod
+    @memoize_pure(maxsize=1024)
+    def _classify_question_type(question_text: str) -> str:
         """Classify question type based on content."""
         question_lower = question_text.lower()
         
@@ -424,7 +427,9 @@ class EnhancedQAService:
         
         return 'unknown'
     
-    def _has_legal_terms(self, text: str) -> bool:
+    @staticmethod
+    @memoize_pure(maxsize=1024)
+    def _has_legal_terms(text: str) -> bool:
         """Check if text contains legal terms."""
         legal_terms = {
             'contract', 'agreement', 'clause', 'section', 'article', 'party',
@@ -462,7 +467,7 @@ class EnhancedQAService:
             
             # Generate recommendations using recommendation engine
             recommendations = recommendation_manager.generate_comprehensive_recommendations(
-                document_text=document.extracted_text or "",
+                document_text=document.get_extracted_text(),
                 question=question,
                 answer=answer,
                 search_results=search_results,
@@ -645,9 +650,18 @@ class EnhancedQAService:
     def get_enhanced_question_history(self, document_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get enhanced question history for a document."""
         try:
+            # Load detailed answers (with citation counts) for all questions in one query
             questions = Question.objects.filter(
                 document_id=document_id
-            ).order_by('-created_at')[:limit]
+            ).order_by('-created_at').prefetch_related(
+                Prefetch(
+                    'detailed_answers',
+                    # Meta.ordering is dropped for GROUP BY queries, so repeat it here
+                    queryset=Answer.objects.annotate(
+                        citation_count=models.Count('citations')
+                    ).order_by('-confidence_score', '-created_at')
+                )
+            )[:limit]
             
             history = []
             for question in questions:
@@ -658,11 +672,12 @@ class EnhancedQAService:
                 
                 # Check for detailed answer if no direct answer
                 if not answer_text:
-                    detailed_answer = question.detailed_answers.first()
-                    if detailed_answer:
+                    detailed_answers = question.detailed_answers.all()
+                    if detailed_answers:
+                        detailed_answer = detailed_answers[0]
                         answer_text = detailed_answer.answer_text
                         confidence_score = detailed_answer.confidence_score
-                        citations_count = detailed_answer.citations.count()
+                        citations_count = detailed_answer.citation_count
                 
                 history.append({
                     'id': str(question.id),
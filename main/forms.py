@@ -1,8 +1,7 @@
 from django import forms
 from django.core.exceptions import ValidationError
 from .models import Document
-from .security import security_validator, file_upload_security
-import re
+from .security import security_validator, file_upload_security, INVALID_FILENAME_TABLE
 
 class DocumentUploadForm(forms.ModelForm):
     """Form for uploading legal documents with enhanced security validation."""
@@ -51,7 +50,7 @@ class DocumentUploadForm(forms.ModelForm):
         
         if title:
             # Basic sanitization - remove dangerous characters
-            title = re.sub(r'[<>:"/\\|?*]', '', title)
+            title = title.translate(INVALID_FILENAME_TABLE)
             title = title.strip()
         
         if not title:
@@ -62,7 +61,7 @@ class DocumentUploadForm(forms.ModelForm):
                 import os
                 filename = os.path.splitext(file.name)[0]
                 # Basic sanitization
-                filename = re.sub(r'[<>:"/\\|?*]', '', filename)
+                filename = filename.translate(INVALID_FILENAME_TABLE)
                 title = filename.strip()
         
         return title
@@ -0,0 +1,18 @@
+"""
+Middleware for request-level performance monitoring.
+"""
+
+from django.db import connection
+
+from .performance_monitor import slow_query_wrapper
+
+class SlowQueryMiddleware:
+    """Time every database query of a request and keep the slow ones for analysis."""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        # execute_wrapper works without DEBUG, unlike connection.queries
+        with connection.execute_wrapper(slow_query_wrapper):
+            return self.get_response(request)
@@ -0,0 +1,49 @@
+# Store DocumentChunk embeddings as float32 bytes instead of JSON float lists
+
+import numpy as np
+from django.db import migrations, models
+
+
+def json_to_bytes(apps, schema_editor):
+    DocumentChunk = apps.get_model('main', 'DocumentChunk')
+    for chunk in DocumentChunk.objects.exclude(embedding=[]).only('id', 'embedding').iterator():
+        chunk.embedding_bytes = np.asarray(chunk.embedding, dtype=np.float32).tobytes()
+        chunk.save(update_fields=['embedding_bytes'])
+
+
+def bytes_to_json(apps, schema_editor):
+    DocumentChunk = apps.get_model('main', 'DocumentChunk')
+    for chunk in DocumentChunk.objects.only('id', 'embedding_bytes').iterator():
+        if chunk.embedding_bytes:
+            chunk.embedding = np.frombuffer(chunk.embedding_bytes, dtype=np.float32).tolist()
+            chunk.save(update_fields=['embedding'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_answer_grounded_question_complexity_level_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentchunk',
+            name='embedding_bytes',
+            field=models.BinaryField(blank=True, default=bytes),
+        ),
+        migrations.RunPython(json_to_bytes, bytes_to_json),
+        migrations.RemoveField(
+            model_name='documentchunk',
+            name='embedding',
+        ),
+        migrations.RenameField(
+            model_name='documentchunk',
+            old_name='embedding_bytes',
+            new_name='embedding',
+        ),
+        migrations.AlterField(
+            model_name='documentchunk',
+            name='embedding',
+            field=models.BinaryField(blank=True, default=bytes, help_text='Vector embedding of the chunk as float32 bytes'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_extracted_text(apps, schema_editor):
+    Document = apps.get_model('main', 'Document')
+    DocumentContent = apps.get_model('main', 'DocumentContent')
+    for document in Document.objects.exclude(extracted_text='').only('id', 'extracted_text').iterator():
+        DocumentContent.objects.create(document=document, full_text=document.extracted_text)
+
+
+def restore_extracted_text(apps, schema_editor):
+    Document = apps.get_model('main', 'Document')
+    DocumentContent = apps.get_model('main', 'DocumentContent')
+    for content in DocumentContent.objects.iterator():
+        Document.objects.filter(pk=content.document_id).update(extracted_text=content.full_text)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_documentchunk_binary_embedding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentContent',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='content', serialize=False, to='main.document')),
+                ('full_text', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Document Content',
+                'verbose_name_plural': 'Document Contents',
+            },
+        ),
+        migrations.RunPython(copy_extracted_text, restore_extracted_text),
+        migrations.RemoveField(
+            model_name='document',
+            name='extracted_text',
+        ),
+    ]
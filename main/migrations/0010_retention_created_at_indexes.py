@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_documentcontent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['-created_at', 'id'], name='main_answer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='citation',
+            index=models.Index(fields=['-created_at', 'id'], name='main_citation_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-created_at', 'id'], name='main_question_created_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Store DocumentChunk embeddings as float16 bytes instead of float32 bytes
+
+import numpy as np
+from django.db import migrations, models
+
+
+def float32_to_float16(apps, schema_editor):
+    DocumentChunk = apps.get_model('main', 'DocumentChunk')
+    for chunk in DocumentChunk.objects.exclude(embedding=b'').only('id', 'embedding').iterator():
+        chunk.embedding = np.frombuffer(chunk.embedding, dtype=np.float32).astype(np.float16).tobytes()
+        chunk.save(update_fields=['embedding'])
+
+
+def float16_to_float32(apps, schema_editor):
+    DocumentChunk = apps.get_model('main', 'DocumentChunk')
+    for chunk in DocumentChunk.objects.exclude(embedding=b'').only('id', 'embedding').iterator():
+        chunk.embedding = np.frombuffer(chunk.embedding, dtype=np.float16).astype(np.float32).tobytes()
+        chunk.save(update_fields=['embedding'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_retention_created_at_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(float32_to_float16, float16_to_float32),
+        migrations.AlterField(
+            model_name='documentchunk',
+            name='embedding',
+            field=models.BinaryField(blank=True, default=bytes, help_text='Vector embedding of the chunk as float16 bytes'),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from typing import List, Tuple
+import numpy as np
 import uuid
 import os
 
@@ -33,8 +36,7 @@ class Document(models.Model):
     processing_completed = models.DateTimeField(null=True, blank=True)
     error_message = models.TextField(blank=True)
     
-    # Text extraction
-    extracted_text = models.TextField(blank=True)
+    # Text extraction (full text lives in DocumentContent to keep this row small)
     text_extraction_method = models.CharField(max_length=50, blank=True, help_text="OCR or direct extraction")
     
     # User session
@@ -55,6 +57,26 @@ class Document(models.Model):
     def get_file_size_mb(self):
         """Return file size in MB."""
         return round(self.file_size / (1024 * 1024), 2)
+    
+    def get_extracted_text(self) -> str:
+        """Return the extracted full text, loading it only on demand."""
+        try:
+            return self.content.full_text
+        except DocumentContent.DoesNotExist:
+            return ""
+
+class DocumentContent(models.Model):
+    """Model for storing the extracted text of a document, split out of Document."""
+    
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, primary_key=True, related_name='content')
+    full_text = models.TextField(blank=True)
+    
+    class Meta:
+        verbose_name = "Document Content"
+        verbose_name_plural = "Document Contents"
+    
+    def __str__(self):
+        return f"Content for {self.document}"
 
 class Analysis(models.Model):
     """Model for storing document analysis results."""
@@ -241,6 +263,10 @@ class Question(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Newest-first scan used by the retention cleanup
+            models.Index(fields=['-created_at', 'id'], name='main_question_created_idx'),
+        ]
         verbose_name = "Question"
         verbose_name_plural = "Questions"
     
@@ -274,6 +300,10 @@ class Answer(models.Model):
     
     class Meta:
         ordering = ['-confidence_score', '-created_at']
+        indexes = [
+            # Newest-first scan used by the retention cleanup
+            models.Index(fields=['-created_at', 'id'], name='main_answer_created_idx'),
+        ]
         verbose_name = "Answer"
         verbose_name_plural = "Answers"
     
@@ -304,6 +334,10 @@ class Citation(models.Model):
     
     class Meta:
         ordering = ['-relevance_score', 'page_number']
+        indexes = [
+            # Newest-first scan used by the retention cleanup
+            models.Index(fields=['-created_at', 'id'], name='main_citation_created_idx'),
+        ]
         verbose_name = "Citation"
         verbose_name_plural = "Citations"
     
@@ -329,6 +363,33 @@ class UserSession(models.Model):
     def __str__(self):
         return f"Session {self.session_id[:8]}..."
 
+class DocumentChunkManager(models.Manager):
+    """Manager with bulk embedding access for similarity search."""
+    
+    EMBEDDINGS_CACHE_TIMEOUT = 7200  # 2 hours
+    
+    def embeddings_matrix(self, document_id) -> Tuple[List[str], np.ndarray]:
+        """Return chunk ids and an (N, D) float32 matrix of their embeddings."""
+        queryset = self.filter(document_id=document_id)
+        # Chunk count is part of the key so re-chunking a document invalidates it
+        cache_key = f"emb:{document_id}:{queryset.count()}"
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        values = [(str(chunk_id), embedding) for chunk_id, embedding
+                  in queryset.values_list('id', 'embedding') if embedding]
+        if values:
+            ids = [chunk_id for chunk_id, _ in values]
+            # Stored as float16; widen once for the whole matrix
+            matrix = np.frombuffer(b''.join(bytes(embedding) for _, embedding in values),
+                                   dtype=np.float16).astype(np.float32).reshape(len(values), -1)
+        else:
+            ids, matrix = [], np.empty((0, 0), dtype=np.float32)
+        
+        cache.set(cache_key, (ids, matrix), self.EMBEDDINGS_CACHE_TIMEOUT)
+        return ids, matrix
+
 class DocumentChunk(models.Model):
     """Model for storing document chunks for semantic search."""
     
@@ -340,12 +401,14 @@ class DocumentChunk(models.Model):
     chunk_index = models.IntegerField()
     page_number = models.IntegerField()
     
-    # Embedding storage (as JSON for simplicity)
-    embedding = models.JSONField(default=list, help_text="Vector embedding of the chunk")
+    # Embedding storage (raw float16 bytes - see encode_embedding/get_embedding)
+    embedding = models.BinaryField(default=bytes, blank=True, help_text="Vector embedding of the chunk as float16 bytes")
     
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = DocumentChunkManager()
+    
     class Meta:
         ordering = ['page_number', 'chunk_index']
         unique_together = ['document', 'chunk_index']
@@ -354,3 +417,13 @@ class DocumentChunk(models.Model):
     
     def __str__(self):
         return f"Chunk {self.chunk_index} (Page {self.page_number})"
+    
+    @staticmethod
+    def encode_embedding(vector) -> bytes:
+        """Serialize an embedding vector to contiguous float16 bytes."""
+        # Embeddings are unit length, well within float16 range and precision
+        return np.asarray(vector, dtype=np.float16).tobytes()
+    
+    def get_embedding(self) -> np.ndarray:
+        """Return the stored embedding as a float32 array."""
+        return np.frombuffer(self.embedding, dtype=np.float16).astype(np.float32)
@@ -15,6 +15,9 @@ import tempfile
 
 logger = logging.getLogger(__name__)
 
+# Words that suggest a page is a scanned image (also matches "scanned", "images", ...)
+_SCAN_RE = re.compile(r'\b(?:image|scan|photograph|picture)', re.IGNORECASE)
+
 class PDFProcessor:
     """Handles PDF text extraction and OCR processing."""
     
@@ -53,10 +56,11 @@ class PDFProcessor:
             logger.error(f"Error extracting text from page {page_num}: {e}")
             return ""
     
-    def is_page_scanned(self, page_num: int) -> bool:
-        """Check if a page is scanned (image-based)."""
+    def is_page_scanned(self, page_num: int, text: Optional[str] = None) -> bool:
+        """Check if a page is scanned (image-based), from its extracted text when given."""
         try:
-            text = self.extract_text_from_page(page_num)
+            if text is None:
+                text = self.extract_text_from_page(page_num)
             # If very little text is extracted, it's likely scanned
             # Also check for common patterns that indicate scanned documents
             if len(text) < 50:
@@ -68,9 +72,7 @@ class PDFProcessor:
                 return True
             
             # Check for common scanned document indicators
-            scanned_indicators = ['image', 'scan', 'photograph', 'picture']
-            text_lower = text.lower()
-            if any(indicator in text_lower for indicator in scanned_indicators):
+            if _SCAN_RE.search(text):
                 return True
                 
             return False
@@ -137,13 +139,14 @@ class PDFProcessor:
                     "extraction_method": "text"
                 }
                 
+                # Extract the text layer once, it both decides and supplies text pages
+                text = self.extract_text_from_page(page_num)
+                
                 # Check if page is scanned
-                if self.is_page_scanned(page_num):
+                if self.is_page_scanned(page_num, text):
                     page_info["is_scanned"] = True
                     page_info["extraction_method"] = "ocr"
                     text = self.extract_text_with_ocr(page_num)
-                else:
-                    text = self.extract_text_from_page(page_num)
                 
                 page_info["text"] = text
                 result["pages"].append(page_info)
@@ -8,6 +8,7 @@ import psutil
 import logging
 from typing import Dict, Any, Optional, Callable, List
 from functools import wraps
+from collections import deque
 from datetime import datetime, timedelta
 from django.conf import settings
 
@@ -152,6 +153,20 @@ def track_performance(operation_name: str):
 # Add track_performance method to PerformanceMonitor class
 PerformanceMonitor.track_performance = track_performance
 
+# Slow queries captured by SlowQueryMiddleware, drained by the performance optimizer
+SLOW_QUERY_THRESHOLD = 3.0  # seconds
+captured_slow_queries = deque(maxlen=500)
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    """Database execute wrapper that records queries slower than SLOW_QUERY_THRESHOLD."""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        if elapsed > SLOW_QUERY_THRESHOLD:
+            captured_slow_queries.append({'sql': sql, 'time': elapsed, 'count': 1})
+
 # Utility functions for common performance checks
 def check_memory_usage() -> Dict[str, Any]:
     """Check current memory usage."""
@@ -6,38 +6,188 @@ Week 12: Performance Optimization Implementation
 
 import logging
 import time
+import hashlib
+import inspect
+import uuid
 import psutil
 import threading
+import numpy as np
 from typing import Dict, Any, List, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps, lru_cache
-from collections import defaultdict, OrderedDict
+from collections import defaultdict, deque, OrderedDict, Counter
 from datetime import datetime, timedelta
 import json
-import pickle
+import re
+import struct
+import unicodedata
+import sqlparse
 
 from django.conf import settings
 from django.core.cache import cache
-from django.db import connection, reset_queries
+from django.db import connection, reset_queries, transaction
+from django.utils import timezone
 from django.db.models import Q, Count, Avg
 from django.core.paginator import Paginator
 
-from .models import Document, DocumentChunk, Question, Answer, Citation
-from .performance_monitor import monitor_performance, performance_monitor
+from .models import Document, DocumentChunk, Question, Answer, Citation, Analysis
+from .performance_monitor import monitor_performance, performance_monitor, captured_slow_queries
 from .advanced_semantic_search import advanced_semantic_search_engine
+from .cache_manager import get_redis_client, get_preload_cache, clear_cache_nonblocking, get_popular_queries, decay_popular_queries
 
 logger = logging.getLogger(__name__)
 
+# Literal values stripped from SQL so repeated statements share one digest
+_SQL_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_SQL_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SQL_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def _normalize_sql(sql: str) -> str:
+    """Replace literals in SQL with placeholders, like pg_stat_statements does."""
+    sql = sqlparse.format(sql, strip_comments=True)
+    sql = _SQL_STRING_RE.sub('?', sql)
+    sql = _SQL_NUMBER_RE.sub('?', sql)
+    sql = _SQL_IN_LIST_RE.sub('(...)', sql)
+    return _WHITESPACE_RE.sub(' ', sql).strip()
+
+def _canonicalize_query(query: str) -> str:
+    """Normalize case, whitespace and Unicode form so equivalent queries share a key."""
+    return unicodedata.normalize('NFKC', _WHITESPACE_RE.sub(' ', query.strip().lower()))
+
+def _query_digest(query: str) -> str:
+    """Content-addressed digest of a canonicalized query."""
+    return hashlib.blake2b(_canonicalize_query(query).encode('utf-8'), digest_size=12).hexdigest()
+
+def _stable_digest(*parts) -> str:
+    """Hash parts into a cache-key digest that is stable across processes and restarts."""
+    # Unlike hash(), this is not salted per process; sort_keys canonicalizes nested dicts
+    payload = json.dumps(parts, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+# Compact search cache entry: header (result count, score scale), then one record per result
+# holding the chunk UUID, int8 score, int8 quality inputs and a search-method index
+_SEARCH_CACHE_HEADER = struct.Struct('<Hf')
+_SEARCH_CACHE_RECORD = struct.Struct('<16sbbbbB')
+_SEARCH_METHODS = ('bi_encoder', 'hybrid', 'cross_encoder_reranked')
+
+def _quantize(value: float, scale: float) -> int:
+    """Quantize value in [-scale, scale] to a signed int8."""
+    return max(-127, min(127, round(float(value) / scale * 127)))
+
+def _pack_search_results(results: List[Dict[str, Any]]) -> bytes:
+    """Pack search results into int8-quantized (chunk id, score) records for caching."""
+    # Cross-encoder scores are unbounded logits, so scores are quantized against their max
+    scale = max((abs(float(r['similarity_score'])) for r in results), default=0.0) or 1.0
+    records = [_SEARCH_CACHE_HEADER.pack(len(results), scale)]
+    for result in results:
+        relevance = result.get('relevance_indicators') or {}
+        method = result.get('search_method')
+        records.append(_SEARCH_CACHE_RECORD.pack(
+            uuid.UUID(str(result['chunk_id'])).bytes,
+            _quantize(result['similarity_score'], scale),
+            _quantize(relevance.get('overlap_ratio', 0.0), 1.0),
+            _quantize(relevance.get('semantic_similarity', 0.0), 1.0),
+            _quantize(result.get('semantic_coherence', 0.5), 1.0),
+            _SEARCH_METHODS.index(method) if method in _SEARCH_METHODS else 0,
+        ))
+    return b''.join(records)
+
+def _unpack_search_results(packed: bytes) -> Optional[List[Dict[str, Any]]]:
+    """
+    Rebuild search results from a packed cache entry, loading chunk text in one query.
+    
+    Only the packed fields come back: chunk id, text, page, index and word count, the
+    score, search method, semantic coherence and the overlap_ratio/semantic_similarity
+    relevance indicators. Fresh results also carry key_phrases, context_window,
+    confidence_factors and the other relevance indicators.
+    
+    Returns:
+        The results, or None when a cited chunk no longer exists (treat as a cache miss)
+    """
+    count, scale = _SEARCH_CACHE_HEADER.unpack_from(packed)
+    records = [
+        _SEARCH_CACHE_RECORD.unpack_from(packed, _SEARCH_CACHE_HEADER.size + i * _SEARCH_CACHE_RECORD.size)
+        for i in range(count)
+    ]
+    # Without the embedding column, like search_similar_chunks
+    chunks = DocumentChunk.objects.only(
+        'id', 'chunk_text', 'page_number', 'chunk_index'
+    ).in_bulk([uuid.UUID(bytes=record[0]) for record in records])
+    
+    results = []
+    for chunk_id, score, overlap, semantic, coherence, method in records:
+        chunk = chunks.get(uuid.UUID(bytes=chunk_id))
+        if chunk is None:
+            return None  # Chunk deleted since the entry was cached
+        results.append({
+            'chunk_id': str(chunk.id),
+            'chunk_text': chunk.chunk_text,
+            'page_number': chunk.page_number,
+            'chunk_index': chunk.chunk_index,
+            'word_count': len(chunk.chunk_text.split()),
+            'similarity_score': score * scale / 127,
+            'search_method': _SEARCH_METHODS[method],
+            'relevance_indicators': {
+                'overlap_ratio': overlap / 127,
+                'semantic_similarity': semantic / 127,
+            },
+            'semantic_coherence': coherence / 127,
+        })
+    return results
+
 class PerformanceOptimizer:
     """Advanced performance optimization system."""
     
+    __slots__ = (
+        '_stats_lock', 'cache_stats', 'request_counts', 'sizing_window_start',
+        '_slow_query_digest', '_slow_query_samples', 'query_stats', 'optimization_stats',
+        'performance_alerts', '_system_snapshot', '_system_snapshot_time', '_search_executor',
+        '_metrics_local', 'cache_config', 'thresholds', '_preload_window',
+    )
+    
+    MAX_TRACKED_KEYS = 1000      # Per-namespace bound on distinct keys counted for sizing
+    MIN_SIZING_REQUESTS = 50     # Requests needed before a namespace timeout is re-derived
+    MIN_CACHE_TIMEOUT = 300      # 5 minutes
+    MAX_CACHE_TIMEOUT = 7200     # 2 hours
+    SYSTEM_SNAPSHOT_TTL = 5      # seconds to reuse psutil readings
+    SEARCH_WORKERS = 8           # concurrent searches per process
+    MAX_SLOW_QUERY_DIGESTS = 1000  # distinct slow statements tracked
+    PRELOAD_MIN_EPR = 0.2        # effective prefetch ratio below which preloading stops
+    PRELOAD_MIN_SAMPLES = 100    # preloads written in the window before the ratio is trusted
+    PRELOAD_WINDOW_TICKS = 12    # optimization ticks the prefetch ratio is measured over
+    PRELOAD_MAX_SEARCHES = 20    # searches run per preload tick
+    PRELOAD_SEARCH_TOP_K = 8     # top_k of the searches EnhancedQAService runs
+    
     def __init__(self):
         """Initialize the performance optimizer."""
-        self.cache_stats = defaultdict(int)
+        # Counters are updated from request threads and read by metrics/optimization tasks
+        self._stats_lock = threading.Lock()
+        self.cache_stats = Counter()
+        self.request_counts = defaultdict(Counter)
+        self.sizing_window_start = time.time()
+        
+        # Total seconds spent per normalized slow statement, plus one example of each
+        self._slow_query_digest = Counter()
+        self._slow_query_samples = {}
         self.query_stats = defaultdict(int)
         self.optimization_stats = defaultdict(int)
         self.performance_alerts = []
-        self.optimization_thread = None
-        self.is_running = False
+        self._system_snapshot = None
+        self._system_snapshot_time = 0.0
+        self._search_executor = ThreadPoolExecutor(
+            max_workers=self.SEARCH_WORKERS,
+            thread_name_prefix='search-optimizer'
+        )
+        
+        # Per-thread metrics dict reused by get_performance_metrics
+        self._metrics_local = threading.local()
+        
+        # (preload_writes, preload_hits) totals at each of the last optimization ticks
+        self._preload_window = deque(maxlen=self.PRELOAD_WINDOW_TICKS + 1)
+        
+        # Prime psutil so later non-blocking cpu_percent() calls return a real delta
+        psutil.cpu_percent(interval=None)
         
         # Cache configuration
         self.cache_config = {
@@ -46,6 +196,7 @@ class PerformanceOptimizer:
             'embeddings': 7200,         # 2 hours
             'qa_results': 900,          # 15 minutes
             'statistics': 300,          # 5 minutes
+            'preload': 300,             # 5 minutes - unread preloads expire quickly
         }
         
         # Performance thresholds
@@ -56,159 +207,272 @@ class PerformanceOptimizer:
             'min_cache_hit_rate': 0.7,  # 70%
             'max_database_queries': 50,  # per request
         }
-        
-        # Start background optimization
-        self._start_background_optimization()
-    
-    def _start_background_optimization(self):
-        """Start background optimization thread."""
-        try:
-            self.is_running = True
-            self.optimization_thread = threading.Thread(
-                target=self._background_optimization_loop,
-                daemon=True
-            )
-            self.optimization_thread.start()
-            logger.info("Background performance optimization started")
-        except Exception as e:
-            logger.error(f"Error starting background optimization: {e}")
-    
-    def _background_optimization_loop(self):
-        """Background optimization loop."""
-        while self.is_running:
-            try:
-                # Run optimization tasks
-                self._optimize_cache()
-                self._optimize_database()
-                self._check_system_health()
-                self._cleanup_old_data()
-                
-                # Sleep for 5 minutes
-                time.sleep(300)
-                
-            except Exception as e:
-                logger.error(f"Error in background optimization: {e}")
-                time.sleep(60)  # Sleep for 1 minute on error
     
     @monitor_performance("cache_optimization")
     def _optimize_cache(self):
         """Optimize cache performance."""
         try:
-            # Analyze cache hit rates
-            total_requests = self.cache_stats['hits'] + self.cache_stats['misses']
+            # Analyze cache hit rates (expiry and eviction are handled by the cache backend)
+            hits, misses = self._get_cache_hit_counts()
+            total_requests = hits + misses
             if total_requests > 0:
-                hit_rate = self.cache_stats['hits'] / total_requests
+                hit_rate = hits / total_requests
                 
                 if hit_rate < self.thresholds['min_cache_hit_rate']:
                     logger.warning(f"Low cache hit rate: {hit_rate:.2%}")
-                    self._adjust_cache_strategy()
             
-            # Preload frequently accessed data
-            self._preload_frequent_data()
+            # Age question popularity so the top list follows recent usage
+            decay_popular_queries()
             
-            # Clear expired cache entries
-            self._clear_expired_cache()
+            # Preload frequently accessed data while preloads keep getting used
+            stats = self.get_shared_stats('preload_writes', 'preload_hits')
+            self._preload_window.append((stats['preload_writes'], stats['preload_hits']))
+            if self._preload_is_effective():
+                self._preload_frequent_data()
             
         except Exception as e:
             logger.error(f"Error optimizing cache: {e}")
     
-    def _adjust_cache_strategy(self):
-        """Adjust cache strategy based on performance."""
+    def _get_cache_hit_counts(self) -> tuple:
+        """Get cache hits and misses, from Redis keyspace stats when available."""
+        redis_client = get_redis_client()
+        if redis_client is not None:
+            stats = redis_client.info('stats')
+            return stats['keyspace_hits'], stats['keyspace_misses']
+        stats = self.get_cache_stats()
+        return stats['hits'], stats['misses']
+    
+    def _count(self, stat: str, amount: int = 1):
+        """Increment a cache statistic without losing concurrent updates."""
+        with self._stats_lock:
+            self.cache_stats[stat] += amount
+    
+    def get_cache_stats(self) -> Dict[str, int]:
+        """Return a consistent snapshot of the cache statistics."""
+        with self._stats_lock:
+            return Counter(self.cache_stats)
+    
+    def _count_shared(self, stat: str, amount: int = 1):
+        """Increment a statistic shared by all processes through the default cache."""
+        cache_key = f"stats:{stat}"
         try:
-            # Increase cache timeouts for frequently accessed data
-            for key, timeout in self.cache_config.items():
-                if self.cache_stats[f'{key}_hits'] > self.cache_stats[f'{key}_misses']:
-                    self.cache_config[key] = min(timeout * 1.5, 7200)  # Max 2 hours
-                else:
-                    self.cache_config[key] = max(timeout * 0.8, 300)   # Min 5 minutes
-            
-            logger.info("Cache strategy adjusted based on hit rates")
+            cache.add(cache_key, 0, timeout=None)
+            cache.incr(cache_key, amount)
+        except Exception as e:
+            logger.error(f"Error counting {stat}: {e}")
+    
+    def get_shared_stats(self, *stats: str) -> Dict[str, int]:
+        """Return statistics counted by _count_shared across all processes."""
+        values = cache.get_many([f"stats:{stat}" for stat in stats])
+        return {stat: values.get(f"stats:{stat}", 0) for stat in stats}
+    
+    def _get_cached(self, namespace: str, cache_key: str) -> Any:
+        """Look up a cache entry, promoting it out of the preload cache on a hit there."""
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        preload_cache = get_preload_cache()
+        if preload_cache is cache:
+            return None
+        
+        cached = preload_cache.get(cache_key)
+        if cached is not None:
+            # Second reference: move the entry into the interactive cache with the full timeout
+            cache.set(cache_key, cached, timeout=self.cache_config[namespace])
+            preload_cache.delete(cache_key)
+            # Preloads are written by the optimization task, possibly in another process
+            self._count_shared('preload_hits')
+        return cached
+    
+    def _get_preload_window_counts(self) -> tuple:
+        """Preloads written and used over the last PRELOAD_WINDOW_TICKS ticks."""
+        if len(self._preload_window) < 2:
+            return 0, 0
+        (first_writes, first_hits), (last_writes, last_hits) = self._preload_window[0], self._preload_window[-1]
+        if last_writes < first_writes:
+            # Statistics were reset - start a new window
+            self._preload_window.clear()
+            return 0, 0
+        return last_writes - first_writes, last_hits - first_hits
+    
+    def _get_preload_epr(self) -> Optional[float]:
+        """Effective prefetch ratio over the window: preloads later used / preloads written."""
+        writes, hits = self._get_preload_window_counts()
+        if writes == 0:
+            return None
+        return hits / writes
+    
+    def _preload_is_effective(self) -> bool:
+        """Check whether preloading is paying for itself."""
+        # Once preloading stops, the window drains and preloading is tried again
+        writes, _ = self._get_preload_window_counts()
+        if writes < self.PRELOAD_MIN_SAMPLES:
+            return True
+        epr = self._get_preload_epr()
+        if epr < self.PRELOAD_MIN_EPR:
+            logger.info(f"Preloading disabled: only {epr:.0%} of preloaded entries were used")
+            return False
+        return True
+    
+    def _record_cache_request(self, namespace: str, cache_key: str):
+        """Count a cache lookup for per-namespace timeout sizing."""
+        with self._stats_lock:
+            counter = self.request_counts[namespace]
+            counter[cache_key] += 1
+            if len(counter) > self.MAX_TRACKED_KEYS:
+                # Keep the most popular half so tracking memory stays bounded
+                self.request_counts[namespace] = Counter(dict(counter.most_common(self.MAX_TRACKED_KEYS // 2)))
+    
+    @staticmethod
+    def _che_hit_rate(probabilities: np.ndarray, characteristic_time: float) -> float:
+        """Che's approximation of LRU hit rate for a given characteristic time (in requests)."""
+        return float(np.sum(probabilities * -np.expm1(-probabilities * characteristic_time)))
+    
+    @classmethod
+    def _solve_characteristic_time(cls, probabilities: np.ndarray, target_hit_rate: float, max_time: float) -> float:
+        """Bisect for the smallest characteristic time reaching the target hit rate."""
+        if cls._che_hit_rate(probabilities, max_time) < target_hit_rate:
+            return max_time
+        low, high = 0.0, max_time
+        for _ in range(50):
+            mid = (low + high) / 2
+            if cls._che_hit_rate(probabilities, mid) < target_hit_rate:
+                low = mid
+            else:
+                high = mid
+        return high
+    
+    def _size_cache_timeouts(self):
+        """Set each namespace timeout to the shortest one meeting min_cache_hit_rate."""
+        try:
+            # Take the current window and start a fresh one
+            with self._stats_lock:
+                request_counts = self.request_counts
+                elapsed = time.time() - self.sizing_window_start
+                self.request_counts = defaultdict(Counter)
+                self.sizing_window_start = time.time()
+            
+            if elapsed <= 0:
+                return
+            
+            for namespace, counter in request_counts.items():
+                total_requests = sum(counter.values())
+                if namespace not in self.cache_config or total_requests < self.MIN_SIZING_REQUESTS:
+                    continue
+                
+                probabilities = np.fromiter(counter.values(), dtype=float) / total_requests
+                request_rate = total_requests / elapsed  # requests per second
+                
+                characteristic_time = self._solve_characteristic_time(
+                    probabilities,
+                    self.thresholds['min_cache_hit_rate'],
+                    max_time=self.MAX_CACHE_TIMEOUT * request_rate
+                )
+                timeout = characteristic_time / request_rate
+                self.cache_config[namespace] = int(min(max(timeout, self.MIN_CACHE_TIMEOUT), self.MAX_CACHE_TIMEOUT))
+                logger.info(f"Cache timeout for {namespace} set to {self.cache_config[namespace]}s")
             
         except Exception as e:
-            logger.error(f"Error adjusting cache strategy: {e}")
+            logger.error(f"Error sizing cache timeouts: {e}")
     
     def _preload_frequent_data(self):
-        """Preload frequently accessed data into cache."""
+        """Preload search results for popular questions on the documents they were asked about."""
         try:
-            # Preload recent documents
-            recent_documents = Document.objects.filter(
-                uploaded_at__gte=datetime.now() - timedelta(days=7)
-            ).order_by('-uploaded_at')[:10]
-            
-            for document in recent_documents:
-                cache_key = f"document_analysis_{document.id}"
-                if not cache.get(cache_key):
-                    # Preload document analysis
-                    self._preload_document_analysis(document)
-            
-            # Preload popular search queries
-            popular_queries = Question.objects.values('question_text').annotate(
-                count=Count('id')
-            ).order_by('-count')[:20]
+            # Popular questions (Redis sorted set, GROUP BY fallback without Redis)
+            popular_queries = get_popular_queries(20)
+            if popular_queries is None:
+                popular_queries = Question.objects.values_list('question_text').annotate(
+                    count=Count('id')
+                ).order_by('-count')[:20]
+            popular_texts = [query_text for query_text, _ in popular_queries]
+            if not popular_texts:
+                return
+            
+            # Recent documents each question was asked about
+            pairs = list(Question.objects.filter(
+                question_text__in=popular_texts,
+                created_at__gte=timezone.now() - timedelta(days=7)
+            ).values_list('document_id', 'question_text').distinct()[:self.PRELOAD_MAX_SEARCHES])
+            
+            # Same keys optimize_search_query looks up, so a later ask is served from the preload
+            top_k = self.PRELOAD_SEARCH_TOP_K
+            queries_by_key = {
+                f"search:{document_id}:{_query_digest(query_text)}:{top_k}": (document_id, query_text)
+                for document_id, query_text in pairs
+            }
             
-            for query_data in popular_queries:
-                query_text = query_data['question_text']
-                cache_key = f"popular_query_{hash(query_text)}"
-                if not cache.get(cache_key):
-                    cache.set(cache_key, query_text, timeout=3600)
+            # Preloads go to a separate cache so they never evict interactive entries
+            preload_cache = get_preload_cache()
+            cached = set(cache.get_many(list(queries_by_key)))
+            if preload_cache is not cache:
+                cached.update(preload_cache.get_many(list(queries_by_key)))
+            pending = {key: value for key, value in queries_by_key.items() if key not in cached}
+            if not pending:
+                return
+            
+            documents = Document.objects.in_bulk({document_id for document_id, _ in pending.values()})
+            to_set = {}
+            for cache_key, (document_id, query_text) in pending.items():
+                document = documents.get(document_id)
+                if document is None:
+                    continue
+                results = advanced_semantic_search_engine.advanced_search(
+                    query_text, document, top_k, use_reranking=True, use_hybrid=True
+                )
+                if results:
+                    to_set[cache_key] = _pack_search_results(results)
+            
+            if to_set:
+                preload_cache.set_many(to_set, timeout=self.cache_config['preload'])
+                self._count_shared('preload_writes', len(to_set))
             
         except Exception as e:
             logger.error(f"Error preloading frequent data: {e}")
     
+    @staticmethod
+    def _analysis_cache_data(analysis: Analysis) -> Dict[str, Any]:
+        """Build the cached representation of an analysis."""
+        return {
+            'summary': analysis.summary,
+            'total_words': analysis.total_words,
+            'complexity_level': analysis.complexity_level,
+            'legal_terms_found': analysis.legal_terms_found,
+            'created_at': analysis.created_at.isoformat()
+        }
+    
     def _preload_document_analysis(self, document: Document):
         """Preload document analysis data."""
         try:
             # Get document analysis
             analysis = document.analyses.first()
             if analysis:
-                analysis_data = {
-                    'summary': analysis.summary,
-                    'total_words': analysis.total_words,
-                    'complexity_level': analysis.complexity_level,
-                    'legal_terms_found': analysis.legal_terms_found,
-                    'created_at': analysis.created_at.isoformat()
-                }
-                
                 cache_key = f"document_analysis_{document.id}"
-                cache.set(cache_key, analysis_data, timeout=self.cache_config['document_analysis'])
+                get_preload_cache().set(cache_key, self._analysis_cache_data(analysis), timeout=self.cache_config['preload'])
                 
         except Exception as e:
             logger.error(f"Error preloading document analysis: {e}")
     
-    def _clear_expired_cache(self):
-        """Clear expired cache entries."""
+    @monitor_performance("process_optimization")
+    def _optimize_process(self):
+        """Run the optimization passes that need this process's own request data."""
         try:
-            # This is a simplified version - in production, you'd use Redis TTL
-            # For now, we'll just clear old cache keys
-            old_keys = []
-            
-            # Clear old search results
-            for key in cache._cache.keys():
-                if key.startswith('search_results_') and len(key) > 50:
-                    old_keys.append(key)
-            
-            # Clear old embeddings
-            for key in cache._cache.keys():
-                if key.startswith('embeddings_') and len(key) > 50:
-                    old_keys.append(key)
-            
-            # Delete old keys (limit to avoid blocking)
-            for key in old_keys[:100]:
-                cache.delete(key)
-                
+            # Re-derive namespace timeouts from the requests this process served
+            self._size_cache_timeouts()
+            
+            # Analyze slow queries captured by this process's middleware
+            slow_queries = self._analyze_slow_queries()
+            if slow_queries:
+                logger.warning(f"Found {len(slow_queries)} slow queries")
+                self._optimize_slow_queries(slow_queries)
+            
         except Exception as e:
-            logger.error(f"Error clearing expired cache: {e}")
+            logger.error(f"Error optimizing process: {e}")
     
     @monitor_performance("database_optimization")
     def _optimize_database(self):
         """Optimize database performance."""
         try:
-            # Analyze slow queries
-            slow_queries = self._analyze_slow_queries()
-            if slow_queries:
-                logger.warning(f"Found {len(slow_queries)} slow queries")
-                self._optimize_slow_queries(slow_queries)
-            
             # Optimize indexes
             self._optimize_indexes()
             
@@ -223,15 +487,14 @@ class PerformanceOptimizer:
         try:
             slow_queries = []
             
-            # Get query statistics from Django
-            if hasattr(settings, 'DEBUG') and settings.DEBUG:
-                for query in connection.queries:
-                    if float(query['time']) > self.thresholds['max_query_time']:
-                        slow_queries.append({
-                            'sql': query['sql'],
-                            'time': float(query['time']),
-                            'count': 1
-                        })
+            # Drain queries recorded by SlowQueryMiddleware since the last run
+            while captured_slow_queries:
+                try:
+                    query = captured_slow_queries.popleft()
+                except IndexError:
+                    break
+                if query['time'] > self.thresholds['max_query_time']:
+                    slow_queries.append(query)
             
             return slow_queries
             
@@ -240,22 +503,39 @@ class PerformanceOptimizer:
             return []
     
     def _optimize_slow_queries(self, slow_queries: List[Dict[str, Any]]):
-        """Optimize slow queries."""
+        """Accumulate time per normalized slow statement to find repeat offenders."""
         try:
             for query_data in slow_queries:
-                sql = query_data['sql']
+                normalized_sql = _normalize_sql(query_data['sql'])
+                digest = hashlib.blake2b(normalized_sql.encode('utf-8'), digest_size=8).hexdigest()
                 
-                # Add caching for frequently slow queries
-                if 'SELECT' in sql.upper() and 'Document' in sql:
-                    cache_key = f"slow_query_{hash(sql)}"
-                    cache.set(cache_key, sql, timeout=3600)
+                with self._stats_lock:
+                    self._slow_query_digest[digest] += query_data['time']
+                    self._slow_query_samples.setdefault(digest, normalized_sql[:500])
+                    
+                    if len(self._slow_query_digest) > self.MAX_SLOW_QUERY_DIGESTS:
+                        # Keep the worst half so tracking memory stays bounded
+                        self._slow_query_digest = Counter(dict(
+                            self._slow_query_digest.most_common(self.MAX_SLOW_QUERY_DIGESTS // 2)
+                        ))
+                        self._slow_query_samples = {
+                            key: self._slow_query_samples[key] for key in self._slow_query_digest
+                        }
                 
                 # Log optimization suggestions
-                logger.info(f"Slow query detected: {sql[:100]}... (Time: {query_data['time']:.3f}s)")
+                logger.info(f"Slow query detected: {normalized_sql[:100]}... (Time: {query_data['time']:.3f}s)")
                 
         except Exception as e:
             logger.error(f"Error optimizing slow queries: {e}")
     
+    def get_slow_query_stats(self, top_k: int = 10) -> List[Dict[str, Any]]:
+        """Return the statements with the most accumulated slow-query time."""
+        with self._stats_lock:
+            return [
+                {'digest': digest, 'total_time': total_time, 'sql': self._slow_query_samples.get(digest, '')}
+                for digest, total_time in self._slow_query_digest.most_common(top_k)
+            ]
+    
     def _optimize_indexes(self):
         """Optimize database indexes."""
         try:
@@ -269,37 +549,88 @@ class PerformanceOptimizer:
     def _cleanup_old_data(self):
         """Clean up old data to improve performance."""
         try:
-            # Clean up old questions (keep last 1000)
-            old_questions = Question.objects.order_by('-created_at')[1000:]
-            if old_questions.exists():
-                count = old_questions.count()
-                old_questions.delete()
-                logger.info(f"Cleaned up {count} old questions")
-            
-            # Clean up old answers (keep last 1000)
-            old_answers = Answer.objects.order_by('-created_at')[1000:]
-            if old_answers.exists():
-                count = old_answers.count()
-                old_answers.delete()
-                logger.info(f"Cleaned up {count} old answers")
-            
-            # Clean up old citations (keep last 2000)
-            old_citations = Citation.objects.order_by('-created_at')[2000:]
-            if old_citations.exists():
-                count = old_citations.count()
-                old_citations.delete()
-                logger.info(f"Cleaned up {count} old citations")
+            # Keep last 2000 citations, 1000 answers and 1000 questions. Each table's cutoff
+            # is the created_at of the oldest row it keeps (served by the created_at index)
+            cutoffs = {}
+            for model, keep in ((Citation, 2000), (Answer, 1000), (Question, 1000)):
+                cutoff = list(
+                    model.objects.order_by('-created_at', '-id').values_list('created_at', flat=True)[keep - 1:keep]
+                )
+                cutoffs[model] = connection.ops.adapt_datetimefield_value(cutoff[0]) if cutoff else None
+            
+            # Rows are deleted server-side, children first, since raw SQL bypasses the ORM
+            # cascade: an answer also goes with its question, a citation with its answer
+            question_where, question_params = self._retention_condition(cutoffs[Question])
+            answer_where, answer_params = self._retention_condition(
+                cutoffs[Answer], Answer._meta.get_field('question'), question_where, question_params
+            )
+            citation_where, citation_params = self._retention_condition(
+                cutoffs[Citation], Citation._meta.get_field('answer'), answer_where, answer_params
+            )
+            
+            with transaction.atomic(), connection.cursor() as cursor:
+                for label, model, where, params in (
+                    ('citations', Citation, citation_where, citation_params),
+                    ('answers', Answer, answer_where, answer_params),
+                    ('questions', Question, question_where, question_params),
+                ):
+                    if not where:
+                        continue
+                    cursor.execute(
+                        f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)} WHERE {where}", params
+                    )
+                    if cursor.rowcount:
+                        logger.info(f"Cleaned up {cursor.rowcount} old {label}")
             
         except Exception as e:
             logger.error(f"Error cleaning up old data: {e}")
     
+    @staticmethod
+    def _retention_condition(cutoff, parent_field=None, parent_where: str = '', parent_params=()):
+        """
+        Build the SQL condition selecting rows to delete: rows created before the cutoff,
+        plus rows whose parent (through parent_field) matches parent_where.
+        
+        Returns:
+            (condition, params); the condition is empty when no rows need deleting
+        """
+        quote_name = connection.ops.quote_name
+        conditions, params = [], []
+        if cutoff is not None:
+            conditions.append(f"{quote_name('created_at')} < %s")
+            params.append(cutoff)
+        if parent_where:
+            # The subquery reads the parent table, never the one being deleted from, so
+            # MySQL accepts it
+            parent_table = quote_name(parent_field.related_model._meta.db_table)
+            parent_id = quote_name(parent_field.target_field.column)
+            conditions.append(
+                f"{quote_name(parent_field.column)} IN (SELECT {parent_id} FROM {parent_table} WHERE {parent_where})"
+            )
+            params.extend(parent_params)
+        return ' OR '.join(conditions), params
+    
+    def _get_system_snapshot(self) -> tuple:
+        """Return (memory, cpu_percent, disk) readings, reused for a few seconds."""
+        now = time.time()
+        if self._system_snapshot is None or now - self._system_snapshot_time > self.SYSTEM_SNAPSHOT_TTL:
+            # interval=None never blocks: it reports usage since the previous call
+            self._system_snapshot = (
+                psutil.virtual_memory(),
+                psutil.cpu_percent(interval=None),
+                psutil.disk_usage('/'),
+            )
+            self._system_snapshot_time = now
+        return self._system_snapshot
+    
     def _check_system_health(self):
         """Check system health and generate alerts."""
         try:
             alerts = []
             
+            memory, cpu_percent, disk = self._get_system_snapshot()
+            
             # Check memory usage
-            memory = psutil.virtual_memory()
             if memory.percent > self.thresholds['max_memory_usage']:
                 alerts.append({
                     'type': 'memory',
@@ -309,7 +640,6 @@ class PerformanceOptimizer:
                 })
             
             # Check CPU usage
-            cpu_percent = psutil.cpu_percent(interval=1)
             if cpu_percent > self.thresholds['max_cpu_usage']:
                 alerts.append({
                     'type': 'cpu',
@@ -319,7 +649,6 @@ class PerformanceOptimizer:
                 })
             
             # Check disk space
-            disk = psutil.disk_usage('/')
             if disk.percent > 90:
                 alerts.append({
                     'type': 'disk',
@@ -346,15 +675,16 @@ class PerformanceOptimizer:
         """Optimize a database query with caching and monitoring."""
         try:
             # Generate cache key
-            cache_key = f"query_{hash(str(args) + str(kwargs))}"
+            qualname = f"{query_func.__module__}.{query_func.__qualname__}"
+            cache_key = f"query_{_stable_digest(qualname, args, sorted(kwargs.items()))}"
             
             # Check cache first
             cached_result = cache.get(cache_key)
             if cached_result:
-                self.cache_stats['hits'] += 1
+                self._count('hits')
                 return cached_result
             
-            self.cache_stats['misses'] += 1
+            self._count('misses')
             
             # Execute query with monitoring
             start_time = time.time()
@@ -383,14 +713,16 @@ class PerformanceOptimizer:
         """Optimize semantic search query."""
         try:
             # Check cache first
-            cache_key = f"search_{str(document.id)}_{hash(query)}_{top_k}"
-            cached_results = cache.get(cache_key)
+            cache_key = f"search:{document.id}:{_query_digest(query)}:{top_k}"
+            self._record_cache_request('search_results', cache_key)
+            cached_results = self._get_cached('search_results', cache_key)
             
-            if cached_results:
-                self.cache_stats['search_hits'] += 1
-                return cached_results
+            results = _unpack_search_results(cached_results) if cached_results else None
+            if results is not None:
+                self._count('search_hits')
+                return results
             
-            self.cache_stats['search_misses'] += 1
+            self._count('search_misses')
             
             # Perform optimized search
             start_time = time.time()
@@ -403,8 +735,8 @@ class PerformanceOptimizer:
             search_time = time.time() - start_time
             
             # Cache results if search was fast enough
-            if search_time < self.thresholds['max_query_time']:
-                cache.set(cache_key, results, timeout=self.cache_config['search_results'])
+            if results and search_time < self.thresholds['max_query_time']:
+                cache.set(cache_key, _pack_search_results(results), timeout=self.cache_config['search_results'])
             
             # Log performance
             if search_time > self.thresholds['max_query_time']:
@@ -416,18 +748,47 @@ class PerformanceOptimizer:
             logger.error(f"Error optimizing search query: {e}")
             return []
     
+    def _search_in_worker(self, query: str, document: Document, top_k: int) -> List[Dict[str, Any]]:
+        """Run one search on an executor thread and release its DB connection."""
+        try:
+            return self.optimize_search_query(query, document, top_k)
+        finally:
+            connection.close()
+    
+    def optimize_search_queries(self, queries: List[str], document: Document, top_k: int = 10) -> List[List[Dict[str, Any]]]:
+        """Run several search queries concurrently, returning results in query order."""
+        try:
+            if len(queries) <= 1:
+                return [self.optimize_search_query(query, document, top_k) for query in queries]
+            
+            if self._search_executor is None:
+                self._search_executor = ThreadPoolExecutor(
+                    max_workers=self.SEARCH_WORKERS,
+                    thread_name_prefix='search-optimizer'
+                )
+            
+            # FAISS and NumPy release the GIL, so the searches overlap
+            return list(self._search_executor.map(
+                lambda query: self._search_in_worker(query, document, top_k), queries
+            ))
+            
+        except Exception as e:
+            logger.error(f"Error optimizing search queries: {e}")
+            return [[] for _ in queries]
+    
     def optimize_qa_query(self, question: str, document_id: str) -> Dict[str, Any]:
         """Optimize Q&A query processing."""
         try:
             # Check cache first
-            cache_key = f"qa_{document_id}_{hash(question)}"
-            cached_result = cache.get(cache_key)
+            cache_key = f"qa:{document_id}:{_query_digest(question)}"
+            self._record_cache_request('qa_results', cache_key)
+            cached_result = self._get_cached('qa_results', cache_key)
             
             if cached_result:
-                self.cache_stats['qa_hits'] += 1
+                self._count('qa_hits')
                 return cached_result
             
-            self.cache_stats['qa_misses'] += 1
+            self._count('qa_misses')
             
             # Process Q&A query with optimization
             from .qa_service import qa_service
@@ -450,59 +811,102 @@ class PerformanceOptimizer:
             logger.error(f"Error optimizing Q&A query: {e}")
             return {'success': False, 'error': str(e)}
     
+    @staticmethod
+    def _build_metrics_template() -> Dict[str, Any]:
+        """Create the nested metrics dict that get_performance_metrics fills in place."""
+        return {
+            'system': {
+                'memory_usage_percent': 0.0,
+                'cpu_usage_percent': 0.0,
+                'disk_usage_percent': 0.0,
+                'disk_free_gb': 0.0,
+            },
+            'cache': {
+                'hit_rate': 0.0,
+                'total_requests': 0,
+                'hits': 0,
+                'misses': 0,
+                'search_hits': 0,
+                'search_misses': 0,
+                'qa_hits': 0,
+                'qa_misses': 0,
+                'preload_writes': 0,
+                'preload_hits': 0,
+                'preload_epr': None,
+            },
+            'search': {},
+            'slow_queries': [],
+            'optimization': {
+                'total_optimizations': 0,
+                'cache_optimizations': 0,
+                'database_optimizations': 0,
+                'system_checks': 0,
+            },
+            'alerts': {
+                'critical_count': 0,
+                'total_alerts': 0,
+                'recent_alerts': [],
+            },
+            'thresholds': {},
+            'timestamp': '',
+        }
+    
     def get_performance_metrics(self) -> Dict[str, Any]:
-        """Get comprehensive performance metrics."""
+        """Get comprehensive performance metrics.
+        
+        The returned dict is reused by the next call on the same thread;
+        deep-copy it before mutating or keeping it.
+        """
         try:
+            metrics = getattr(self._metrics_local, 'template', None)
+            if metrics is None:
+                metrics = self._metrics_local.template = self._build_metrics_template()
+            
             # System metrics
-            memory = psutil.virtual_memory()
-            cpu_percent = psutil.cpu_percent(interval=1)
-            disk = psutil.disk_usage('/')
+            memory, cpu_percent, disk = self._get_system_snapshot()
+            system = metrics['system']
+            system['memory_usage_percent'] = memory.percent
+            system['cpu_usage_percent'] = cpu_percent
+            system['disk_usage_percent'] = disk.percent
+            system['disk_free_gb'] = disk.free / 1024**3
             
             # Cache metrics
-            total_cache_requests = sum(self.cache_stats.values())
-            cache_hit_rate = (
-                self.cache_stats['hits'] / total_cache_requests 
+            cache_stats = self.get_cache_stats()
+            cache_hits, cache_misses = self._get_cache_hit_counts()
+            total_cache_requests = cache_hits + cache_misses
+            cache_metrics = metrics['cache']
+            cache_metrics['hit_rate'] = (
+                cache_hits / total_cache_requests 
                 if total_cache_requests > 0 else 0
             )
+            cache_metrics['total_requests'] = total_cache_requests
+            cache_metrics['hits'] = cache_hits
+            cache_metrics['misses'] = cache_misses
+            for stat in ('search_hits', 'search_misses', 'qa_hits', 'qa_misses'):
+                cache_metrics[stat] = cache_stats[stat]
+            cache_metrics.update(self.get_shared_stats('preload_writes', 'preload_hits'))
+            cache_metrics['preload_epr'] = self._get_preload_epr()
             
             # Search metrics
-            search_stats = advanced_semantic_search_engine.get_search_statistics()
+            metrics['search'] = advanced_semantic_search_engine.get_search_statistics()
+            metrics['slow_queries'] = self.get_slow_query_stats()
+            
+            optimization = metrics['optimization']
+            optimization['total_optimizations'] = sum(self.optimization_stats.values())
+            optimization['cache_optimizations'] = self.optimization_stats['cache']
+            optimization['database_optimizations'] = self.optimization_stats['database']
+            optimization['system_checks'] = self.optimization_stats['system']
             
             # Performance alerts
-            current_alerts = len([a for a in self.performance_alerts if a['level'] == 'critical'])
-            
-            return {
-                'system': {
-                    'memory_usage_percent': memory.percent,
-                    'cpu_usage_percent': cpu_percent,
-                    'disk_usage_percent': disk.percent,
-                    'disk_free_gb': disk.free / 1024**3,
-                },
-                'cache': {
-                    'hit_rate': cache_hit_rate,
-                    'total_requests': total_cache_requests,
-                    'hits': self.cache_stats['hits'],
-                    'misses': self.cache_stats['misses'],
-                    'search_hits': self.cache_stats['search_hits'],
-                    'search_misses': self.cache_stats['search_misses'],
-                    'qa_hits': self.cache_stats['qa_hits'],
-                    'qa_misses': self.cache_stats['qa_misses'],
-                },
-                'search': search_stats,
-                'optimization': {
-                    'total_optimizations': sum(self.optimization_stats.values()),
-                    'cache_optimizations': self.optimization_stats['cache'],
-                    'database_optimizations': self.optimization_stats['database'],
-                    'system_checks': self.optimization_stats['system'],
-                },
-                'alerts': {
-                    'critical_count': current_alerts,
-                    'total_alerts': len(self.performance_alerts),
-                    'recent_alerts': self.performance_alerts[-5:],
-                },
-                'thresholds': self.thresholds,
-                'timestamp': datetime.now().isoformat(),
-            }
+            alerts = metrics['alerts']
+            alerts['critical_count'] = len([a for a in self.performance_alerts if a['level'] == 'critical'])
+            alerts['total_alerts'] = len(self.performance_alerts)
+            alerts['recent_alerts'] = self.performance_alerts[-5:]
+            
+            metrics['thresholds'] = self.thresholds
+            metrics['timestamp'] = datetime.now().isoformat()
+            
+            return metrics
             
         except Exception as e:
             logger.error(f"Error getting performance metrics: {e}")
@@ -534,14 +938,17 @@ class PerformanceOptimizer:
     def clear_all_caches(self):
         """Clear all caches."""
         try:
-            # Clear Django cache
-            cache.clear()
+            # Clear Django caches without blocking Redis while memory is freed
+            clear_cache_nonblocking('default')
+            if 'preload' in settings.CACHES:
+                clear_cache_nonblocking('preload')
             
             # Clear search engine cache
             advanced_semantic_search_engine.clear_cache()
             
             # Reset cache statistics
-            self.cache_stats.clear()
+            with self._stats_lock:
+                self.cache_stats.clear()
             
             logger.info("All caches cleared successfully")
             
@@ -549,11 +956,14 @@ class PerformanceOptimizer:
             logger.error(f"Error clearing caches: {e}")
     
     def stop_optimization(self):
-        """Stop background optimization."""
+        """Stop in-process periodic optimization (Celery beat schedules are unaffected)."""
         try:
-            self.is_running = False
-            if self.optimization_thread and self.optimization_thread.is_alive():
-                self.optimization_thread.join(timeout=5)
+            from .tasks import stop_periodic_optimization
+            stop_periodic_optimization()
+            
+            if self._search_executor is not None:
+                self._search_executor.shutdown(wait=False)
+                self._search_executor = None
             
             logger.info("Background optimization stopped")
             
@@ -573,39 +983,63 @@ def optimize_query(cache_timeout: int = 300):
         return wrapper
     return decorator
 
+# Decorator for in-process memoization of pure functions
+def memoize_pure(maxsize: int = 1024):
+    """Memoize a pure function in-process with functools.lru_cache.
+    
+    Only use this on functions whose result depends solely on their (hashable)
+    arguments and that return immutable values - results are shared between callers
+    and never invalidated. Use optimize_query for anything that reads the database.
+    """
+    return lru_cache(maxsize=maxsize)
+
 # Decorator for automatic search optimization
 def optimize_search(cache_timeout: int = 1800):
     """Decorator to automatically optimize search queries."""
     def decorator(func: Callable) -> Callable:
+        # Resolve parameters by name once, so bound methods and plain functions both work
+        signature = inspect.signature(func)
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # Extract query and document from function arguments
-            if len(args) >= 2:
-                query, document = args[0], args[1]
-                top_k = kwargs.get('top_k', 10)
-                return performance_optimizer.optimize_search_query(query, document, top_k)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+            if 'query' in arguments and 'document' in arguments:
+                return performance_optimizer.optimize_search_query(
+                    arguments['query'], arguments['document'], arguments.get('top_k', 10)
+                )
             return func(*args, **kwargs)
         return wrapper
     return decorator
 
+def _is_valid_document_id(document_id) -> bool:
+    """Check for a UUID, skipping the UUID parse for values that cannot be one."""
+    if isinstance(document_id, uuid.UUID):
+        return True
+    # Cheap shape check before the (regex-validating) UUID constructor
+    if not isinstance(document_id, str) or len(document_id) != 36 or document_id[8] != '-':
+        return False
+    try:
+        uuid.UUID(document_id)
+        return True
+    except ValueError:
+        return False
+
 # Decorator for automatic Q&A optimization
 def optimize_qa(cache_timeout: int = 900):
     """Decorator to automatically optimize Q&A queries."""
     def decorator(func: Callable) -> Callable:
+        # Resolve parameters by name once, so bound methods and plain functions both work
+        signature = inspect.signature(func)
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # For instance methods, args[0] is self, args[1] is question_text, args[2] is document_id
-            if len(args) >= 3:
-                question_text, document_id = args[1], args[2]
-                try:
-                    # Validate that document_id is a valid UUID
-                    import uuid
-                    uuid.UUID(document_id)
-                    # Only optimize if document_id is valid
-                    return performance_optimizer.optimize_qa_query(question_text, document_id)
-                except (ValueError, TypeError):
-                    # If document_id is not a valid UUID, just call the original function
-                    pass
+            arguments = signature.bind(*args, **kwargs).arguments
+            document_id = arguments.get('document_id')
+            # Only optimize if document_id is a valid UUID
+            if 'question_text' in arguments and _is_valid_document_id(document_id):
+                return performance_optimizer.optimize_qa_query(arguments['question_text'], str(document_id))
             return func(*args, **kwargs)
         return wrapper
     return decorator
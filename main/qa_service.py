@@ -5,22 +5,97 @@ Enhanced for Week 10: Advanced Q&A Engine
 """
 
 import logging
+import random
 import time
 import re
+import threading
+import numpy as np
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 from enum import Enum
 
+from django.core.cache import cache
 from django.db import transaction, models
-from .models import Document, Question, Answer, Citation, DocumentChunk
+from .models import Document, Question, Answer, Citation, DocumentChunk, RedFlag, Clause
 from .semantic_search import semantic_search_engine
 from .performance_monitor import monitor_performance
 from .confidence_engine import confidence_analyzer, ConfidenceFactors
 from .recommendation_engine import recommendation_manager
 from .free_ai_service import FreeAIService
 
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick not installed - fall back to per-keyword scans
+    ahocorasick = None
+
 logger = logging.getLogger(__name__)
 
+# Question text cleanup patterns
+_WS_RE = re.compile(r'\s+')
+_SPECIAL_RE = re.compile(r'[^\w\s\?\.\,\;\:\!\-\'\"\(\)]')
+
+# Common stop words dropped from key terms
+_STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
+    'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
+    'should', 'may', 'might', 'can', 'this', 'that', 'these', 'those'
+})
+
+# Whole-word yes/no indicators counted in answer contexts
+_TOKEN_RE = re.compile(r'\w+')
+_POSITIVE_SET = frozenset({'yes', 'true', 'correct', 'affirmative', 'agreed', 'approved'})
+_NEGATIVE_SET = frozenset({'no', 'false', 'incorrect', 'negative', 'disagreed', 'rejected'})
+
+# Legal terms that mark a question as legal
+_LEGAL_TERMS = frozenset({
+    'contract', 'agreement', 'clause', 'section', 'article', 'party',
+    'obligation', 'liability', 'damages', 'breach', 'termination',
+    'amendment', 'waiver', 'indemnification', 'governing law',
+    'jurisdiction', 'arbitration', 'mediation', 'force majeure',
+    'confidentiality', 'non-compete', 'intellectual property'
+})
+
+class KeywordScanner:
+    """Find keyword occurrences in a single pass with an Aho-Corasick automaton."""
+    
+    def __init__(self, keywords: List[str]):
+        """Build the automaton for keywords (kept in priority order)."""
+        self.keywords = tuple(keywords)
+        self._automaton = None
+        
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+    
+    def first_offsets(self, text: str) -> Dict[str, int]:
+        """Map each keyword found in text to the offset of its first occurrence."""
+        offsets = {}
+        
+        if self._automaton is None:
+            for keyword in self.keywords:
+                start_idx = text.find(keyword)
+                if start_idx != -1:
+                    offsets[keyword] = start_idx
+            return offsets
+        
+        # Matches are reported in order of end position, so the first one per keyword wins
+        for end_idx, keyword in self._automaton.iter(text):
+            offsets.setdefault(keyword, end_idx - len(keyword) + 1)
+        return offsets
+    
+    def first_match(self, text: str) -> Optional[Tuple[str, int]]:
+        """Return the highest-priority keyword found in text and its first offset."""
+        offsets = self.first_offsets(text)
+        for keyword in self.keywords:
+            if keyword in offsets:
+                return keyword, offsets[keyword]
+        return None
+
 class QuestionType(Enum):
     """Question classification types."""
     FACTUAL = "factual"
@@ -30,197 +105,197 @@ class QuestionType(Enum):
     YES_NO = "yes_no"
     UNKNOWN = "unknown"
 
+# Question type suggested by a question's first word, tried before the full pattern scan
+_FIRST_TOKEN = {
+    **dict.fromkeys(
+        ('is', 'are', 'was', 'were', 'does', 'do', 'did', 'has', 'have', 'had',
+         'can', 'could', 'will', 'would', 'should'),
+        QuestionType.YES_NO
+    ),
+    'how': QuestionType.PROCEDURAL,
+    'why': QuestionType.INTERPRETATION,
+    'explain': QuestionType.INTERPRETATION,
+    'what': QuestionType.FACTUAL,
+    'when': QuestionType.FACTUAL,
+    'where': QuestionType.FACTUAL,
+    'who': QuestionType.FACTUAL,
+    'which': QuestionType.COMPARISON,
+    'compare': QuestionType.COMPARISON,
+}
+
+# Question type patterns, tried in this order
+_QUESTION_TYPE_PATTERNS = {
+    QuestionType.YES_NO: [
+        r'\b(is|are|was|were|does|do|did|has|have|had|can|could|will|would|should)\b.*\?',
+        r'\b(yes|no)\b.*\?',
+        r'\?$'
+    ],
+    QuestionType.COMPARISON: [
+        r'\b(compare|difference|similar|versus|vs|between|among)\b',
+        r'\b(which|what).*\b(better|worse|more|less|higher|lower)\b'
+    ],
+    QuestionType.PROCEDURAL: [
+        r'\b(how|what.*steps|procedure|process|method)\b',
+        r'\b(what.*do|what.*should|instructions|guide)\b'
+    ],
+    QuestionType.INTERPRETATION: [
+        r'\b(what.*mean|interpret|explain|understand|imply)\b',
+        r'\b(why|reason|cause|purpose|intent)\b'
+    ],
+    QuestionType.FACTUAL: [
+        r'\b(what|when|where|who|which)\b',
+        r'\b(amount|number|date|time|location|person)\b'
+    ]
+}
+
+# One combined, precompiled alternation per question type
+_COMPILED_QUESTION_TYPE_PATTERNS = {
+    question_type: re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+    for question_type, patterns in _QUESTION_TYPE_PATTERNS.items()
+}
+
+def _clean_question_text(text: str) -> str:
+    """Clean and normalize question text."""
+    # Remove extra whitespace
+    text = _WS_RE.sub(' ', text.strip())
+    
+    # Remove special characters but keep punctuation
+    text = _SPECIAL_RE.sub('', text)
+    
+    # Normalize case
+    return text.lower()
+
+def _classify_question(text: str) -> QuestionType:
+    """Classify question type based on patterns."""
+    # Most questions are decided by their first word, so try that type's pattern first
+    candidate = _FIRST_TOKEN.get(text.split(' ', 1)[0])
+    if candidate is not None and _COMPILED_QUESTION_TYPE_PATTERNS[candidate].search(text):
+        return candidate
+    
+    for question_type, pattern in _COMPILED_QUESTION_TYPE_PATTERNS.items():
+        if pattern.search(text):
+            return question_type
+    
+    return QuestionType.UNKNOWN
+
+def _assess_complexity(word_count: int) -> str:
+    """Assess question complexity from its word count."""
+    if word_count <= 5:
+        return 'simple'
+    elif word_count <= 15:
+        return 'medium'
+    else:
+        return 'complex'
+
+@lru_cache(maxsize=2048)
+def _preprocess_cached(question_text: str) -> Tuple[str, QuestionType, Tuple[str, ...], str, int, bool]:
+    """Clean, classify and analyze question text (pure, so memoized on the raw text)."""
+    # Clean question text and split it once for all word-level checks
+    cleaned_text = _clean_question_text(question_text)
+    words = cleaned_text.split()
+    
+    # Remove common stop words (words are already lowercased) and keep the top 10 terms
+    key_terms = tuple([word for word in words if word not in _STOP_WORDS and len(word) > 2][:10])
+    
+    return (
+        cleaned_text,
+        _classify_question(cleaned_text),
+        key_terms,
+        _assess_complexity(len(words)),
+        len(words),
+        not _LEGAL_TERMS.isdisjoint(words)
+    )
+
 class QuestionProcessor:
     """Advanced question processing and classification."""
     
     def __init__(self):
         """Initialize question processor."""
-        # Question type patterns
-        self.question_patterns = {
-            QuestionType.YES_NO: [
-                r'\b(is|are|was|were|does|do|did|has|have|had|can|could|will|would|should)\b.*\?',
-                r'\b(yes|no)\b.*\?',
-                r'\?$'
-            ],
-            QuestionType.COMPARISON: [
-                r'\b(compare|difference|similar|versus|vs|between|among)\b',
-                r'\b(which|what).*\b(better|worse|more|less|higher|lower)\b'
-            ],
-            QuestionType.PROCEDURAL: [
-                r'\b(how|what.*steps|procedure|process|method)\b',
-                r'\b(what.*do|what.*should|instructions|guide)\b'
-            ],
-            QuestionType.INTERPRETATION: [
-                r'\b(what.*mean|interpret|explain|understand|imply)\b',
-                r'\b(why|reason|cause|purpose|intent)\b'
-            ],
-            QuestionType.FACTUAL: [
-                r'\b(what|when|where|who|which)\b',
-                r'\b(amount|number|date|time|location|person)\b'
-            ]
-        }
+        self.question_patterns = _QUESTION_TYPE_PATTERNS
+        self._compiled_patterns = _COMPILED_QUESTION_TYPE_PATTERNS
     
     def preprocess_question(self, question_text: str) -> Dict[str, Any]:
         """Preprocess and analyze question."""
-        try:
-            # Clean question text
-            cleaned_text = self._clean_question_text(question_text)
-            
-            # Classify question type
-            question_type = self._classify_question(cleaned_text)
-            
-            # Extract key terms
-            key_terms = self._extract_key_terms(cleaned_text)
-            
-            # Determine complexity
-            complexity = self._assess_complexity(cleaned_text)
-            
-            return {
-                'original_text': question_text,
-                'cleaned_text': cleaned_text,
-                'question_type': question_type.value,
-                'key_terms': key_terms,
-                'complexity': complexity,
-                'word_count': len(cleaned_text.split()),
-                'has_legal_terms': self._has_legal_terms(cleaned_text)
-            }
-            
-        except Exception as e:
-            logger.error(f"Error preprocessing question: {e}")
-            return {
-                'original_text': question_text,
-                'cleaned_text': question_text,
-                'question_type': QuestionType.UNKNOWN.value,
-                'key_terms': [],
-                'complexity': 'medium',
-                'word_count': len(question_text.split()),
-                'has_legal_terms': False
-            }
-    
-    def _clean_question_text(self, text: str) -> str:
-        """Clean and normalize question text."""
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text.strip())
-        
-        # Remove special characters but keep punctuation
-        text = re.sub(r'[^\w\s\?\.\,\;\:\!\-\'\"\(\)]', '', text)
+        cleaned_text, question_type, key_terms, complexity, word_count, has_legal_terms = (
+            _preprocess_cached(question_text)
+        )
         
-        # Normalize case
-        text = text.lower()
-        
-        return text
-    
-    def _classify_question(self, text: str) -> QuestionType:
-        """Classify question type based on patterns."""
-        for question_type, patterns in self.question_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text, re.IGNORECASE):
-                    return question_type
-        
-        return QuestionType.UNKNOWN
-    
-    def _extract_key_terms(self, text: str) -> List[str]:
-        """Extract key terms from question."""
-        # Remove common stop words
-        stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-            'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
-            'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
-            'should', 'may', 'might', 'can', 'this', 'that', 'these', 'those'
-        }
-        
-        words = text.split()
-        key_terms = [word for word in words if word.lower() not in stop_words and len(word) > 2]
-        
-        return key_terms[:10]  # Limit to top 10 terms
-    
-    def _assess_complexity(self, text: str) -> str:
-        """Assess question complexity."""
-        word_count = len(text.split())
-        
-        if word_count <= 5:
-            return 'simple'
-        elif word_count <= 15:
-            return 'medium'
-        else:
-            return 'complex'
-    
-    def _has_legal_terms(self, text: str) -> bool:
-        """Check if question contains legal terms."""
-        legal_terms = {
-            'contract', 'agreement', 'clause', 'section', 'article', 'party',
-            'obligation', 'liability', 'damages', 'breach', 'termination',
-            'amendment', 'waiver', 'indemnification', 'governing law',
-            'jurisdiction', 'arbitration', 'mediation', 'force majeure',
-            'confidentiality', 'non-compete', 'intellectual property'
+        # Build a fresh dict per call, the cached tuple is shared
+        return {
+            'original_text': question_text,
+            'cleaned_text': cleaned_text,
+            'question_type': question_type.value,
+            'key_terms': list(key_terms),
+            'complexity': complexity,
+            'word_count': word_count,
+            'has_legal_terms': has_legal_terms
         }
-        
-        text_words = set(text.lower().split())
-        return bool(text_words.intersection(legal_terms))
 
 class AnswerGenerator:
     """Advanced answer generation with grounding and citations."""
     
+    # Indicator scanners, shared by all instances
+    comparison_words = KeywordScanner(['however', 'but', 'while', 'whereas', 'on the other hand', 'in contrast'])
+    procedural_indicators = KeywordScanner(['step', 'procedure', 'process', 'method', 'first', 'then', 'finally'])
+    explanatory_indicators = KeywordScanner(['means', 'refers to', 'defined as', 'indicates', 'implies'])
+    
     def __init__(self):
         """Initialize answer generator."""
-        self.not_found_responses = [
+        self.not_found_responses = (
             "I could not find specific information about this in the document.",
             "This information is not explicitly mentioned in the document.",
             "The document does not contain details about this topic.",
             "I cannot provide a definitive answer based on the available information."
-        ]
+        )
     
     def generate_grounded_answer(self, question: str, search_results: List[Dict[str, Any]], 
                                question_analysis: Dict[str, Any]) -> Dict[str, Any]:
         """Generate grounded answer with citations."""
-        try:
-            if not search_results:
-                return self._generate_not_found_response(question_analysis)
-            
-            # Generate answer based on question type
-            question_type = question_analysis.get('question_type', 'unknown')
-            
-            if question_type == QuestionType.YES_NO.value:
-                answer = self._generate_yes_no_answer(question, search_results)
-            elif question_type == QuestionType.COMPARISON.value:
-                answer = self._generate_comparison_answer(question, search_results)
-            elif question_type == QuestionType.PROCEDURAL.value:
-                answer = self._generate_procedural_answer(question, search_results)
-            elif question_type == QuestionType.INTERPRETATION.value:
-                answer = self._generate_interpretation_answer(question, search_results)
-            else:
-                answer = self._generate_factual_answer(question, search_results)
-            
-            # Calculate confidence and create citations
-            confidence_score = self._calculate_enhanced_confidence(search_results, question_analysis)
-            citations = self._create_enhanced_citations(search_results)
-            
-            return {
-                'answer': answer,
-                'confidence_score': confidence_score,
-                'citations': citations,
-                'source_chunks': [result['chunk_id'] for result in search_results],
-                'source_pages': list(set([result['page_number'] for result in search_results])),
-                'answer_type': question_type,
-                'grounded': True
-            }
-            
-        except Exception as e:
-            logger.error(f"Error generating grounded answer: {e}")
-            return self._generate_error_response()
-    
-    def _generate_yes_no_answer(self, question: str, search_results: List[Dict[str, Any]]) -> str:
-        """Generate yes/no answer."""
-        # Look for positive/negative indicators
-        positive_indicators = ['yes', 'true', 'correct', 'affirmative', 'agreed', 'approved']
-        negative_indicators = ['no', 'false', 'incorrect', 'negative', 'disagreed', 'rejected']
+        if not search_results:
+            return self._generate_not_found_response(question_analysis)
         
-        context = " ".join([result['chunk_text'] for result in search_results])
+        # Build the combined context (and its lowercase form) once for all handlers
+        context = " ".join(result['chunk_text'] for result in search_results)
         context_lower = context.lower()
         
-        # Count indicators
-        positive_count = sum(1 for indicator in positive_indicators if indicator in context_lower)
-        negative_count = sum(1 for indicator in negative_indicators if indicator in context_lower)
+        # Generate answer based on question type
+        question_type = question_analysis.get('question_type', 'unknown')
+        
+        if question_type == QuestionType.YES_NO.value:
+            answer = self._generate_yes_no_answer(question, context, context_lower, search_results)
+        elif question_type == QuestionType.COMPARISON.value:
+            answer = self._generate_comparison_answer(question, context, context_lower, search_results)
+        elif question_type == QuestionType.PROCEDURAL.value:
+            answer = self._generate_procedural_answer(question, context, context_lower, search_results)
+        elif question_type == QuestionType.INTERPRETATION.value:
+            answer = self._generate_interpretation_answer(question, context, context_lower, search_results)
+        else:
+            answer = self._generate_factual_answer(question, context, context_lower, search_results)
+        
+        # Calculate confidence and create citations
+        confidence_score = self._calculate_enhanced_confidence(search_results, question_analysis)
+        citations = self._create_enhanced_citations(search_results)
+        
+        return {
+            'answer': answer,
+            'confidence_score': confidence_score,
+            'citations': citations,
+            'source_chunks': [result['chunk_id'] for result in search_results],
+            'source_pages': list({result['page_number'] for result in search_results}),
+            'answer_type': question_type,
+            'grounded': True
+        }
+    
+    def _generate_yes_no_answer(self, question: str, context: str, context_lower: str,
+                                search_results: List[Dict[str, Any]]) -> str:
+        """Generate yes/no answer."""
+        # Count whole-word positive/negative indicators in one tokenizing pass
+        positive_count = negative_count = 0
+        for token in _TOKEN_RE.findall(context_lower):
+            if token in _POSITIVE_SET:
+                positive_count += 1
+            elif token in _NEGATIVE_SET:
+                negative_count += 1
         
         if positive_count > negative_count:
             return f"Yes, based on the document: {context[:200]}..."
@@ -229,103 +304,72 @@ class AnswerGenerator:
         else:
             return f"The document states: {context[:200]}..."
     
-    def _generate_comparison_answer(self, question: str, search_results: List[Dict[str, Any]]) -> str:
+    def _generate_comparison_answer(self, question: str, context: str, context_lower: str,
+                                    search_results: List[Dict[str, Any]]) -> str:
         """Generate comparison answer."""
-        # Extract comparison elements
-        context = " ".join([result['chunk_text'] for result in search_results])
-        
         # Look for comparison words
-        comparison_words = ['however', 'but', 'while', 'whereas', 'on the other hand', 'in contrast']
-        
-        for word in comparison_words:
-            if word in context.lower():
-                # Find the comparison section
-                parts = context.split(word)
-                if len(parts) >= 2:
-                    return f"Comparison found: {parts[0][:100]}... {word} {parts[1][:100]}..."
+        match = self.comparison_words.first_match(context_lower)
+        if match:
+            # Split the context around the comparison word
+            word, start_idx = match
+            before, after = context[:start_idx], context[start_idx + len(word):]
+            return f"Comparison found: {before[:100]}... {word} {after[:100]}..."
         
         return f"The document provides the following information for comparison: {context[:300]}..."
     
-    def _generate_procedural_answer(self, question: str, search_results: List[Dict[str, Any]]) -> str:
+    def _generate_procedural_answer(self, question: str, context: str, context_lower: str,
+                                    search_results: List[Dict[str, Any]]) -> str:
         """Generate procedural answer."""
-        # Look for procedural indicators
-        procedural_indicators = ['step', 'procedure', 'process', 'method', 'first', 'then', 'finally']
-        
-        context = " ".join([result['chunk_text'] for result in search_results])
-        
         # Find procedural content
-        for indicator in procedural_indicators:
-            if indicator in context.lower():
-                # Extract the procedural section
-                start_idx = context.lower().find(indicator)
-                if start_idx != -1:
-                    return f"Procedure: {context[start_idx:start_idx+300]}..."
+        match = self.procedural_indicators.first_match(context_lower)
+        if match:
+            start_idx = match[1]
+            return f"Procedure: {context[start_idx:start_idx+300]}..."
         
         return f"The document outlines the following process: {context[:300]}..."
     
-    def _generate_interpretation_answer(self, question: str, search_results: List[Dict[str, Any]]) -> str:
+    def _generate_interpretation_answer(self, question: str, context: str, context_lower: str,
+                                        search_results: List[Dict[str, Any]]) -> str:
         """Generate interpretation answer using free AI service."""
         try:
-            # Combine search results into context
-            context = " ".join([result['chunk_text'] for result in search_results])
-            
             # Use free AI service for better interpretation
             ai_result = FreeAIService.answer_question(question, context, model_type='legal')
             
             if ai_result.get('success') and ai_result.get('answer'):
                 # Use AI-generated interpretation
                 return ai_result['answer']
-            else:
-                # Fallback to original method
-                explanatory_indicators = ['means', 'refers to', 'defined as', 'indicates', 'implies']
-                
-                for indicator in explanatory_indicators:
-                    if indicator in context.lower():
-                        start_idx = context.lower().find(indicator)
-                        if start_idx != -1:
-                            return f"Interpretation: {context[start_idx:start_idx+300]}..."
-                
-                return f"Based on the document context: {context[:300]}..."
                 
         except Exception as e:
             logger.error(f"Error in AI interpretation: {e}")
-            # Fallback to original method
-            explanatory_indicators = ['means', 'refers to', 'defined as', 'indicates', 'implies']
-            
-            for indicator in explanatory_indicators:
-                if indicator in context.lower():
-                    start_idx = context.lower().find(indicator)
-                    if start_idx != -1:
-                        return f"Interpretation: {context[start_idx:start_idx+300]}..."
-            
-            return f"Based on the document context: {context[:300]}..."
+        
+        # Fallback to original method
+        match = self.explanatory_indicators.first_match(context_lower)
+        if match:
+            start_idx = match[1]
+            return f"Interpretation: {context[start_idx:start_idx+300]}..."
+        
+        return f"Based on the document context: {context[:300]}..."
     
-    def _generate_factual_answer(self, question: str, search_results: List[Dict[str, Any]]) -> str:
+    def _generate_factual_answer(self, question: str, context: str, context_lower: str,
+                                 search_results: List[Dict[str, Any]]) -> str:
         """Generate factual answer using free AI service."""
         try:
-            # Combine search results into context
-            context = " ".join([result['chunk_text'] for result in search_results])
-            
             # Use free AI service for better answer generation
             ai_result = FreeAIService.answer_question(question, context, model_type='default')
             
             if ai_result.get('success') and ai_result.get('answer'):
                 # Use AI-generated answer
                 return ai_result['answer']
-            else:
-                # Fallback to original method
-                best_result = max(search_results, key=lambda x: x['similarity_score'])
-                return f"According to the document: {best_result['chunk_text'][:300]}..."
                 
         except Exception as e:
             logger.error(f"Error in AI answer generation: {e}")
-            # Fallback to original method
-            best_result = max(search_results, key=lambda x: x['similarity_score'])
-            return f"According to the document: {best_result['chunk_text'][:300]}..."
+        
+        # Fallback to original method
+        best_result = max(search_results, key=lambda x: x['similarity_score'])
+        return f"According to the document: {best_result['chunk_text'][:300]}..."
     
     def _generate_not_found_response(self, question_analysis: Dict[str, Any]) -> Dict[str, Any]:
         """Generate response when information is not found."""
-        import random
         response = random.choice(self.not_found_responses)
         
         return {
@@ -356,30 +400,31 @@ class AnswerGenerator:
         if not search_results:
             return 0.0
         
-        try:
-            # Create confidence factors
-            factors = ConfidenceFactors(
-                similarity_score=sum(result['similarity_score'] for result in search_results) / len(search_results),
-                result_count=len(search_results),
-                question_complexity=question_analysis.get('complexity', 'medium'),
-                has_legal_terms=question_analysis.get('has_legal_terms', False),
-                answer_length=len(" ".join([result['chunk_text'] for result in search_results])),
-                citation_quality=sum(result['similarity_score'] for result in search_results) / len(search_results),
-                source_diversity=len(set(result['page_number'] for result in search_results)) / len(search_results),
-                semantic_coherence=0.8,  # Default value
-                keyword_overlap=0.7  # Default value
-            )
-            
-            # Use confidence analyzer
-            confidence_analysis = confidence_analyzer.analyze_confidence_factors(factors)
-            return confidence_analysis['overall_confidence']
-            
-        except Exception as e:
-            logger.error(f"Error calculating enhanced confidence: {e}")
-            # Fallback to simple calculation
-            similarity_scores = [result['similarity_score'] for result in search_results]
-            base_confidence = sum(similarity_scores) / len(similarity_scores) * 100
-            return min(round(base_confidence, 2), 100.0)
+        # Average similarity once, it feeds both similarity and citation quality
+        similarity_scores = np.fromiter(
+            (result['similarity_score'] for result in search_results),
+            dtype=np.float32, count=len(search_results)
+        )
+        avg_similarity = float(similarity_scores.mean())
+        pages = {result['page_number'] for result in search_results}
+        
+        # Create confidence factors
+        factors = ConfidenceFactors(
+            similarity_score=avg_similarity,
+            result_count=len(search_results),
+            question_complexity=question_analysis.get('complexity', 'medium'),
+            has_legal_terms=question_analysis.get('has_legal_terms', False),
+            # Length of the space-joined context, without building the string
+            answer_length=sum(len(result['chunk_text']) for result in search_results) + len(search_results) - 1,
+            citation_quality=avg_similarity,
+            source_diversity=len(pages) / len(search_results),
+            semantic_coherence=0.8,  # Default value
+            keyword_overlap=0.7  # Default value
+        )
+        
+        # Use confidence analyzer
+        confidence_analysis = confidence_analyzer.analyze_confidence_factors(factors)
+        return confidence_analysis['overall_confidence']
     
     def _create_enhanced_citations(self, search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Create enhanced citations with better formatting."""
@@ -392,6 +437,7 @@ class AnswerGenerator:
                 citation_text = citation_text[:200] + "..."
             
             citations.append({
+                'chunk_id': result['chunk_id'],
                 'text': citation_text,
                 'page_number': result['page_number'],
                 'similarity_score': result['similarity_score'],
@@ -403,14 +449,120 @@ class AnswerGenerator:
         
         return citations
 
+class SemanticAnswerCache:
+    """Per-document answer cache keyed by question embedding similarity.
+    
+    Each document's answers are tagged with a version (its updated_at), so answers
+    cached before the document was re-processed by any process are never served.
+    """
+    
+    def __init__(self, threshold: float = 0.92, max_entries: int = 512, ttl: int = 3600,
+                 max_documents: int = 32):
+        """Initialize an empty cache."""
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_documents = max_documents
+        self._lock = threading.Lock()
+        # document_id -> version, embeddings matrix, created/last-used times and answers
+        # (kept row-aligned), least recently used document first
+        self._entries: OrderedDict = OrderedDict()
+    
+    @staticmethod
+    def normalize(embedding: np.ndarray) -> np.ndarray:
+        """Scale an embedding to unit length so a dot product is cosine similarity."""
+        embedding = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+    
+    def get(self, document_id: str, version, embedding: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Return the cached answer for the most similar question, if close enough."""
+        with self._lock:
+            entry = self._entries.get(str(document_id))
+            if entry is None:
+                return None
+            if entry['version'] != version:
+                # Document changed since these answers were cached
+                del self._entries[str(document_id)]
+                return None
+            
+            self._entries.move_to_end(str(document_id))
+            now = time.time()
+            self._expire(entry, now)
+            if not entry['answers']:
+                return None
+            
+            scores = entry['embeddings'] @ embedding
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            
+            entry['last_used'][best] = now
+            return entry['answers'][best]
+    
+    def set(self, document_id: str, version, embedding: np.ndarray, answer_result: Dict[str, Any]):
+        """Store an answer, evicting the least recently used answer or document when full."""
+        with self._lock:
+            now = time.time()
+            entry = self._entries.get(str(document_id))
+            if entry is None or entry['version'] != version:
+                self._entries[str(document_id)] = {
+                    'version': version,
+                    'embeddings': embedding[np.newaxis, :],
+                    'created': np.array([now]),
+                    'last_used': np.array([now]),
+                    'answers': [answer_result],
+                }
+                self._entries.move_to_end(str(document_id))
+                while len(self._entries) > self.max_documents:
+                    self._entries.popitem(last=False)
+                return
+            
+            self._entries.move_to_end(str(document_id))
+            self._expire(entry, now)
+            if len(entry['answers']) >= self.max_entries:
+                slot = int(np.argmin(entry['last_used']))
+                entry['embeddings'][slot] = embedding
+                entry['created'][slot] = now
+                entry['last_used'][slot] = now
+                entry['answers'][slot] = answer_result
+            else:
+                entry['embeddings'] = np.vstack([entry['embeddings'], embedding])
+                entry['created'] = np.append(entry['created'], now)
+                entry['last_used'] = np.append(entry['last_used'], now)
+                entry['answers'].append(answer_result)
+    
+    def invalidate(self, document_id: str):
+        """Drop all cached answers for a document."""
+        with self._lock:
+            self._entries.pop(str(document_id), None)
+    
+    def _expire(self, entry: Dict[str, Any], now: float):
+        """Remove entries older than the TTL (caller holds the lock)."""
+        live = entry['created'] > now - self.ttl
+        if live.all():
+            return
+        entry['embeddings'] = entry['embeddings'][live]
+        entry['created'] = entry['created'][live]
+        entry['last_used'] = entry['last_used'][live]
+        entry['answers'] = [answer for answer, keep in zip(entry['answers'], live) if keep]
+
 class QAService:
     """Enhanced Q&A service for Week 10."""
     
+    QA_CACHE_TIMEOUT = 300      # seconds to cache history and summaries
+    HISTORY_CACHE_SIZE = 50     # most recent questions kept in the history cache
+    CHUNK_CACHE_DOCUMENTS = 32  # documents whose chunk ids are kept in memory
+    
     def __init__(self):
         """Initialize the enhanced Q&A service."""
         self.search_engine = semantic_search_engine
         self.question_processor = QuestionProcessor()
         self.answer_generator = AnswerGenerator()
+        self.semantic_cache = SemanticAnswerCache()
+        # document_id -> (version, ids of its chunks), least recently used first
+        self._chunk_cache: OrderedDict = OrderedDict()
+        self._chunk_cache_lock = threading.Lock()
     
     @monitor_performance("enhanced_question_processing")
     def process_question(self, question_text: str, document_id: str) -> Dict[str, Any]:
@@ -442,43 +594,60 @@ class QAService:
             # Preprocess and classify question
             question_analysis = self.question_processor.preprocess_question(question_text)
             
-            # Create question record
-            question = Question.objects.create(
-                document=document,
-                question_text=question_text,
-                question_type=question_analysis['question_type'],
-                complexity_level=question_analysis['complexity']
-            )
-            
-            # Generate enhanced answer
-            answer_result = self._generate_enhanced_answer(question_text, document, question_analysis)
+            # Reuse the answer to a semantically equivalent question when there is one
+            try:
+                query_embedding = self.search_engine.create_embeddings([question_text])[0]
+                cache_embedding = self.semantic_cache.normalize(query_embedding)
+                answer_result = self.semantic_cache.get(document_id, document.updated_at, cache_embedding)
+            except Exception as e:
+                # Answer without the cache; answer generation handles the failure itself
+                logger.error(f"Error looking up semantic answer cache: {e}")
+                query_embedding = cache_embedding = answer_result = None
+            
+            if answer_result is None:
+                # Generate enhanced answer
+                answer_result = self._generate_enhanced_answer(
+                    question_text, document, question_analysis, query_embedding
+                )
+                if cache_embedding is not None and answer_result.get('answer_type') != 'error':
+                    self.semantic_cache.set(document_id, document.updated_at, cache_embedding, answer_result)
             
             # Calculate processing time
             processing_time = time.time() - start_time
             
-            # Update question with answer
-            question.answer = answer_result['answer']
-            question.confidence_score = answer_result['confidence_score']
-            question.processing_time = processing_time
-            question.citations = answer_result['citations']
-            question.save()
-            
-            # Create detailed answer record
-            answer = Answer.objects.create(
-                question=question,
-                answer_text=answer_result['answer'],
-                answer_type=answer_result.get('answer_type', 'generated'),
-                confidence_score=answer_result['confidence_score'],
-                relevance_score=answer_result.get('relevance_score', 0.0),
-                source_chunks=answer_result['source_chunks'],
-                source_pages=answer_result.get('source_pages', []),
-                generation_time=processing_time,
-                model_used='enhanced-sentence-transformers',
-                grounded=answer_result.get('grounded', False)
-            )
+            # Write question, answer and citations in one transaction
+            with transaction.atomic():
+                # Create question record with its answer
+                question = Question.objects.create(
+                    document=document,
+                    question_text=question_text,
+                    question_type=question_analysis['question_type'],
+                    complexity_level=question_analysis['complexity'],
+                    answer=answer_result['answer'],
+                    confidence_score=answer_result['confidence_score'],
+                    processing_time=processing_time,
+                    citations=answer_result['citations']
+                )
+                
+                # Create detailed answer record
+                answer = Answer.objects.create(
+                    question=question,
+                    answer_text=answer_result['answer'],
+                    answer_type=answer_result.get('answer_type', 'generated'),
+                    confidence_score=answer_result['confidence_score'],
+                    relevance_score=answer_result.get('relevance_score', 0.0),
+                    source_chunks=answer_result['source_chunks'],
+                    source_pages=answer_result.get('source_pages', []),
+                    generation_time=processing_time,
+                    model_used='enhanced-sentence-transformers',
+                    grounded=answer_result.get('grounded', False)
+                )
+                
+                # Create enhanced citations
+                self._create_enhanced_citations(answer, answer_result['citations'], document.updated_at)
             
-            # Create enhanced citations
-            self._create_enhanced_citations(answer, answer_result['citations'])
+            # History and summary now include this question
+            cache.delete_many([f"qa:summary:{document_id}", f"qa:history:{document_id}"])
             
             logger.info(f"Enhanced question processed successfully. Confidence: {answer_result['confidence_score']:.2f}")
             
@@ -511,11 +680,14 @@ class QAService:
             }
     
     def _generate_enhanced_answer(self, question_text: str, document: Document, 
-                                question_analysis: Dict[str, Any]) -> Dict[str, Any]:
+                                question_analysis: Dict[str, Any],
+                                query_embedding: Optional[np.ndarray] = None) -> Dict[str, Any]:
         """Generate enhanced answer using advanced processing."""
         try:
             # Use semantic search engine to find relevant chunks
-            search_results = self.search_engine.search_similar_chunks(question_text, document, top_k=5)
+            search_results = self.search_engine.search_similar_chunks(
+                question_text, document, top_k=5, query_embedding=query_embedding
+            )
             
             # Generate grounded answer
             return self.answer_generator.generate_grounded_answer(
@@ -526,65 +698,75 @@ class QAService:
             logger.error(f"Error generating enhanced answer: {e}")
             return self.answer_generator._generate_error_response()
     
-    def _create_enhanced_citations(self, answer: Answer, citations_data: List[Dict[str, Any]]):
+    def _create_enhanced_citations(self, answer: Answer, citations_data: List[Dict[str, Any]], version):
         """Create enhanced citation records."""
-        try:
-            for citation_data in citations_data:
-                # Find the source chunk
-                chunk_text = citation_data['text']
-                chunks = DocumentChunk.objects.filter(
-                    document=answer.question.document,
-                    chunk_text__icontains=chunk_text[:100]
-                )
-                
-                if chunks.exists():
-                    source_chunk = chunks.first()
-                    
-                    Citation.objects.create(
-                        answer=answer,
-                        citation_text=citation_data['text'],
-                        source_chunk=source_chunk,
-                        page_number=citation_data.get('page_number', 0),
-                        start_position=0,
-                        end_position=len(citation_data['text']),
-                        relevance_score=citation_data.get('similarity_score', 0.0),
-                        confidence_score=citation_data.get('confidence', 0.0)
-                    )
-            
-        except Exception as e:
-            logger.error(f"Error creating enhanced citations: {e}")
+        existing_chunk_ids = self._get_chunk_ids(answer.question.document_id, version)
+        
+        citations = []
+        for citation_data in citations_data:
+            if citation_data['chunk_id'] in existing_chunk_ids:
+                citations.append(Citation(
+                    answer=answer,
+                    citation_text=citation_data['text'],
+                    source_chunk_id=citation_data['chunk_id'],
+                    page_number=citation_data.get('page_number', 0),
+                    start_position=0,
+                    end_position=len(citation_data['text']),
+                    relevance_score=citation_data.get('similarity_score', 0.0),
+                    confidence_score=citation_data.get('confidence', 0.0)
+                ))
+        
+        Citation.objects.bulk_create(citations, batch_size=200)
+    
+    def _get_chunk_ids(self, document_id, version) -> frozenset:
+        """Return the ids of a document's chunks, loading them once per document version.
+        
+        The version is the document's updated_at, so ids cached by this process before
+        another process re-processed the document are reloaded.
+        """
+        document_id = str(document_id)
+        with self._chunk_cache_lock:
+            cached = self._chunk_cache.get(document_id)
+            if cached is not None and cached[0] == version:
+                self._chunk_cache.move_to_end(document_id)
+                return cached[1]
+        
+        chunk_ids = frozenset(
+            str(chunk_id) for chunk_id in
+            DocumentChunk.objects.filter(document_id=document_id).values_list('id', flat=True)
+        )
+        
+        with self._chunk_cache_lock:
+            self._chunk_cache[document_id] = (version, chunk_ids)
+            self._chunk_cache.move_to_end(document_id)
+            while len(self._chunk_cache) > self.CHUNK_CACHE_DOCUMENTS:
+                self._chunk_cache.popitem(last=False)
+        return chunk_ids
+    
+    def invalidate_document_caches(self, document_id):
+        """Forget cached answers and chunk ids for a document (e.g. after re-processing)."""
+        self.semantic_cache.invalidate(document_id)
+        with self._chunk_cache_lock:
+            self._chunk_cache.pop(str(document_id), None)
     
     def _generate_recommendations(self, document: Document, question: str, answer: str) -> Dict[str, Any]:
         """Generate legal recommendations for the question and answer."""
         try:
             # Get document text for analysis
-            document_text = document.extracted_text or ""
+            document_text = document.get_extracted_text()
             
             # Get red flags and clauses if available
             red_flags = []
             clauses = []
             
             try:
-                # Get red flags from document
-                from .models import RedFlag
-                red_flags_data = RedFlag.objects.filter(document=document)
-                for rf in red_flags_data:
-                    red_flags.append({
-                        'title': rf.title,
-                        'risk_level': rf.risk_level,
-                        'confidence_score': rf.confidence_score
-                    })
-                
-                # Get clauses from document
-                from .models import Clause
-                clauses_data = Clause.objects.filter(document=document)
-                for clause in clauses_data:
-                    clauses.append({
-                        'clause_type': clause.clause_type,
-                        'importance': clause.importance,
-                        'confidence_score': clause.confidence_score
-                    })
-                    
+                # Only the fields the recommendation manager reads, on the request's connection
+                red_flags = list(RedFlag.objects.filter(document_id=document.id).values(
+                    'title', 'risk_level', 'confidence_score'
+                ))
+                clauses = list(Clause.objects.filter(document_id=document.id).values(
+                    'clause_type', 'importance', 'confidence_score'
+                ))
             except Exception as e:
                 logger.warning(f"Could not retrieve red flags or clauses: {e}")
             
@@ -611,64 +793,54 @@ class QAService:
     def get_question_history(self, document_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get question history for a document."""
         try:
-            questions = Question.objects.filter(
-                document_id=document_id
-            ).order_by('-created_at')[:limit]
-            
-            history = []
-            for question in questions:
-                history.append({
-                    'id': str(question.id),
-                    'question_text': question.question_text,
-                    'answer': question.answer,
-                    'confidence_score': question.confidence_score,
-                    'processing_time': question.processing_time,
-                    'created_at': question.created_at.isoformat(),
-                    'citations_count': len(question.citations) if question.citations else 0,
-                    'question_type': question.question_type,
-                    'complexity_level': question.complexity_level
-                })
-            
-            return history
+            if limit > self.HISTORY_CACHE_SIZE:
+                return self._load_question_history(document_id, limit)
+            
+            # Cache the most recent questions once and slice per call
+            history = cache.get_or_set(
+                f"qa:history:{document_id}",
+                lambda: self._load_question_history(document_id, self.HISTORY_CACHE_SIZE),
+                timeout=self.QA_CACHE_TIMEOUT
+            )
+            return history[:limit]
             
         except Exception as e:
             logger.error(f"Error getting question history: {e}")
             return []
     
+    def _load_question_history(self, document_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Load the latest questions for a document from the database."""
+        questions = Question.objects.filter(
+            document_id=document_id
+        ).order_by('-created_at').values(
+            'id', 'question_text', 'answer', 'confidence_score', 'processing_time',
+            'created_at', 'citations', 'question_type', 'complexity_level'
+        )[:limit]
+        
+        history = []
+        for question in questions:
+            history.append({
+                'id': str(question['id']),
+                'question_text': question['question_text'],
+                'answer': question['answer'],
+                'confidence_score': question['confidence_score'],
+                'processing_time': question['processing_time'],
+                'created_at': question['created_at'].isoformat(),
+                'citations_count': len(question['citations']) if question['citations'] else 0,
+                'question_type': question['question_type'],
+                'complexity_level': question['complexity_level']
+            })
+        
+        return history
+    
     def get_document_qa_summary(self, document_id: str) -> Dict[str, Any]:
         """Get Q&A summary for a document."""
         try:
-            questions = Question.objects.filter(document_id=document_id)
-            
-            if not questions.exists():
-                return {
-                    'total_questions': 0,
-                    'avg_confidence': 0.0,
-                    'avg_processing_time': 0.0,
-                    'recent_questions': []
-                }
-            
-            # Calculate statistics
-            total_questions = questions.count()
-            avg_confidence = questions.aggregate(avg=models.Avg('confidence_score'))['avg'] or 0.0
-            avg_processing_time = questions.aggregate(avg=models.Avg('processing_time'))['avg'] or 0.0
-            
-            # Get recent questions
-            recent_questions = questions.order_by('-created_at')[:5]
-            recent_data = []
-            for q in recent_questions:
-                recent_data.append({
-                    'question': q.question_text[:100] + "..." if len(q.question_text) > 100 else q.question_text,
-                    'confidence': q.confidence_score,
-                    'created_at': q.created_at.strftime('%Y-%m-%d %H:%M')
-                })
-            
-            return {
-                'total_questions': total_questions,
-                'avg_confidence': round(avg_confidence, 2),
-                'avg_processing_time': round(avg_processing_time, 2),
-                'recent_questions': recent_data
-            }
+            return cache.get_or_set(
+                f"qa:summary:{document_id}",
+                lambda: self._load_document_qa_summary(document_id),
+                timeout=self.QA_CACHE_TIMEOUT
+            )
             
         except Exception as e:
             logger.error(f"Error getting document Q&A summary: {e}")
@@ -678,6 +850,49 @@ class QAService:
                 'avg_processing_time': 0.0,
                 'recent_questions': []
             }
+    
+    def _load_document_qa_summary(self, document_id: str) -> Dict[str, Any]:
+        """Compute the Q&A summary for a document from the database."""
+        questions = Question.objects.filter(document_id=document_id)
+        
+        # Calculate statistics in a single query
+        stats = questions.aggregate(
+            total=models.Count('id'),
+            avg_conf=models.Avg('confidence_score'),
+            avg_time=models.Avg('processing_time')
+        )
+        
+        if stats['total'] == 0:
+            return {
+                'total_questions': 0,
+                'avg_confidence': 0.0,
+                'avg_processing_time': 0.0,
+                'recent_questions': []
+            }
+        
+        total_questions = stats['total']
+        avg_confidence = stats['avg_conf'] or 0.0
+        avg_processing_time = stats['avg_time'] or 0.0
+        
+        # Get recent questions
+        recent_questions = questions.order_by('-created_at').values(
+            'question_text', 'confidence_score', 'created_at'
+        )[:5]
+        recent_data = []
+        for q in recent_questions:
+            question_text = q['question_text']
+            recent_data.append({
+                'question': question_text[:100] + "..." if len(question_text) > 100 else question_text,
+                'confidence': q['confidence_score'],
+                'created_at': q['created_at'].strftime('%Y-%m-%d %H:%M')
+            })
+        
+        return {
+            'total_questions': total_questions,
+            'avg_confidence': round(avg_confidence, 2),
+            'avg_processing_time': round(avg_processing_time, 2),
+            'recent_questions': recent_data
+        }
 
 # Global Q&A service instance
 qa_service = QAService()
@@ -3,14 +3,35 @@ Legal Recommendation Engine for Week 11
 Provides intelligent legal recommendations based on document analysis
 """
 
+import heapq
 import logging
 import re
+import sys
+from collections import Counter
+from itertools import chain
+from functools import lru_cache
 from typing import Dict, Any, List, Optional, Tuple
-from enum import Enum
+from enum import Enum, IntEnum
+from operator import attrgetter
 from dataclasses import dataclass
 
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick not installed - fall back to a combined regex
+    ahocorasick = None
+
 logger = logging.getLogger(__name__)
 
+# Distinct documents/questions whose recommendations are kept in memory
+ANALYSIS_CACHE_SIZE = 256
+
+# Red flag risk levels and clause importances that warrant a recommendation
+_HIGH_RISK = frozenset({'high', 'critical'})
+_HIGH_IMPORTANCE = frozenset({'high', 'critical'})
+
+# dataclass(slots=True) needs Python 3.10+; PythonAnywhere still runs 3.9
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
 class RecommendationType(Enum):
     """Types of legal recommendations."""
     WARNING = "warning"
@@ -19,14 +40,22 @@ class RecommendationType(Enum):
     INFORMATION = "information"
     REVIEW = "review"
 
-class RecommendationPriority(Enum):
-    """Priority levels for recommendations."""
-    CRITICAL = "critical"
-    HIGH = "high"
-    MEDIUM = "medium"
-    LOW = "low"
+# Payload string for each recommendation type
+_TYPE_STR = {recommendation_type: recommendation_type.value for recommendation_type in RecommendationType}
 
-@dataclass
+class RecommendationPriority(IntEnum):
+    """Priority levels for recommendations, ordered so higher values sort first."""
+    CRITICAL = 4
+    HIGH = 3
+    MEDIUM = 2
+    LOW = 1
+    
+    @property
+    def label(self) -> str:
+        """Lowercase name used as the priority key in API payloads."""
+        return self.name.lower()
+
+@dataclass(**_DATACLASS_SLOTS)
 class LegalRecommendation:
     """Legal recommendation with metadata."""
     title: str
@@ -38,200 +67,289 @@ class LegalRecommendation:
     related_clauses: List[str] = None
     related_red_flags: List[str] = None
     confidence: float = 0.0
+    
+    def to_payload(self) -> Dict[str, Any]:
+        """Serialize the recommendation for API responses."""
+        return {
+            'title': self.title,
+            'description': self.description,
+            'type': _TYPE_STR[self.recommendation_type],
+            'reasoning': self.reasoning,
+            'suggested_actions': self.suggested_actions,
+            'confidence': self.confidence,
+            'related_clauses': self.related_clauses or (),
+            'related_red_flags': self.related_red_flags or ()
+        }
+
+def _with_lowercase_triggers(legal_rules: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Add a lowercased triggers tuple to each rule, triggers are matched against lowercased text."""
+    for rule_config in legal_rules.values():
+        rule_config['triggers_lower'] = tuple(trigger.lower() for trigger in rule_config['triggers'])
+    return legal_rules
+
+# Legal rules and their templates are static, build them once at import
+_LEGAL_RULES = _with_lowercase_triggers({
+    'liability_issues': {
+        'triggers': ['liability', 'damages', 'indemnification', 'hold harmless'],
+        'priority': RecommendationPriority.HIGH,
+        'type': RecommendationType.WARNING,
+        'template': 'liability_warning'
+    },
+    'termination_clauses': {
+        'triggers': ['termination', 'cancellation', 'breach', 'default'],
+        'priority': RecommendationPriority.MEDIUM,
+        'type': RecommendationType.ADVICE,
+        'template': 'termination_advice'
+    },
+    'payment_terms': {
+        'triggers': ['payment', 'invoice', 'due date', 'late fees', 'interest'],
+        'priority': RecommendationPriority.MEDIUM,
+        'type': RecommendationType.INFORMATION,
+        'template': 'payment_info'
+    },
+    'confidentiality': {
+        'triggers': ['confidential', 'non-disclosure', 'trade secret', 'proprietary'],
+        'priority': RecommendationPriority.HIGH,
+        'type': RecommendationType.WARNING,
+        'template': 'confidentiality_warning'
+    },
+    'intellectual_property': {
+        'triggers': ['intellectual property', 'copyright', 'patent', 'trademark', 'IP'],
+        'priority': RecommendationPriority.HIGH,
+        'type': RecommendationType.REVIEW,
+        'template': 'ip_review'
+    },
+    'force_majeure': {
+        'triggers': ['force majeure', 'act of god', 'unforeseen', 'beyond control'],
+        'priority': RecommendationPriority.MEDIUM,
+        'type': RecommendationType.INFORMATION,
+        'template': 'force_majeure_info'
+    },
+    'governing_law': {
+        'triggers': ['governing law', 'jurisdiction', 'venue', 'choice of law'],
+        'priority': RecommendationPriority.MEDIUM,
+        'type': RecommendationType.INFORMATION,
+        'template': 'governing_law_info'
+    },
+    'dispute_resolution': {
+        'triggers': ['arbitration', 'mediation', 'dispute', 'litigation', 'court'],
+        'priority': RecommendationPriority.MEDIUM,
+        'type': RecommendationType.ADVICE,
+        'template': 'dispute_resolution_advice'
+    }
+})
+
+_RECOMMENDATION_TEMPLATES = {
+    'liability_warning': {
+        'title': 'Liability Clause Review Required',
+        'description': 'This document contains significant liability provisions that require careful review.',
+        'reasoning': 'Liability clauses can expose parties to substantial financial risk and legal obligations.',
+        'suggested_actions': [
+            'Review liability limits and exclusions',
+            'Consider insurance requirements',
+            'Evaluate indemnification obligations',
+            'Consult with legal counsel'
+        ]
+    },
+    'termination_advice': {
+        'title': 'Termination Provisions Analysis',
+        'description': 'Review termination clauses to understand exit conditions and obligations.',
+        'reasoning': 'Termination clauses define how and when parties can end the agreement.',
+        'suggested_actions': [
+            'Identify termination triggers',
+            'Review notice requirements',
+            'Understand post-termination obligations',
+            'Consider termination fees or penalties'
+        ]
+    },
+    'payment_info': {
+        'title': 'Payment Terms Summary',
+        'description': 'Key payment terms and conditions identified in the document.',
+        'reasoning': 'Payment terms affect cash flow and financial planning.',
+        'suggested_actions': [
+            'Note payment due dates',
+            'Review late payment penalties',
+            'Understand payment methods',
+            'Check for advance payment requirements'
+        ]
+    },
+    'confidentiality_warning': {
+        'title': 'Confidentiality Obligations',
+        'description': 'This document contains confidentiality provisions that require attention.',
+        'reasoning': 'Confidentiality clauses can have long-term implications for information sharing.',
+        'suggested_actions': [
+            'Review confidentiality scope',
+            'Understand duration of obligations',
+            'Identify permitted disclosures',
+            'Consider return/destruction requirements'
+        ]
+    },
+    'ip_review': {
+        'title': 'Intellectual Property Review',
+        'description': 'Intellectual property provisions require careful analysis.',
+        'reasoning': 'IP clauses affect ownership and usage rights of creative works and innovations.',
+        'suggested_actions': [
+            'Review IP ownership provisions',
+            'Understand licensing terms',
+            'Check for assignment requirements',
+            'Consider infringement protections'
+        ]
+    },
+    'force_majeure_info': {
+        'title': 'Force Majeure Provisions',
+        'description': 'Force majeure clauses define circumstances for excused performance.',
+        'reasoning': 'Force majeure clauses can provide relief from contractual obligations.',
+        'suggested_actions': [
+            'Review covered events',
+            'Understand notice requirements',
+            'Check for mitigation obligations',
+            'Consider termination rights'
+        ]
+    },
+    'governing_law_info': {
+        'title': 'Governing Law and Jurisdiction',
+        'description': 'Legal framework and dispute resolution forum specified.',
+        'reasoning': 'Governing law affects how the contract will be interpreted and enforced.',
+        'suggested_actions': [
+            'Note applicable law',
+            'Identify jurisdiction',
+            'Understand venue requirements',
+            'Consider enforcement implications'
+        ]
+    },
+    'dispute_resolution_advice': {
+        'title': 'Dispute Resolution Process',
+        'description': 'Dispute resolution mechanisms and procedures outlined.',
+        'reasoning': 'Dispute resolution clauses determine how conflicts will be resolved.',
+        'suggested_actions': [
+            'Review dispute resolution steps',
+            'Understand mediation/arbitration process',
+            'Check for time limitations',
+            'Consider cost implications'
+        ]
+    }
+}
 
 class LegalRuleEngine:
     """Engine for applying legal rules and generating recommendations."""
     
     def __init__(self):
         """Initialize legal rule engine."""
-        self.legal_rules = self._initialize_legal_rules()
-        self.recommendation_templates = self._initialize_templates()
-    
-    def _initialize_legal_rules(self) -> Dict[str, Dict[str, Any]]:
-        """Initialize legal rules for different scenarios."""
-        return {
-            'liability_issues': {
-                'triggers': ['liability', 'damages', 'indemnification', 'hold harmless'],
-                'priority': RecommendationPriority.HIGH,
-                'type': RecommendationType.WARNING,
-                'template': 'liability_warning'
-            },
-            'termination_clauses': {
-                'triggers': ['termination', 'cancellation', 'breach', 'default'],
-                'priority': RecommendationPriority.MEDIUM,
-                'type': RecommendationType.ADVICE,
-                'template': 'termination_advice'
-            },
-            'payment_terms': {
-                'triggers': ['payment', 'invoice', 'due date', 'late fees', 'interest'],
-                'priority': RecommendationPriority.MEDIUM,
-                'type': RecommendationType.INFORMATION,
-                'template': 'payment_info'
-            },
-            'confidentiality': {
-                'triggers': ['confidential', 'non-disclosure', 'trade secret', 'proprietary'],
-                'priority': RecommendationPriority.HIGH,
-                'type': RecommendationType.WARNING,
-                'template': 'confidentiality_warning'
-            },
-            'intellectual_property': {
-                'triggers': ['intellectual property', 'copyright', 'patent', 'trademark', 'IP'],
-                'priority': RecommendationPriority.HIGH,
-                'type': RecommendationType.REVIEW,
-                'template': 'ip_review'
-            },
-            'force_majeure': {
-                'triggers': ['force majeure', 'act of god', 'unforeseen', 'beyond control'],
-                'priority': RecommendationPriority.MEDIUM,
-                'type': RecommendationType.INFORMATION,
-                'template': 'force_majeure_info'
-            },
-            'governing_law': {
-                'triggers': ['governing law', 'jurisdiction', 'venue', 'choice of law'],
-                'priority': RecommendationPriority.MEDIUM,
-                'type': RecommendationType.INFORMATION,
-                'template': 'governing_law_info'
-            },
-            'dispute_resolution': {
-                'triggers': ['arbitration', 'mediation', 'dispute', 'litigation', 'court'],
-                'priority': RecommendationPriority.MEDIUM,
-                'type': RecommendationType.ADVICE,
-                'template': 'dispute_resolution_advice'
-            }
+        self.legal_rules = _LEGAL_RULES
+        self.recommendation_templates = _RECOMMENDATION_TEMPLATES
+        self._trigger_to_rules = self._map_triggers_to_rules()
+        self._trigger_automaton = self._build_trigger_automaton()
+        self._trigger_re = self._compile_trigger_regex() if self._trigger_automaton is None else None
+        # Recommendations are a pure function of the fired rules, red flags and clauses
+        self._analyze_cached = lru_cache(maxsize=ANALYSIS_CACHE_SIZE)(self._analyze)
+        # Rule recommendations depend only on the rule, so freeze each template into a
+        # read-only prototype once and share it. Highest priority first, so a min_priority
+        # filter can stop at the first prototype below it
+        self._prototypes = {
+            rule_name: self._build_recommendation(rule_config)
+            for rule_name, rule_config in sorted(
+                self.legal_rules.items(), key=lambda item: item[1]['priority'], reverse=True
+            )
         }
+        self._max_rule_priority = max(rule_config['priority'] for rule_config in self.legal_rules.values())
     
-    def _initialize_templates(self) -> Dict[str, Dict[str, str]]:
-        """Initialize recommendation templates."""
-        return {
-            'liability_warning': {
-                'title': 'Liability Clause Review Required',
-                'description': 'This document contains significant liability provisions that require careful review.',
-                'reasoning': 'Liability clauses can expose parties to substantial financial risk and legal obligations.',
-                'suggested_actions': [
-                    'Review liability limits and exclusions',
-                    'Consider insurance requirements',
-                    'Evaluate indemnification obligations',
-                    'Consult with legal counsel'
-                ]
-            },
-            'termination_advice': {
-                'title': 'Termination Provisions Analysis',
-                'description': 'Review termination clauses to understand exit conditions and obligations.',
-                'reasoning': 'Termination clauses define how and when parties can end the agreement.',
-                'suggested_actions': [
-                    'Identify termination triggers',
-                    'Review notice requirements',
-                    'Understand post-termination obligations',
-                    'Consider termination fees or penalties'
-                ]
-            },
-            'payment_info': {
-                'title': 'Payment Terms Summary',
-                'description': 'Key payment terms and conditions identified in the document.',
-                'reasoning': 'Payment terms affect cash flow and financial planning.',
-                'suggested_actions': [
-                    'Note payment due dates',
-                    'Review late payment penalties',
-                    'Understand payment methods',
-                    'Check for advance payment requirements'
-                ]
-            },
-            'confidentiality_warning': {
-                'title': 'Confidentiality Obligations',
-                'description': 'This document contains confidentiality provisions that require attention.',
-                'reasoning': 'Confidentiality clauses can have long-term implications for information sharing.',
-                'suggested_actions': [
-                    'Review confidentiality scope',
-                    'Understand duration of obligations',
-                    'Identify permitted disclosures',
-                    'Consider return/destruction requirements'
-                ]
-            },
-            'ip_review': {
-                'title': 'Intellectual Property Review',
-                'description': 'Intellectual property provisions require careful analysis.',
-                'reasoning': 'IP clauses affect ownership and usage rights of creative works and innovations.',
-                'suggested_actions': [
-                    'Review IP ownership provisions',
-                    'Understand licensing terms',
-                    'Check for assignment requirements',
-                    'Consider infringement protections'
-                ]
-            },
-            'force_majeure_info': {
-                'title': 'Force Majeure Provisions',
-                'description': 'Force majeure clauses define circumstances for excused performance.',
-                'reasoning': 'Force majeure clauses can provide relief from contractual obligations.',
-                'suggested_actions': [
-                    'Review covered events',
-                    'Understand notice requirements',
-                    'Check for mitigation obligations',
-                    'Consider termination rights'
-                ]
-            },
-            'governing_law_info': {
-                'title': 'Governing Law and Jurisdiction',
-                'description': 'Legal framework and dispute resolution forum specified.',
-                'reasoning': 'Governing law affects how the contract will be interpreted and enforced.',
-                'suggested_actions': [
-                    'Note applicable law',
-                    'Identify jurisdiction',
-                    'Understand venue requirements',
-                    'Consider enforcement implications'
-                ]
-            },
-            'dispute_resolution_advice': {
-                'title': 'Dispute Resolution Process',
-                'description': 'Dispute resolution mechanisms and procedures outlined.',
-                'reasoning': 'Dispute resolution clauses determine how conflicts will be resolved.',
-                'suggested_actions': [
-                    'Review dispute resolution steps',
-                    'Understand mediation/arbitration process',
-                    'Check for time limitations',
-                    'Consider cost implications'
-                ]
-            }
-        }
+    def _map_triggers_to_rules(self) -> Dict[str, Tuple[str, ...]]:
+        """Map each lowercased trigger to the rules it fires."""
+        trigger_to_rules = {}
+        for rule_name, rule_config in self.legal_rules.items():
+            for trigger in rule_config['triggers_lower']:
+                trigger_to_rules[trigger] = trigger_to_rules.get(trigger, ()) + (rule_name,)
+        return trigger_to_rules
+    
+    def _build_trigger_automaton(self):
+        """Build one Aho-Corasick automaton over every rule trigger."""
+        if ahocorasick is None:
+            return None
+        automaton = ahocorasick.Automaton()
+        for trigger in self._trigger_to_rules:
+            automaton.add_word(trigger, trigger)
+        automaton.make_automaton()
+        return automaton
+    
+    def _compile_trigger_regex(self) -> re.Pattern:
+        """Compile every trigger into one alternation, used when pyahocorasick is unavailable."""
+        triggers = sorted(self._trigger_to_rules, key=len, reverse=True)
+        # Zero-width lookahead so overlapping triggers are all reported
+        return re.compile("(?=(" + "|".join(map(re.escape, triggers)) + "))")
+    
+    def _find_fired_rules(self, text_lower: str) -> set:
+        """Find the rules with at least one trigger in the lowercased text."""
+        # Single linear pass over the text instead of one scan per trigger
+        if self._trigger_automaton is not None:
+            hits = {trigger for _, trigger in self._trigger_automaton.iter(text_lower)}
+        else:
+            hits = {match.group(1) for match in self._trigger_re.finditer(text_lower)}
+        return set().union(*(self._trigger_to_rules[trigger] for trigger in hits))
     
     def analyze_document_for_recommendations(self, document_text: str, 
                                            red_flags: List[Dict[str, Any]] = None,
-                                           clauses: List[Dict[str, Any]] = None) -> List[LegalRecommendation]:
-        """Analyze document and generate legal recommendations."""
+                                           clauses: List[Dict[str, Any]] = None,
+                                           top_k: Optional[int] = None,
+                                           min_priority: RecommendationPriority = RecommendationPriority.LOW
+                                           ) -> List[LegalRecommendation]:
+        """Analyze document and generate legal recommendations, only the top_k highest priority if given."""
         try:
-            recommendations = []
-            
-            # Analyze text for legal rule triggers
-            for rule_name, rule_config in self.legal_rules.items():
-                if self._check_rule_triggers(document_text, rule_config['triggers']):
-                    recommendation = self._create_recommendation(rule_config, rule_name)
-                    recommendations.append(recommendation)
-            
-            # Add recommendations based on red flags
-            if red_flags:
-                red_flag_recommendations = self._generate_red_flag_recommendations(red_flags)
-                recommendations.extend(red_flag_recommendations)
+            # Analyze text for legal rule triggers, unless no rule could reach min_priority
+            if min_priority > self._max_rule_priority:
+                fired_rules = frozenset()
+            else:
+                fired_rules = frozenset(self._find_fired_rules(document_text.lower()))
             
-            # Add recommendations based on clauses
-            if clauses:
-                clause_recommendations = self._generate_clause_recommendations(clauses)
-                recommendations.extend(clause_recommendations)
-            
-            # Sort by priority
-            recommendations.sort(key=lambda r: self._get_priority_score(r.priority), reverse=True)
+            # Key red flags and clauses on the fields recommendations are built from
+            red_flag_key = tuple(
+                (red_flag.get('title', 'Unknown Risk'), red_flag.get('risk_level', 'medium'),
+                 red_flag.get('confidence_score', 0.0))
+                for red_flag in red_flags or ()
+            )
+            clause_key = tuple(
+                (clause.get('clause_type', 'general'), clause.get('importance', 'medium'),
+                 clause.get('confidence_score', 0.0))
+                for clause in clauses or ()
+            )
             
-            return recommendations
+            return list(self._analyze_cached(fired_rules, red_flag_key, clause_key, top_k, min_priority))
             
         except Exception as e:
-            logger.error(f"Error analyzing document for recommendations: {e}")
+            logger.exception("Error analyzing document for recommendations: %s", e)
             return []
     
-    def _check_rule_triggers(self, text: str, triggers: List[str]) -> bool:
-        """Check if any triggers are present in the text."""
-        text_lower = text.lower()
-        return any(trigger.lower() in text_lower for trigger in triggers)
+    def _analyze(self, fired_rules: frozenset, red_flag_key: Tuple[tuple, ...],
+                 clause_key: Tuple[tuple, ...], top_k: Optional[int] = None,
+                 min_priority: RecommendationPriority = RecommendationPriority.LOW
+                 ) -> Tuple[LegalRecommendation, ...]:
+        """Build the sorted recommendations for fired rules, red flags and clauses."""
+        recommendations = []
+        for rule_name, prototype in self._prototypes.items():
+            if prototype.priority < min_priority:
+                break  # Prototypes are ordered by priority, the rest are lower
+            if rule_name in fired_rules:
+                recommendations.append(prototype)
+        
+        # Add recommendations based on red flags
+        if red_flag_key:
+            recommendations.extend(self._generate_red_flag_recommendations(red_flag_key))
+        
+        # Add recommendations based on clauses
+        if clause_key:
+            recommendations.extend(self._generate_clause_recommendations(clause_key))
+        
+        if min_priority > RecommendationPriority.LOW:
+            recommendations = [rec for rec in recommendations if rec.priority >= min_priority]
+        
+        # Sort by priority, only selecting the top_k when the caller displays a few
+        if top_k is not None:
+            return tuple(heapq.nlargest(top_k, recommendations, key=attrgetter('priority')))
+        recommendations.sort(key=attrgetter('priority'), reverse=True)
+        
+        return tuple(recommendations)
     
-    def _create_recommendation(self, rule_config: Dict[str, Any], rule_name: str) -> LegalRecommendation:
-        """Create recommendation from rule configuration."""
+    def _build_recommendation(self, rule_config: Dict[str, Any]) -> LegalRecommendation:
+        """Build recommendation from rule configuration."""
         template = self.recommendation_templates[rule_config['template']]
         
         return LegalRecommendation(
@@ -240,19 +358,16 @@ class LegalRuleEngine:
             recommendation_type=rule_config['type'],
             priority=rule_config['priority'],
             reasoning=template['reasoning'],
-            suggested_actions=template['suggested_actions'],
+            suggested_actions=tuple(template['suggested_actions']),
             confidence=0.8
         )
     
-    def _generate_red_flag_recommendations(self, red_flags: List[Dict[str, Any]]) -> List[LegalRecommendation]:
-        """Generate recommendations based on red flags."""
+    def _generate_red_flag_recommendations(self, red_flags: Tuple[tuple, ...]) -> List[LegalRecommendation]:
+        """Generate recommendations from (title, risk_level, confidence_score) red flags."""
         recommendations = []
         
-        for red_flag in red_flags:
-            risk_level = red_flag.get('risk_level', 'medium')
-            title = red_flag.get('title', 'Unknown Risk')
-            
-            if risk_level in ['high', 'critical']:
+        for title, risk_level, confidence_score in red_flags:
+            if risk_level in _HIGH_RISK:
                 recommendation = LegalRecommendation(
                     title=f"Critical Review Required: {title}",
                     description=f"This document contains a high-risk issue: {title}",
@@ -266,21 +381,18 @@ class LegalRuleEngine:
                         "Consult with subject matter experts"
                     ],
                     related_red_flags=[title],
-                    confidence=red_flag.get('confidence_score', 0.0) / 100.0
+                    confidence=confidence_score / 100.0
                 )
                 recommendations.append(recommendation)
         
         return recommendations
     
-    def _generate_clause_recommendations(self, clauses: List[Dict[str, Any]]) -> List[LegalRecommendation]:
-        """Generate recommendations based on important clauses."""
+    def _generate_clause_recommendations(self, clauses: Tuple[tuple, ...]) -> List[LegalRecommendation]:
+        """Generate recommendations from (clause_type, importance, confidence_score) clauses."""
         recommendations = []
         
-        for clause in clauses:
-            importance = clause.get('importance', 'medium')
-            clause_type = clause.get('clause_type', 'general')
-            
-            if importance in ['high', 'critical']:
+        for clause_type, importance, confidence_score in clauses:
+            if importance in _HIGH_IMPORTANCE:
                 recommendation = LegalRecommendation(
                     title=f"Important Clause: {clause_type.title()}",
                     description=f"This document contains an important {clause_type} clause that requires attention.",
@@ -294,128 +406,144 @@ class LegalRuleEngine:
                         "Document any concerns or questions"
                     ],
                     related_clauses=[clause_type],
-                    confidence=clause.get('confidence_score', 0.0) / 100.0
+                    confidence=confidence_score / 100.0
                 )
                 recommendations.append(recommendation)
         
         return recommendations
-    
-    def _get_priority_score(self, priority: RecommendationPriority) -> int:
-        """Get numerical score for priority sorting."""
-        priority_scores = {
-            RecommendationPriority.CRITICAL: 4,
-            RecommendationPriority.HIGH: 3,
-            RecommendationPriority.MEDIUM: 2,
-            RecommendationPriority.LOW: 1
+
+def _compile_question_patterns(question_patterns: Dict[str, Dict[str, Any]]) -> re.Pattern:
+    """Union every pattern group into one alternation with a named group per question type."""
+    alternation = "|".join(
+        f"(?P<{name}>" + "|".join(config['patterns']) + ")"
+        for name, config in question_patterns.items()
+    )
+    # Zero-width lookahead so overlapping hits from different groups are all reported
+    return re.compile(f"(?=(?:{alternation}))", re.IGNORECASE)
+
+# Question patterns are static, build them and their combined regex once at import
+_QUESTION_PATTERNS = {
+    'liability_questions': {
+        'patterns': [r'liability', r'damages', r'indemnification', r'hold harmless'],
+        'recommendation': {
+            'title': 'Liability Analysis Required',
+            'description': 'Your question relates to liability provisions which are critical contract terms.',
+            'type': RecommendationType.WARNING,
+            'priority': RecommendationPriority.HIGH,
+            'reasoning': 'Liability clauses determine financial exposure and legal obligations.',
+            'actions': [
+                'Review all liability-related clauses',
+                'Understand scope of indemnification',
+                'Check for liability caps or exclusions',
+                'Consider insurance requirements'
+            ]
+        }
+    },
+    'termination_questions': {
+        'patterns': [r'terminate', r'cancel', r'end', r'breach', r'default'],
+        'recommendation': {
+            'title': 'Termination Rights Analysis',
+            'description': 'Your question involves termination provisions which define exit conditions.',
+            'type': RecommendationType.ADVICE,
+            'priority': RecommendationPriority.MEDIUM,
+            'reasoning': 'Termination clauses affect how and when parties can end the agreement.',
+            'actions': [
+                'Identify termination triggers',
+                'Review notice requirements',
+                'Understand post-termination obligations',
+                'Check for termination fees'
+            ]
+        }
+    },
+    'payment_questions': {
+        'patterns': [r'payment', r'invoice', r'due', r'fee', r'cost'],
+        'recommendation': {
+            'title': 'Payment Terms Review',
+            'description': 'Your question relates to payment terms which affect cash flow.',
+            'type': RecommendationType.INFORMATION,
+            'priority': RecommendationPriority.MEDIUM,
+            'reasoning': 'Payment terms impact financial planning and obligations.',
+            'actions': [
+                'Review payment schedules',
+                'Note due dates and penalties',
+                'Understand payment methods',
+                'Check for advance payment requirements'
+            ]
         }
-        return priority_scores.get(priority, 0)
+    },
+    'confidentiality_questions': {
+        'patterns': [r'confidential', r'secret', r'private', r'non-disclosure'],
+        'recommendation': {
+            'title': 'Confidentiality Obligations',
+            'description': 'Your question involves confidentiality provisions.',
+            'type': RecommendationType.WARNING,
+            'priority': RecommendationPriority.HIGH,
+            'reasoning': 'Confidentiality clauses have long-term implications for information sharing.',
+            'actions': [
+                'Review confidentiality scope',
+                'Understand duration of obligations',
+                'Identify permitted disclosures',
+                'Check for return requirements'
+            ]
+        }
+    }
+}
+
+_QUESTION_COMBINED_RE = _compile_question_patterns(_QUESTION_PATTERNS)
 
 class QuestionBasedRecommender:
     """Generates recommendations based on specific user questions."""
     
     def __init__(self):
         """Initialize question-based recommender."""
-        self.question_patterns = self._initialize_question_patterns()
-    
-    def _initialize_question_patterns(self) -> Dict[str, Dict[str, Any]]:
-        """Initialize patterns for different question types."""
-        return {
-            'liability_questions': {
-                'patterns': [r'liability', r'damages', r'indemnification', r'hold harmless'],
-                'recommendation': {
-                    'title': 'Liability Analysis Required',
-                    'description': 'Your question relates to liability provisions which are critical contract terms.',
-                    'type': RecommendationType.WARNING,
-                    'priority': RecommendationPriority.HIGH,
-                    'reasoning': 'Liability clauses determine financial exposure and legal obligations.',
-                    'actions': [
-                        'Review all liability-related clauses',
-                        'Understand scope of indemnification',
-                        'Check for liability caps or exclusions',
-                        'Consider insurance requirements'
-                    ]
-                }
-            },
-            'termination_questions': {
-                'patterns': [r'terminate', r'cancel', r'end', r'breach', r'default'],
-                'recommendation': {
-                    'title': 'Termination Rights Analysis',
-                    'description': 'Your question involves termination provisions which define exit conditions.',
-                    'type': RecommendationType.ADVICE,
-                    'priority': RecommendationPriority.MEDIUM,
-                    'reasoning': 'Termination clauses affect how and when parties can end the agreement.',
-                    'actions': [
-                        'Identify termination triggers',
-                        'Review notice requirements',
-                        'Understand post-termination obligations',
-                        'Check for termination fees'
-                    ]
-                }
-            },
-            'payment_questions': {
-                'patterns': [r'payment', r'invoice', r'due', r'fee', r'cost'],
-                'recommendation': {
-                    'title': 'Payment Terms Review',
-                    'description': 'Your question relates to payment terms which affect cash flow.',
-                    'type': RecommendationType.INFORMATION,
-                    'priority': RecommendationPriority.MEDIUM,
-                    'reasoning': 'Payment terms impact financial planning and obligations.',
-                    'actions': [
-                        'Review payment schedules',
-                        'Note due dates and penalties',
-                        'Understand payment methods',
-                        'Check for advance payment requirements'
-                    ]
-                }
-            },
-            'confidentiality_questions': {
-                'patterns': [r'confidential', r'secret', r'private', r'non-disclosure'],
-                'recommendation': {
-                    'title': 'Confidentiality Obligations',
-                    'description': 'Your question involves confidentiality provisions.',
-                    'type': RecommendationType.WARNING,
-                    'priority': RecommendationPriority.HIGH,
-                    'reasoning': 'Confidentiality clauses have long-term implications for information sharing.',
-                    'actions': [
-                        'Review confidentiality scope',
-                        'Understand duration of obligations',
-                        'Identify permitted disclosures',
-                        'Check for return requirements'
-                    ]
-                }
-            }
-        }
+        self.question_patterns = _QUESTION_PATTERNS
+        self._combined_pattern = _QUESTION_COMBINED_RE
+        self._recommendations_cached = lru_cache(maxsize=ANALYSIS_CACHE_SIZE)(self._question_recommendations)
     
     def get_question_recommendations(self, question: str, document_context: str = None) -> List[LegalRecommendation]:
         """Generate recommendations based on user question."""
         try:
-            recommendations = []
-            question_lower = question.lower()
-            
-            for pattern_name, pattern_config in self.question_patterns.items():
-                if any(re.search(pattern, question_lower) for pattern in pattern_config['patterns']):
-                    rec_config = pattern_config['recommendation']
-                    
-                    recommendation = LegalRecommendation(
-                        title=rec_config['title'],
-                        description=rec_config['description'],
-                        recommendation_type=rec_config['type'],
-                        priority=rec_config['priority'],
-                        reasoning=rec_config['reasoning'],
-                        suggested_actions=rec_config['actions'],
-                        confidence=0.9
-                    )
-                    recommendations.append(recommendation)
-            
-            return recommendations
+            # Patterns are case-insensitive, so the lowercased question is a complete cache key
+            return list(self._recommendations_cached(question.lower()))
             
         except Exception as e:
-            logger.error(f"Error generating question recommendations: {e}")
+            logger.exception("Error generating question recommendations: %s", e)
             return []
+    
+    def _question_recommendations(self, question_lower: str) -> Tuple[LegalRecommendation, ...]:
+        """Build the recommendations for a lowercased question."""
+        recommendations = []
+        
+        # One scan of the question classifies it against every pattern group
+        matched = set()
+        for match in self._combined_pattern.finditer(question_lower):
+            matched.add(match.lastgroup)
+            if len(matched) == len(self.question_patterns):
+                break
+        
+        for pattern_name, pattern_config in self.question_patterns.items():
+            if pattern_name in matched:
+                rec_config = pattern_config['recommendation']
+                
+                recommendation = LegalRecommendation(
+                    title=rec_config['title'],
+                    description=rec_config['description'],
+                    recommendation_type=rec_config['type'],
+                    priority=rec_config['priority'],
+                    reasoning=rec_config['reasoning'],
+                    suggested_actions=rec_config['actions'],
+                    confidence=0.9
+                )
+                recommendations.append(recommendation)
+        
+        return tuple(recommendations)
 
 class RecommendationManager:
     """Main manager for generating and organizing recommendations."""
     
+    # Payload keys of the organized recommendations, highest priority first
+    _PRIORITY_KEYS = tuple(priority.label for priority in sorted(RecommendationPriority, reverse=True))
+    
     def __init__(self):
         """Initialize recommendation manager."""
         self.rule_engine = LegalRuleEngine()
@@ -428,33 +556,34 @@ class RecommendationManager:
                                              clauses: List[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Generate comprehensive recommendations for a document."""
         try:
-            recommendations = []
-            
             # Document-based recommendations
             doc_recommendations = self.rule_engine.analyze_document_for_recommendations(
                 document_text, red_flags, clauses
             )
-            recommendations.extend(doc_recommendations)
             
             # Question-based recommendations
-            if question:
-                question_recommendations = self.question_recommender.get_question_recommendations(question)
-                recommendations.extend(question_recommendations)
+            question_recommendations = (
+                self.question_recommender.get_question_recommendations(question) if question else []
+            )
             
-            # Remove duplicates and organize
-            unique_recommendations = self._remove_duplicates(recommendations)
+            # Keep the first recommendation per title while streaming, then organize
+            by_title = {}
+            for rec in chain(doc_recommendations, question_recommendations):
+                by_title.setdefault(rec.title, rec)
+            unique_recommendations = list(by_title.values())
             organized_recommendations = self._organize_by_priority(unique_recommendations)
+            priority_counts = Counter(rec.priority for rec in unique_recommendations)
             
             return {
                 'recommendations': organized_recommendations,
                 'total_count': len(unique_recommendations),
-                'critical_count': len([r for r in unique_recommendations if r.priority == RecommendationPriority.CRITICAL]),
-                'high_count': len([r for r in unique_recommendations if r.priority == RecommendationPriority.HIGH]),
-                'summary': self._generate_summary(unique_recommendations)
+                'critical_count': priority_counts[RecommendationPriority.CRITICAL],
+                'high_count': priority_counts[RecommendationPriority.HIGH],
+                'summary': self._generate_summary(priority_counts, len(unique_recommendations))
             }
             
         except Exception as e:
-            logger.error(f"Error generating comprehensive recommendations: {e}")
+            logger.exception("Error generating comprehensive recommendations: %s", e)
             return {
                 'recommendations': {},
                 'total_count': 0,
@@ -463,56 +592,30 @@ class RecommendationManager:
                 'summary': 'Error generating recommendations'
             }
     
-    def _remove_duplicates(self, recommendations: List[LegalRecommendation]) -> List[LegalRecommendation]:
-        """Remove duplicate recommendations based on title."""
-        seen_titles = set()
-        unique_recommendations = []
-        
-        for rec in recommendations:
-            if rec.title not in seen_titles:
-                seen_titles.add(rec.title)
-                unique_recommendations.append(rec)
-        
-        return unique_recommendations
-    
     def _organize_by_priority(self, recommendations: List[LegalRecommendation]) -> Dict[str, List[Dict[str, Any]]]:
         """Organize recommendations by priority level."""
-        organized = {
-            'critical': [],
-            'high': [],
-            'medium': [],
-            'low': []
-        }
+        # One bucket per priority, LOW..CRITICAL, indexed by the priority value - 1
+        buckets = tuple([] for _ in RecommendationPriority)
         
         for rec in recommendations:
-            priority_key = rec.priority.value
-            organized[priority_key].append({
-                'title': rec.title,
-                'description': rec.description,
-                'type': rec.recommendation_type.value,
-                'reasoning': rec.reasoning,
-                'suggested_actions': rec.suggested_actions,
-                'confidence': rec.confidence,
-                'related_clauses': rec.related_clauses or [],
-                'related_red_flags': rec.related_red_flags or []
-            })
+            buckets[rec.priority - 1].append(rec.to_payload())
         
-        return organized
+        return dict(zip(self._PRIORITY_KEYS, reversed(buckets)))
     
-    def _generate_summary(self, recommendations: List[LegalRecommendation]) -> str:
-        """Generate summary of recommendations."""
-        if not recommendations:
+    def _generate_summary(self, priority_counts: Counter, total_count: int) -> str:
+        """Generate summary of recommendations from their priority counts."""
+        if not total_count:
             return "No specific recommendations at this time."
         
-        critical_count = len([r for r in recommendations if r.priority == RecommendationPriority.CRITICAL])
-        high_count = len([r for r in recommendations if r.priority == RecommendationPriority.HIGH])
+        critical_count = priority_counts[RecommendationPriority.CRITICAL]
+        high_count = priority_counts[RecommendationPriority.HIGH]
         
         if critical_count > 0:
             return f"⚠️ {critical_count} critical and {high_count} high-priority recommendations require immediate attention."
         elif high_count > 0:
             return f"⚠️ {high_count} high-priority recommendations should be reviewed."
         else:
-            return f"📋 {len(recommendations)} recommendations for review."
+            return f"📋 {total_count} recommendations for review."
 
 # Global recommendation manager instance
 recommendation_manager = RecommendationManager()
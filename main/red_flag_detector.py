@@ -3,20 +3,106 @@ Red-Flag Detection System
 Identifies potential risks and issues in legal documents.
 """
 
+import os
 import re
+import sys
+import string
+import codecs
 import logging
-from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass
-from enum import Enum
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain
+from typing import Callable, Dict, Iterable, List, Tuple, Optional
+from dataclasses import dataclass, field
+from enum import Enum, IntEnum
+
+import numpy as np
+
+try:
+    import re2
+except ImportError:  # google-re2 not installed - scan with regex or re
+    re2 = None
+
+try:
+    import regex
+except ImportError:  # regex not installed - scan with the standard re module
+    regex = None
+
+try:
+    import hyperscan
+except ImportError:  # hyperscan not installed - prefilter with the regex engine
+    hyperscan = None
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick not installed - fall back to per-keyword scans
+    ahocorasick = None
 
 logger = logging.getLogger(__name__)
 
-class RiskLevel(Enum):
-    """Risk levels for red flags."""
-    LOW = "low"
-    MEDIUM = "medium"
-    HIGH = "high"
-    CRITICAL = "critical"
+# Number of (page text, page number) results kept by each detector
+RED_FLAG_CACHE_SIZE = 512
+
+# Legal terminology that supports a red flag when it appears near the match
+LEGAL_TERMS = ('shall', 'will', 'must', 'obligation', 'liability', 'damages')
+
+# dataclass(slots=True) needs Python 3.10+; PythonAnywhere still runs 3.9
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# Pages are scanned as ASCII bytes so every engine sees the same characters at the same
+# offsets. Python's re treats \v and \x1c-\x1f as whitespace on str, the engines'
+# byte modes do not; map them to spaces. Letters are lowercased in the same pass so the
+# patterns are matched case-sensitively, without any engine's IGNORECASE handling
+_ASCII_SUBJECT_TABLE = bytes.maketrans(
+    b'\v\x1c\x1d\x1e\x1f' + string.ascii_uppercase.encode('ascii'),
+    b'     ' + string.ascii_lowercase.encode('ascii')
+)
+
+# Pattern escapes and uppercase letters, to lowercase the letters outside escapes
+_PATTERN_LETTER_RE = re.compile(r'\\.|[A-Z]', re.DOTALL)
+
+# Non-ASCII characters that re's IGNORECASE matches against ASCII letters, as lowercase
+_ASCII_CASE_EQUIVALENTS = {'\u0130': 'i', '\u0131': 'i', '\u017f': 's', '\u212a': 'k'}
+
+@lru_cache(maxsize=4096)
+def _ascii_standin(char: str) -> str:
+    """ASCII character the red flag patterns treat like char under re's Unicode rules."""
+    if char in _ASCII_CASE_EQUIVALENTS:
+        return _ASCII_CASE_EQUIVALENTS[char]
+    if char.isspace():
+        return ' '
+    if char.isdecimal():
+        return '0'
+    if char.isalnum():
+        return '_'  # Word character that no pattern matches literally
+    return '#'
+
+def _ascii_standin_errors(error: UnicodeEncodeError) -> Tuple[str, int]:
+    """Encoding error handler replacing each non-ASCII character with its stand-in."""
+    return ''.join(map(_ascii_standin, error.object[error.start:error.end])), error.end
+
+codecs.register_error('red_flag_ascii', _ascii_standin_errors)
+
+def _lowercase_pattern(pattern: str) -> str:
+    """Lowercase the letters of a pattern, leaving escapes such as \\S untouched."""
+    return _PATTERN_LETTER_RE.sub(
+        lambda match: match.group() if match.group().startswith('\\') else match.group().lower(),
+        pattern
+    )
+
+class RiskLevel(IntEnum):
+    """Risk levels for red flags, ordered so higher values are riskier."""
+    LOW = 1
+    MEDIUM = 2
+    HIGH = 3
+    CRITICAL = 4
+    
+    @property
+    def label(self) -> str:
+        """Lowercase name stored on RedFlag.risk_level and used in summaries."""
+        return self.name.lower()
 
 class RedFlagCategory(Enum):
     """Categories of red flags."""
@@ -27,9 +113,12 @@ class RedFlagCategory(Enum):
     REPUTATIONAL = "reputational"
     STRATEGIC = "strategic"
 
-@dataclass
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class DetectedRedFlag:
-    """Represents a detected red flag."""
+    """Represents a detected red flag.
+    
+    Frozen because the detection cache hands the same instances to every caller.
+    """
     category: RedFlagCategory
     risk_level: RiskLevel
     title: str
@@ -39,9 +128,46 @@ class DetectedRedFlag:
     end_pos: int
     confidence: float
     page_number: int
-    context: str
-    recommendations: List[str]
+    context_start: int
+    context_end: int
+    recommendations: Tuple[str, ...]
     reasoning: str
+    source_text: str = field(default='', repr=False, compare=False)
+    
+    @property
+    def context(self) -> str:
+        """Text around the match, sliced from the page text only when it is read."""
+        return self.source_text[self.context_start:self.context_end]
+
+# Compiled matchers by (patterns, keywords), see RedFlagDetector._compile_matchers
+_COMPILED_MATCHERS: Dict[Tuple, Tuple] = {}
+
+class _HyperscanPrefilter:
+    """Finds where the patterns' leading words start with one Hyperscan block scan."""
+    
+    def __init__(self, words: List[str]):
+        expressions = [rb'\b' + word.encode('ascii') for word in words]
+        self._database = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+        self._database.compile(
+            expressions=expressions,
+            ids=list(range(len(expressions))),
+            elements=len(expressions),
+            flags=[hyperscan.HS_FLAG_SOM_LEFTMOST] * len(expressions)
+        )
+        # Scratch space cannot be shared by concurrent scans, keep one per thread
+        self._local = threading.local()
+    
+    def __call__(self, subject: bytes) -> List[int]:
+        scratch = getattr(self._local, 'scratch', None)
+        if scratch is None:
+            scratch = self._local.scratch = hyperscan.Scratch(self._database)
+        starts = set()
+        self._database.scan(
+            subject,
+            match_event_handler=lambda _id, start, _end, _flags, _context: starts.add(start),
+            scratch=scratch
+        )
+        return sorted(starts)
 
 class RedFlagDetector:
     """Main class for detecting red flags in legal documents."""
@@ -50,7 +176,170 @@ class RedFlagDetector:
         """Initialize the red flag detector with patterns and rules."""
         self.red_flag_patterns = self._initialize_patterns()
         self.risk_keywords = self._initialize_risk_keywords()
+        self._risk_keywords_lower = {
+            risk_level: tuple(keyword.lower() for keyword in keywords)
+            for risk_level, keywords in self.risk_keywords.items()
+        }
+        self._levels_desc = sorted(self._risk_keywords_lower, reverse=True)
+        self._keywords = self._all_keywords()
+        self._compile_matchers()
+        # Red flags are a pure function of the page text and number, so re-analyzing an
+        # unchanged page is served from the cache
+        self._detect_cached = lru_cache(maxsize=RED_FLAG_CACHE_SIZE)(self._detect)
+    
+    def _compile_matchers(self) -> None:
+        """Set up the combined pattern, its prefilter and the keyword automaton."""
+        self._pattern_table = [
+            (category, pattern_info)
+            for category, patterns in self.red_flag_patterns.items()
+            for pattern_info in patterns
+        ]
+        patterns = tuple(pattern_info['pattern'] for _, pattern_info in self._pattern_table)
+        
+        # Compiled once per process and shared by every detector with the same patterns
+        # and keywords, so building a detector costs no compilation
+        key = (patterns, frozenset(self._keywords))
+        compiled = _COMPILED_MATCHERS.get(key)
+        if compiled is None:
+            combined, prefilter = self._combine_patterns(patterns)
+            compiled = _COMPILED_MATCHERS[key] = (combined, prefilter, self._build_keyword_automaton())
+        self._combined_pattern, self._prefilter, self._keyword_automaton = compiled
+    
+    def __getstate__(self) -> Dict:
+        """Drop the compiled matchers when pickling, RE2 patterns cannot be pickled."""
+        state = self.__dict__.copy()
+        for name in ('_pattern_table', '_combined_pattern', '_prefilter', '_keyword_automaton', '_detect_cached'):
+            state.pop(name, None)
+        return state
+    
+    def __setstate__(self, state: Dict) -> None:
+        """Restore a pickled detector and recompile its matchers."""
+        self.__dict__.update(state)
+        self._compile_matchers()
+        self._detect_cached = lru_cache(maxsize=RED_FLAG_CACHE_SIZE)(self._detect)
+    
+    def _build_keyword_automaton(self):
+        """Build one Aho-Corasick automaton over every risk keyword and legal term."""
+        if ahocorasick is None:
+            return None
+        automaton = ahocorasick.Automaton()
+        for keyword in self._keywords:
+            automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+        return automaton
+    
+    def _all_keywords(self) -> set:
+        """Lowercased risk keywords and legal terms scored in a match's context."""
+        keywords = set(LEGAL_TERMS)
+        for risk_keywords in self._risk_keywords_lower.values():
+            keywords.update(risk_keywords)
+        return keywords
+    
+    def _find_keywords(self, context_lower: str) -> set:
+        """Find which keywords occur in the lowercased context."""
+        if self._keyword_automaton is not None:
+            # Single linear pass over the context instead of one scan per keyword
+            return {keyword for _, keyword in self._keyword_automaton.iter(context_lower)}
+        return {keyword for keyword in self._keywords if keyword in context_lower}
+    
+    def _combine_patterns(
+        self, 
+        patterns: Tuple[str, ...]
+    ) -> Tuple[re.Pattern, Optional[Callable[[bytes], Iterable[int]]]]:
+        """Fuse every pattern into one alternation with a named group per pattern, plus its prefilter."""
+        # The subject is lowercased before scanning, so the patterns must be too
+        patterns = [_lowercase_pattern(pattern) for pattern in patterns]
+        prefix, prefilter = '', None
+        # Every pattern starts at a word boundary; testing it once for the whole alternation
+        # lets most positions fail before any branch is tried
+        if all(pattern.startswith(r'\b') for pattern in patterns):
+            prefix, patterns = r'\b', [pattern[2:] for pattern in patterns]
+            prefilter = self._build_prefilter(patterns)
+        alternation = "|".join(f"(?P<p{index}>{pattern})" for index, pattern in enumerate(patterns))
+        combined = self._compile_combined(f"{prefix}(?:{alternation})".encode('ascii'))
+        return combined, prefilter
+    
+    def _build_prefilter(self, patterns: List[str]) -> Optional[Callable[[bytes], Iterable[int]]]:
+        """
+        Compile a scan for the leading word of every pattern alternative.
         
+        Returns:
+            A function giving the positions where a red flag match can start, in order, or
+            None when some alternative does not start with a literal word
+        """
+        words = set()
+        for pattern in patterns:
+            # Patterns have the shape (alternative|alternative)\b with no nested groups
+            if not (pattern.startswith('(') and pattern.endswith(r')\b')) or '(' in pattern[1:]:
+                return None
+            for alternative in pattern[1:-3].split('|'):
+                word = re.match(r'[a-z]*', alternative).group()
+                if alternative[len(word):len(word) + 1] in ('?', '*', '{'):
+                    word = word[:-1]  # the last letter is optional
+                if not word:
+                    return None
+                words.add(word)
+        if hyperscan is not None:
+            try:
+                return _HyperscanPrefilter(sorted(words))
+            except Exception as e:
+                logger.warning(f"Hyperscan rejected the red flag prefilter, falling back: {e}")
+        
+        # Words are word characters only, so non-overlapping hits miss no word boundary
+        alternation = "|".join(sorted(words, key=len, reverse=True))
+        prefilter = self._compile_combined(rf"\b(?:{alternation})".encode('ascii'))
+        return lambda subject: (match.start() for match in prefilter.finditer(subject))
+    
+    @staticmethod
+    def _compile_combined(pattern: bytes):
+        """Compile the combined pattern with the fastest installed engine: RE2, regex, then re."""
+        if re2 is not None:
+            try:
+                return re2.compile(pattern)
+            except Exception as e:
+                logger.warning(f"RE2 rejected the red flag patterns, falling back: {e}")
+        if regex is not None:
+            return regex.compile(pattern)
+        return re.compile(pattern)
+    
+    def _find_pattern_matches(self, text: str) -> List[List[Tuple[int, int]]]:
+        """Scan the text once and return the (start, end) spans of each pattern's matches."""
+        spans = [[] for _ in self._pattern_table]
+        # Each pattern reports non-overlapping matches, as its own finditer would
+        next_start = [0] * len(self._pattern_table)
+        
+        # One ASCII byte per character keeps match offsets equal to character offsets
+        subject = text.encode('ascii', 'red_flag_ascii').translate(_ASCII_SUBJECT_TABLE)
+        for match in self._iter_matches(subject):
+            group = match.lastgroup
+            index = int(group[1:])  # b'p<index>' (str from some RE2 builds)
+            start_pos, end_pos = match.span()
+            if start_pos >= next_start[index]:
+                next_start[index] = end_pos
+                spans[index].append((start_pos, end_pos))
+        
+        return spans
+    
+    def _iter_matches(self, subject: bytes):
+        """Yield the combined pattern's match at each position where one starts."""
+        if self._prefilter is not None:
+            # Only a leading word can start a match, so the full pattern is tried at
+            # those positions alone instead of being searched across the whole text
+            match_at = self._combined_pattern.match
+            for candidate in self._prefilter(subject):
+                match = match_at(subject, candidate)
+                if match:
+                    yield match
+            return
+        
+        search = self._combined_pattern.search
+        match = search(subject)
+        while match:
+            yield match
+            # Resume right after the match start rather than its end, so a match of one
+            # pattern never hides an overlapping match of another
+            match = search(subject, match.start() + 1)
+    
     def _initialize_patterns(self) -> Dict[RedFlagCategory, List[Dict]]:
         """Initialize patterns for different red flag categories."""
         return {
@@ -60,33 +349,33 @@ class RedFlagDetector:
                     'title': 'Unlimited Liability Clause',
                     'description': 'Contract contains unlimited liability provisions',
                     'risk_level': RiskLevel.CRITICAL,
-                    'recommendations': [
+                    'recommendations': (
                         'Negotiate liability caps',
                         'Add insurance requirements',
                         'Include limitation of liability clause'
-                    ]
+                    )
                 },
                 {
                     'pattern': r'\b(liquidated\s+damages.*exceed.*\d+%|penalty.*\d+%)\b',
                     'title': 'Excessive Liquidated Damages',
                     'description': 'Liquidated damages exceed reasonable amounts',
                     'risk_level': RiskLevel.HIGH,
-                    'recommendations': [
+                    'recommendations': (
                         'Negotiate lower penalty amounts',
                         'Ensure damages are reasonable',
                         'Add cure period before penalties'
-                    ]
+                    )
                 },
                 {
                     'pattern': r'\b(automatic\s+renewal.*\d+\s+years|renew.*\d+\s+years)\b',
                     'title': 'Long Auto-Renewal Period',
                     'description': 'Automatic renewal for extended periods',
                     'risk_level': RiskLevel.MEDIUM,
-                    'recommendations': [
+                    'recommendations': (
                         'Shorten renewal periods',
                         'Add termination rights',
                         'Include price escalation limits'
-                    ]
+                    )
                 }
             ],
             RedFlagCategory.LEGAL: [
@@ -95,33 +384,33 @@ class RedFlagDetector:
                     'title': 'Broad Rights Waiver',
                     'description': 'Contract requires waiver of all legal rights',
                     'risk_level': RiskLevel.CRITICAL,
-                    'recommendations': [
+                    'recommendations': (
                         'Limit scope of waiver',
                         'Preserve essential rights',
                         'Add carve-outs for statutory rights'
-                    ]
+                    )
                 },
                 {
                     'pattern': r'\b(exclusive\s+jurisdiction.*\d+\s+states\s+away|venue.*remote)\b',
                     'title': 'Unfavorable Jurisdiction',
                     'description': 'Jurisdiction clause favors other party',
                     'risk_level': RiskLevel.HIGH,
-                    'recommendations': [
+                    'recommendations': (
                         'Negotiate neutral jurisdiction',
                         'Consider arbitration clause',
                         'Add choice of law provisions'
-                    ]
+                    )
                 },
                 {
                     'pattern': r'\b(no\s+remedy\s+for\s+breach|exclusive\s+remedy.*limited)\b',
                     'title': 'Limited Remedies',
                     'description': 'Contract severely limits available remedies',
                     'risk_level': RiskLevel.HIGH,
-                    'recommendations': [
+                    'recommendations': (
                         'Expand available remedies',
                         'Add specific performance rights',
                         'Include injunctive relief'
-                    ]
+                    )
                 }
             ],
             RedFlagCategory.OPERATIONAL: [
@@ -130,33 +419,33 @@ class RedFlagDetector:
                     'title': 'Immediate Termination Rights',
                     'description': 'Contract allows immediate termination without notice',
                     'risk_level': RiskLevel.HIGH,
-                    'recommendations': [
+                    'recommendations': (
                         'Add notice periods',
                         'Include cure periods',
                         'Define termination events'
-                    ]
+                    )
                 },
                 {
                     'pattern': r'\b(change\s+terms\s+unilaterally|modify\s+without\s+consent)\b',
                     'title': 'Unilateral Modification Rights',
                     'description': 'Other party can modify terms without consent',
                     'risk_level': RiskLevel.CRITICAL,
-                    'recommendations': [
+                    'recommendations': (
                         'Require mutual consent for changes',
                         'Add notice requirements',
                         'Include right to terminate on material changes'
-                    ]
+                    )
                 },
                 {
                     'pattern': r'\b(assign\s+without\s+consent|transfer\s+freely)\b',
                     'title': 'Unrestricted Assignment',
                     'description': 'Contract can be assigned without consent',
                     'risk_level': RiskLevel.MEDIUM,
-                    'recommendations': [
+                    'recommendations': (
                         'Add assignment restrictions',
                         'Require written consent',
                         'Include right to terminate on assignment'
-                    ]
+                    )
                 }
             ],
             RedFlagCategory.COMPLIANCE: [
@@ -165,33 +454,33 @@ class RedFlagDetector:
                     'title': 'Unlimited Compliance Obligations',
                     'description': 'Broad compliance requirements without limits',
                     'risk_level': RiskLevel.HIGH,
-                    'recommendations': [
+                    'recommendations': (
                         'Limit compliance scope',
                         'Add reasonable efforts standard',
                         'Include compliance cost sharing'
-                    ]
+                    )
                 },
                 {
                     'pattern': r'\b(waive\s+regulatory\s+rights|comply\s+with\s+future\s+laws)\b',
                     'title': 'Future Law Compliance',
                     'description': 'Must comply with future unknown laws',
                     'risk_level': RiskLevel.MEDIUM,
-                    'recommendations': [
+                    'recommendations': (
                         'Limit to current laws',
                         'Add materiality threshold',
                         'Include cost impact analysis'
-                    ]
+                    )
                 },
                 {
                     'pattern': r'\b(no\s+audit\s+rights|confidential\s+information.*no\s+access)\b',
                     'title': 'No Audit Rights',
                     'description': 'No right to audit or verify compliance',
                     'risk_level': RiskLevel.MEDIUM,
-                    'recommendations': [
+                    'recommendations': (
                         'Add audit rights',
                         'Include reporting requirements',
                         'Add verification procedures'
-                    ]
+                    )
                 }
             ],
             RedFlagCategory.REPUTATIONAL: [
@@ -200,22 +489,22 @@ class RedFlagDetector:
                     'title': 'Public Disclosure Risks',
                     'description': 'Contract may lead to negative publicity',
                     'risk_level': RiskLevel.MEDIUM,
-                    'recommendations': [
+                    'recommendations': (
                         'Add confidentiality provisions',
                         'Include press release controls',
                         'Add reputation protection clauses'
-                    ]
+                    )
                 },
                 {
                     'pattern': r'\b(use\s+name.*advertising|endorsement.*without\s+consent)\b',
                     'title': 'Unauthorized Use of Name',
                     'description': 'Other party can use your name without consent',
                     'risk_level': RiskLevel.HIGH,
-                    'recommendations': [
+                    'recommendations': (
                         'Require written consent',
                         'Add approval rights',
                         'Include usage guidelines'
-                    ]
+                    )
                 }
             ],
             RedFlagCategory.STRATEGIC: [
@@ -224,36 +513,39 @@ class RedFlagDetector:
                     'title': 'Overly Restrictive Exclusivity',
                     'description': 'Exclusivity provisions are too broad',
                     'risk_level': RiskLevel.HIGH,
-                    'recommendations': [
+                    'recommendations': (
                         'Limit exclusivity scope',
                         'Add reasonable restrictions',
                         'Include termination rights'
-                    ]
+                    )
                 },
                 {
                     'pattern': r'\b(technology\s+transfer.*irrevocable|perpetual\s+license)\b',
                     'title': 'Irrevocable Technology Transfer',
                     'description': 'Technology rights are irrevocable',
                     'risk_level': RiskLevel.CRITICAL,
-                    'recommendations': [
+                    'recommendations': (
                         'Add termination conditions',
                         'Include reversion rights',
                         'Limit license scope'
-                    ]
+                    )
                 },
                 {
                     'pattern': r'\b(most\s+favored\s+nation|mfn.*unlimited)\b',
                     'title': 'Broad MFN Clause',
                     'description': 'Most favored nation clause is too broad',
                     'risk_level': RiskLevel.MEDIUM,
-                    'recommendations': [
+                    'recommendations': (
                         'Limit MFN scope',
                         'Add exclusions',
                         'Include notification requirements'
-                    ]
+                    )
                 }
             ]
         }
+
+        
+        return red_flag_patterns
     
     def _initialize_risk_keywords(self) -> Dict[RiskLevel, List[str]]:
         """Initialize keywords that indicate risk levels."""
@@ -287,128 +579,159 @@ class RedFlagDetector:
         Returns:
             List of detected red flags
         """
-        detected_flags = []
+        return list(self._detect_cached(text, page_number))
+    
+    def _detect(self, text: str, page_number: int) -> Tuple[DetectedRedFlag, ...]:
+        """Detect red flags in the given text, sorted by risk level and confidence."""
+        matches = []
         
-        # Detect red flags using pattern matching
-        for category, patterns in self.red_flag_patterns.items():
-            for pattern_info in patterns:
-                pattern = pattern_info['pattern']
-                title = pattern_info['title']
-                description = pattern_info['description']
-                base_risk_level = pattern_info['risk_level']
-                recommendations = pattern_info['recommendations']
-                
-                # Find all matches
-                matches = re.finditer(pattern, text, re.IGNORECASE)
-                
-                for match in matches:
-                    start_pos = match.start()
-                    end_pos = match.end()
-                    matched_text = match.group()
-                    
-                    # Get context around the match
-                    context_start = max(0, start_pos - 300)
-                    context_end = min(len(text), end_pos + 300)
-                    context = text[context_start:context_end]
-                    
-                    # Calculate confidence based on context
-                    confidence = self._calculate_confidence(
-                        matched_text, context, base_risk_level
-                    )
-                    
-                    # Determine risk level
-                    risk_level = self._determine_risk_level(
-                        matched_text, context, base_risk_level
-                    )
-                    
-                    # Generate reasoning
-                    reasoning = self._generate_reasoning(
-                        category, title, matched_text, context, confidence
-                    )
-                    
-                    # Create detected red flag
-                    red_flag = DetectedRedFlag(
-                        category=category,
-                        risk_level=risk_level,
-                        title=title,
-                        description=description,
-                        text=matched_text,
-                        start_pos=start_pos,
-                        end_pos=end_pos,
-                        confidence=confidence,
-                        page_number=page_number,
-                        context=context,
-                        recommendations=recommendations,
-                        reasoning=reasoning
-                    )
-                    
-                    detected_flags.append(red_flag)
+        # Detect red flags using pattern matching, one scan of the text for all patterns
+        pattern_spans = self._find_pattern_matches(text)
+        for (category, pattern_info), spans in zip(self._pattern_table, pattern_spans):
+            for start_pos, end_pos in spans:
+                # Get context around the match
+                context_start = max(0, start_pos - 300)
+                context_end = min(len(text), end_pos + 300)
+                matches.append((category, pattern_info, start_pos, end_pos, context_start, context_end))
+        
+        if not matches:
+            return ()
+        
+        # Score every match from one keyword scan of its lowercased context
+        keyword_counts, legal_term_counts, risk_levels = zip(*(
+            self._score_match(text[context_start:context_end].lower(), pattern_info['risk_level'])
+            for _, pattern_info, _, _, context_start, context_end in matches
+        ))
+        
+        # Calculate confidence based on context, for every match at once
+        confidences = self._calculate_confidences(keyword_counts, legal_term_counts)
+        
+        detected_flags = []
+        for (category, pattern_info, start_pos, end_pos, context_start, context_end), confidence, risk_level in zip(
+            matches, confidences, risk_levels
+        ):
+            matched_text = text[start_pos:end_pos]
+            title = pattern_info['title']
+            
+            # Generate reasoning
+            # Split off only the first 15 words instead of the whole context
+            context_words = text[context_start:context_end].split(None, 15)[:15]
+            reasoning = self._generate_reasoning(
+                category, title, matched_text, context_words, confidence
+            )
+            
+            # Create detected red flag
+            red_flag = DetectedRedFlag(
+                category=category,
+                risk_level=risk_level,
+                title=title,
+                description=pattern_info['description'],
+                text=matched_text,
+                start_pos=start_pos,
+                end_pos=end_pos,
+                confidence=confidence,
+                page_number=page_number,
+                context_start=context_start,
+                context_end=context_end,
+                recommendations=pattern_info['recommendations'],
+                reasoning=reasoning,
+                source_text=text
+            )
+            
+            detected_flags.append(red_flag)
         
         # Sort by risk level and confidence
         detected_flags.sort(
-            key=lambda x: (self._risk_score(x.risk_level), x.confidence),
+            key=lambda x: (x.risk_level, x.confidence),
             reverse=True
         )
         
-        return detected_flags
+        return tuple(detected_flags)
     
-    def _calculate_confidence(
+    def detect_red_flags_pages(
         self, 
-        matched_text: str, 
-        context: str, 
-        base_risk_level: RiskLevel
-    ) -> float:
-        """Calculate confidence score for a detected red flag."""
-        confidence = 0.6  # Base confidence for red flags
+        pages: List[Tuple[str, int]], 
+        max_workers: Optional[int] = None
+    ) -> List[DetectedRedFlag]:
+        """
+        Detect red flags on several pages in parallel.
         
-        # Check for risk keywords
-        context_lower = context.lower()
-        risk_keywords = self.risk_keywords.get(base_risk_level, [])
-        keyword_count = sum(1 for keyword in risk_keywords if keyword.lower() in context_lower)
-        confidence += min(0.3, keyword_count * 0.1)
+        Args:
+            pages: (text, page_number) pairs
+            max_workers: Number of workers, defaults to the CPU count
+            
+        Returns:
+            Detected red flags of every page, in page order
         
-        # Check for legal terminology that supports the red flag
-        legal_terms = ['shall', 'will', 'must', 'obligation', 'liability', 'damages']
-        legal_term_count = sum(1 for term in legal_terms if term in context_lower)
-        confidence += min(0.1, legal_term_count * 0.02)
+        Pages scanned in worker processes (the stock re engine) do not fill this
+        detector's cache; only thread and sequential scans do.
+        """
+        if not pages:
+            return []
+        texts, page_numbers = zip(*pages)
+        workers = min(len(pages), max_workers or os.cpu_count() or 1)
         
-        return min(1.0, confidence)
+        page_flags = None
+        if workers > 1:
+            # RE2 and regex release the GIL while matching so threads scan pages in parallel;
+            # the re module holds it, so pages go to worker processes instead
+            executor_class = ThreadPoolExecutor if (re2 is not None or regex is not None) else ProcessPoolExecutor
+            try:
+                with executor_class(max_workers=workers) as executor:
+                    page_flags = list(executor.map(self.detect_red_flags, texts, page_numbers))
+            except Exception as e:
+                # e.g. daemonic worker processes cannot start child processes
+                logger.warning(f"Parallel red flag detection failed, scanning pages sequentially: {e}")
+        if page_flags is None:
+            page_flags = map(self.detect_red_flags, texts, page_numbers)
+        
+        return [red_flag for flags in page_flags for red_flag in flags]
     
-    def _determine_risk_level(
-        self, 
-        matched_text: str, 
-        context: str, 
-        base_risk_level: RiskLevel
-    ) -> RiskLevel:
-        """Determine the risk level of a detected red flag."""
-        context_lower = context.lower()
+    def _score_match(self, context_lower: str, base_risk_level: RiskLevel) -> Tuple[int, int, RiskLevel]:
+        """
+        Score a match from the keywords in its lowercased context.
         
-        # Check for risk keywords that might upgrade the risk level
-        for risk_level, keywords in self.risk_keywords.items():
-            for keyword in keywords:
-                if keyword.lower() in context_lower:
-                    # Upgrade risk level if higher keywords found
-                    if self._risk_score(risk_level) > self._risk_score(base_risk_level):
-                        return risk_level
+        Returns:
+            Base level risk keyword count, legal term count and the determined risk level
+        """
+        found = self._find_keywords(context_lower)
+        keyword_count = sum(keyword in found for keyword in self._risk_keywords_lower.get(base_risk_level, ()))
+        legal_term_count = sum(term in found for term in LEGAL_TERMS)
+        return keyword_count, legal_term_count, self._determine_risk_level(found, base_risk_level)
+    
+    def _calculate_confidences(
+        self, 
+        keyword_counts: Tuple[int, ...], 
+        legal_term_counts: Tuple[int, ...]
+    ) -> List[float]:
+        """Calculate confidence scores for a batch of detected red flags."""
+        # Base confidence for red flags, raised by risk keywords and by legal terminology
+        # that supports the red flag
+        confidences = (
+            0.6
+            + np.minimum(0.3, np.asarray(keyword_counts) * 0.1)
+            + np.minimum(0.1, np.asarray(legal_term_counts) * 0.02)
+        )
+        return np.minimum(1.0, confidences).tolist()
+    
+    def _determine_risk_level(self, found: set, base_risk_level: RiskLevel) -> RiskLevel:
+        """Determine the risk level of a detected red flag from the keywords found near it."""
+        # Check for risk keywords that might upgrade the risk level, highest level first
+        for risk_level in self._levels_desc:
+            if risk_level <= base_risk_level:
+                break
+            # Upgrade risk level if higher keywords found
+            if not found.isdisjoint(self._risk_keywords_lower[risk_level]):
+                return risk_level
         
         return base_risk_level
     
-    def _risk_score(self, risk_level: RiskLevel) -> int:
-        """Get numeric score for risk level."""
-        scores = {
-            RiskLevel.LOW: 1,
-            RiskLevel.MEDIUM: 2,
-            RiskLevel.HIGH: 3,
-            RiskLevel.CRITICAL: 4
-        }
-        return scores.get(risk_level, 1)
-    
     def _generate_reasoning(
         self, 
         category: RedFlagCategory, 
         title: str, 
         matched_text: str, 
-        context: str, 
+        context_words: List[str], 
         confidence: float
     ) -> str:
         """Generate reasoning for the detected red flag."""
@@ -425,41 +748,29 @@ class RedFlagDetector:
         else:
             reasoning_parts.append("Lower confidence - may need review")
         
-        # Add context summary
-        context_words = context.split()[:15]  # First 15 words
+        # Add context summary, from the first 15 words of the context
         reasoning_parts.append(f"Context: {' '.join(context_words)}...")
         
         return ". ".join(reasoning_parts)
     
     def get_red_flag_summary(self, red_flags: List[DetectedRedFlag]) -> Dict:
         """Generate a summary of detected red flags."""
-        summary = {
-            'total_red_flags': len(red_flags),
-            'red_flags_by_category': {},
-            'red_flags_by_risk': {},
-            'high_risk_flags': 0,
-            'critical_flags': 0,
-            'recommendations': []
-        }
+        # Count by category and by risk level
+        category_counts = Counter(red_flag.category.value for red_flag in red_flags)
+        risk_counts = Counter(red_flag.risk_level for red_flag in red_flags)
         
-        for red_flag in red_flags:
-            # Count by category
-            category = red_flag.category.value
-            summary['red_flags_by_category'][category] = summary['red_flags_by_category'].get(category, 0) + 1
-            
-            # Count by risk level
-            risk_level = red_flag.risk_level.value
-            summary['red_flags_by_risk'][risk_level] = summary['red_flags_by_risk'].get(risk_level, 0) + 1
-            
+        return {
+            'total_red_flags': len(red_flags),
+            'red_flags_by_category': dict(category_counts),
+            'red_flags_by_risk': {risk_level.label: count for risk_level, count in risk_counts.items()},
             # Count high risk and critical flags
-            if red_flag.risk_level in [RiskLevel.HIGH, RiskLevel.CRITICAL]:
-                summary['high_risk_flags'] += 1
-            if red_flag.risk_level == RiskLevel.CRITICAL:
-                summary['critical_flags'] += 1
-            
-            # Collect unique recommendations
-            for rec in red_flag.recommendations:
-                if rec not in summary['recommendations']:
-                    summary['recommendations'].append(rec)
-        
-        return summary
+            'high_risk_flags': risk_counts[RiskLevel.HIGH] + risk_counts[RiskLevel.CRITICAL],
+            'critical_flags': risk_counts[RiskLevel.CRITICAL],
+            # Collect unique recommendations, in first-seen order
+            'recommendations': list(dict.fromkeys(
+                chain.from_iterable(red_flag.recommendations for red_flag in red_flags)
+            ))
+        }
+
+# Global red flag detector instance
+red_flag_detector = RedFlagDetector()
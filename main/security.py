@@ -3,14 +3,37 @@ Security utilities for the AI Legal Document Explainer.
 Handles file validation, input sanitization, and security checks.
 """
 
+import hashlib
 import logging
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from django.core.exceptions import ValidationError
 from django.http import HttpRequest
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger(__name__)
 
+# Upload file extensions, a tuple so one str.endswith call checks them all
+ALLOWED_UPLOAD_EXTENSIONS = ('.pdf', '.doc', '.docx', '.txt')
+
+# Characters not allowed in uploaded file names and document titles
+INVALID_FILENAME_CHARS = '<>:"/\\|?*'
+INVALID_FILENAME_RE = re.compile(f'[{re.escape(INVALID_FILENAME_CHARS)}]')
+# Translation table that deletes those characters in a single pass
+INVALID_FILENAME_TABLE = str.maketrans('', '', INVALID_FILENAME_CHARS)
+
+@lru_cache(maxsize=None)
+def _sha_extensions_available() -> bool:
+    """Check whether the CPU has SHA instructions that OpenSSL's SHA-256 can use"""
+    try:
+        with open('/proc/cpuinfo') as cpuinfo:
+            flags = set(cpuinfo.read().split())
+        return 'sha_ni' in flags or 'sha2' in flags
+    except OSError:
+        return False
+
 class SecurityValidator:
     """Security validator class for session and file validation"""
     
@@ -30,6 +53,38 @@ class SecurityValidator:
         except Exception as e:
             logger.error(f"Session security validation error: {e}")
             return {'valid': False, 'error': 'Session validation failed'}
+    
+    def _generate_file_hash(self, file) -> Optional[str]:
+        """Generate the SHA-256 hash of an uploaded file"""
+        try:
+            file.seek(0)
+            if hasattr(hashlib, 'file_digest'):
+                # Python 3.11+ reads and hashes the whole file in C, releasing the GIL
+                return hashlib.file_digest(file.file, 'sha256').hexdigest()
+            
+            sha256_hash = hashlib.sha256()
+            for chunk in file.chunks():
+                sha256_hash.update(chunk)
+            return sha256_hash.hexdigest()
+            
+        except Exception as e:
+            logger.error(f"Error generating file hash: {e}")
+            return None
+        finally:
+            file.seek(0)
+    
+    def hash_files(self, files: List) -> List[Optional[str]]:
+        """Generate SHA-256 hashes of several uploaded files, in order"""
+        if logger.isEnabledFor(logging.DEBUG):
+            # Probed on first use only, reading /proc/cpuinfo is not free
+            logger.debug(f"SHA-256 CPU extensions available: {_sha_extensions_available()}")
+        
+        if len(files) <= 1:
+            return [self._generate_file_hash(file) for file in files]
+        
+        # hashlib releases the GIL while hashing, so files are hashed concurrently
+        with ThreadPoolExecutor(max_workers=min(len(files), os.cpu_count() or 1)) as executor:
+            return list(executor.map(self._generate_file_hash, files))
 
 # Create a global instance
 security_validator = SecurityValidator()
@@ -42,14 +97,11 @@ def file_upload_security(file) -> None:
             raise ValidationError('File too large (max 5MB)')
         
         # Check file extension
-        allowed_extensions = ['.pdf', '.doc', '.docx', '.txt']
-        file_extension = file.name.lower()
-        
-        if not any(file_extension.endswith(ext) for ext in allowed_extensions):
+        if not file.name.lower().endswith(ALLOWED_UPLOAD_EXTENSIONS):
             raise ValidationError('File type not allowed')
         
         # Check file name for dangerous characters
-        if re.search(r'[<>:"/\\|?*]', file.name):
+        if INVALID_FILENAME_RE.search(file.name):
             raise ValidationError('Invalid file name')
         
     except Exception as e:
@@ -8,16 +8,29 @@ import logging
 from typing import List, Dict, Any, Optional, Tuple
 from sentence_transformers import SentenceTransformer
 import faiss
-from sklearn.metrics.pairwise import cosine_similarity
 import json
 import pickle
+import threading
+import uuid
+from collections import OrderedDict
 from pathlib import Path
 
 from django.conf import settings
 from .models import Document, DocumentChunk, Question, Answer, Citation
+from ._semantic_kernels import top_k_representative
 
 logger = logging.getLogger(__name__)
 
+# Texts encoded per model forward pass
+EMBEDDING_BATCH_SIZE = 64
+
+# Documents with more chunks than this are indexed with an approximate HNSW graph
+HNSW_MIN_VECTORS = 2000
+HNSW_NEIGHBORS = 32  # graph links per vector
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+HNSW_CACHE_DOCUMENTS = 8  # documents whose graphs are kept in memory
+
 class SemanticSearchEngine:
     """Semantic search engine using sentence transformers and FAISS."""
     
@@ -27,6 +40,9 @@ class SemanticSearchEngine:
         self.model = None
         self.index = None
         self.chunk_mapping = {}
+        # document_id -> (chunk ids, HNSW index) for large documents, least recently used first
+        self._hnsw_indexes: OrderedDict = OrderedDict()
+        self._hnsw_lock = threading.Lock()
         self.embedding_dim = 384  # Default for all-MiniLM-L6-v2
         
         # Initialize the model
@@ -43,11 +59,16 @@ class SemanticSearchEngine:
             logger.error(f"Error loading sentence transformer model: {e}")
             raise
     
-    def create_embeddings(self, texts: List[str]) -> np.ndarray:
+    def create_embeddings(self, texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE) -> np.ndarray:
         """Create embeddings for a list of texts."""
         try:
-            embeddings = self.model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
-            return embeddings
+            # No progress bar: tqdm writes to stderr on every batch. Embeddings are unit
+            # length, so inner products against them are cosine similarities
+            embeddings = self.model.encode(
+                texts, batch_size=batch_size, show_progress_bar=False,
+                convert_to_numpy=True, normalize_embeddings=True
+            )
+            return embeddings.astype(np.float32, copy=False)
         except Exception as e:
             logger.error(f"Error creating embeddings: {e}")
             raise
@@ -55,20 +76,30 @@ class SemanticSearchEngine:
     def chunk_text_semantic(self, text: str, max_chunk_size: int = 512, overlap: int = 50) -> List[str]:
         """Create semantic chunks from text with overlap."""
         try:
-            # Split text into sentences first
-            sentences = text.split('. ')
+            # Sentences end at each ". " separator. Instead of splitting and re-joining
+            # them, find where each chunk ends in the text and slice it out once
             chunks = []
-            current_chunk = ""
-            
-            for sentence in sentences:
-                # If adding this sentence would exceed max size, save current chunk
-                if len(current_chunk) + len(sentence) > max_chunk_size and current_chunk:
-                    chunks.append(current_chunk.strip())
-                    # Start new chunk with overlap
-                    overlap_text = current_chunk[-overlap:] if overlap > 0 else ""
-                    current_chunk = overlap_text + sentence + ". "
-                else:
-                    current_chunk += sentence + ". "
+            overlap_text = ""
+            start = 0
+            while True:
+                # Find the first sentence that ends past max_chunk_size; the chunk stops at
+                # the sentence before it, but always takes at least one sentence
+                limit = max_chunk_size - len(overlap_text) + start
+                overflow_end = text.find('. ', max(limit + 1, start))
+                if overflow_end == -1:
+                    overflow_end = len(text)
+                end = text.rfind('. ', start, overflow_end)
+                if end == -1 or overflow_end <= limit:
+                    end = overflow_end
+                
+                current_chunk = overlap_text + text[start:end] + ". "
+                if end == len(text):
+                    break
+                
+                chunks.append(current_chunk.strip())
+                # Start new chunk with overlap
+                overlap_text = current_chunk[-overlap:] if overlap > 0 else ""
+                start = end + 2
             
             # Add the last chunk if it exists
             if current_chunk.strip():
@@ -81,48 +112,72 @@ class SemanticSearchEngine:
     
     def process_document_chunks(self, document: Document) -> List[DocumentChunk]:
         """Process document and create semantic chunks with embeddings."""
+        return self.process_documents_chunks([document]).get(document.id, [])
+    
+    def process_documents_chunks(self, documents: List[Document]) -> Dict[Any, List[DocumentChunk]]:
+        """Create semantic chunks for several documents, embedding all of them in one batch."""
         try:
-            logger.info(f"Processing document chunks for: {document.title}")
-            
-            # Get document text from chunks or analysis
-            chunks = DocumentChunk.objects.filter(document=document)
-            if chunks.exists():
-                logger.info(f"Document already has {chunks.count()} chunks")
-                return list(chunks)
-            
-            # Get text from analysis
-            analysis = document.analyses.first()
-            if not analysis:
-                logger.warning(f"No analysis found for document: {document.title}")
-                return []
+            results = {}
+            pending = []
+            
+            for document in documents:
+                logger.info(f"Processing document chunks for: {document.title}")
+                
+                # Get document text from chunks or analysis
+                chunks = DocumentChunk.objects.filter(document=document)
+                if chunks.exists():
+                    logger.info(f"Document already has {chunks.count()} chunks")
+                    results[document.id] = list(chunks)
+                    continue
+                
+                # Get text from analysis
+                analysis = document.analyses.first()
+                if not analysis:
+                    logger.warning(f"No analysis found for document: {document.title}")
+                    results[document.id] = []
+                    continue
+                
+                # Get text from document chunks (from text processing)
+                text_chunks = analysis.documentchunk_set.all()
+                if not text_chunks.exists():
+                    logger.warning(f"No text chunks found for document: {document.title}")
+                    results[document.id] = []
+                    continue
+                
+                # Create semantic chunks
+                all_text = " ".join([chunk.chunk_text for chunk in text_chunks])
+                pending.append((document, self.chunk_text_semantic(all_text)))
+            
+            all_semantic_chunks = [chunk_text for _, semantic_chunks in pending for chunk_text in semantic_chunks]
+            if not all_semantic_chunks:
+                results.update((document.id, []) for document, _ in pending)
+                return results
+            
+            # Create embeddings for the chunks of every document in one call, so the
+            # model always runs full batches
+            embeddings = self.create_embeddings(all_semantic_chunks)
+            
+            offset = 0
+            for document, semantic_chunks in pending:
+                document_embeddings = embeddings[offset:offset + len(semantic_chunks)]
+                offset += len(semantic_chunks)
+                
+                # Create DocumentChunk objects
+                document_chunks = []
+                for i, (chunk_text, embedding) in enumerate(zip(semantic_chunks, document_embeddings)):
+                    chunk = DocumentChunk.objects.create(
+                        document=document,
+                        chunk_text=chunk_text,
+                        chunk_index=i,
+                        page_number=0,  # We'll update this later
+                        embedding=DocumentChunk.encode_embedding(embedding)
+                    )
+                    document_chunks.append(chunk)
+                
+                results[document.id] = document_chunks
+                logger.info(f"Created {len(document_chunks)} semantic chunks for document: {document.title}")
             
-            # Get text from document chunks (from text processing)
-            text_chunks = analysis.documentchunk_set.all()
-            if not text_chunks.exists():
-                logger.warning(f"No text chunks found for document: {document.title}")
-                return []
-            
-            # Create semantic chunks
-            all_text = " ".join([chunk.chunk_text for chunk in text_chunks])
-            semantic_chunks = self.chunk_text_semantic(all_text)
-            
-            # Create embeddings for chunks
-            embeddings = self.create_embeddings(semantic_chunks)
-            
-            # Create DocumentChunk objects
-            document_chunks = []
-            for i, (chunk_text, embedding) in enumerate(zip(semantic_chunks, embeddings)):
-                chunk = DocumentChunk.objects.create(
-                    document=document,
-                    chunk_text=chunk_text,
-                    chunk_index=i,
-                    page_number=0,  # We'll update this later
-                    embedding=embedding.tolist()
-                )
-                document_chunks.append(chunk)
-            
-            logger.info(f"Created {len(document_chunks)} semantic chunks for document: {document.title}")
-            return document_chunks
+            return results
             
         except Exception as e:
             logger.error(f"Error processing document chunks: {e}")
@@ -133,71 +188,73 @@ class SemanticSearchEngine:
         try:
             logger.info(f"Building search index for document: {document.title}")
             
-            # Get document chunks
-            chunks = DocumentChunk.objects.filter(document=document)
-            if not chunks.exists():
-                logger.warning(f"No chunks found for document: {document.title}")
-                return False
-            
-            # Extract embeddings
-            embeddings = []
-            chunk_ids = []
-            
-            for chunk in chunks:
-                if chunk.embedding:
-                    embeddings.append(chunk.embedding)
-                    chunk_ids.append(str(chunk.id))
-            
-            if not embeddings:
+            # Load all embeddings for the document as one (N, D) matrix
+            chunk_ids, embeddings_array = DocumentChunk.objects.embeddings_matrix(document.id)
+            if not chunk_ids:
                 logger.warning(f"No embeddings found for document: {document.title}")
                 return False
             
-            # Convert to numpy array
-            embeddings_array = np.array(embeddings, dtype=np.float32)
-            
             # Create FAISS index
-            index = faiss.IndexFlatIP(self.embedding_dim)  # Inner product for cosine similarity
+            index = faiss.IndexFlatIP(self.embedding_dim)  # Inner product of unit vectors is cosine similarity
             index.add(embeddings_array)
             
             # Store index and mapping
             self.index = index
             self.chunk_mapping = {i: chunk_id for i, chunk_id in enumerate(chunk_ids)}
             
-            logger.info(f"Built search index with {len(embeddings)} vectors for document: {document.title}")
+            logger.info(f"Built search index with {len(chunk_ids)} vectors for document: {document.title}")
             return True
             
         except Exception as e:
             logger.error(f"Error building search index: {e}")
             return False
     
-    def search_similar_chunks(self, query: str, document: Document, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Search for similar chunks in a document."""
+    def search_similar_chunks(self, query: str, document: Document, top_k: int = 5,
+                              query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Search for similar chunks in a document, reusing query_embedding if given."""
         try:
-            # Build index if not exists
-            if not self.index:
-                if not self.build_search_index(document):
-                    return []
+            chunk_ids, embeddings_matrix = DocumentChunk.objects.embeddings_matrix(document.id)
+            if not chunk_ids:
+                return []
             
             # Create query embedding
-            query_embedding = self.create_embeddings([query])
-            
-            # Search in FAISS index
-            scores, indices = self.index.search(query_embedding, min(top_k, self.index.ntotal))
+            if query_embedding is None:
+                query_embedding = self.create_embeddings([query])[0]
+            query_embedding = np.asarray(query_embedding, dtype=np.float32)
+            
+            if len(chunk_ids) > HNSW_MIN_VECTORS:
+                # Large documents: HNSW visits ~O(log N) vectors instead of scanning all of them
+                index = self._get_hnsw_index(document.id, chunk_ids, embeddings_matrix)
+                scores, indices = index.search(query_embedding.reshape(1, -1), min(top_k, len(chunk_ids)))
+                hits = [(chunk_ids[idx], float(score)) for idx, score in zip(indices[0], scores[0]) if idx >= 0]
+            else:
+                # Score every chunk with a single matrix-vector product
+                scores = embeddings_matrix @ query_embedding
+                k = min(top_k, len(chunk_ids))
+                # argpartition selects the top k in O(N); only those k get sorted
+                top_indices = np.argpartition(-scores, k - 1)[:k]
+                top_indices = top_indices[np.argsort(-scores[top_indices])]
+                hits = [(chunk_ids[idx], float(scores[idx])) for idx in top_indices]
+            
+            # One query for all hits, without the embedding column
+            chunks = DocumentChunk.objects.only(
+                'id', 'chunk_text', 'page_number', 'chunk_index'
+            ).in_bulk([chunk_id for chunk_id, _ in hits])
             
             # Get results
             results = []
-            for score, idx in zip(scores[0], indices[0]):
-                if idx in self.chunk_mapping:
-                    chunk_id = self.chunk_mapping[idx]
-                    chunk = DocumentChunk.objects.get(id=chunk_id)
-                    
-                    results.append({
-                        'chunk_id': str(chunk.id),
-                        'chunk_text': chunk.chunk_text,
-                        'page_number': chunk.page_number,
-                        'similarity_score': float(score),
-                        'chunk_index': chunk.chunk_index
-                    })
+            for chunk_id, score in hits:
+                chunk = chunks.get(uuid.UUID(chunk_id))
+                if chunk is None:
+                    continue
+                
+                results.append({
+                    'chunk_id': str(chunk.id),
+                    'chunk_text': chunk.chunk_text,
+                    'page_number': chunk.page_number,
+                    'similarity_score': score,
+                    'chunk_index': chunk.chunk_index
+                })
             
             return results
             
@@ -205,6 +262,28 @@ class SemanticSearchEngine:
             logger.error(f"Error searching similar chunks: {e}")
             return []
     
+    def _get_hnsw_index(self, document_id, chunk_ids: List[str], embeddings: np.ndarray):
+        """Return the HNSW index over a document's embeddings, building it on first use."""
+        with self._hnsw_lock:
+            cached = self._hnsw_indexes.get(document_id)
+            # Rows are tied to chunk ids, so a re-chunked document gets a new graph
+            if cached is not None and cached[0] == chunk_ids:
+                self._hnsw_indexes.move_to_end(document_id)
+                return cached[1]
+        
+        # Build outside the lock so searches on other documents are not held up
+        index = faiss.IndexHNSWFlat(self.embedding_dim, HNSW_NEIGHBORS, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        index.add(embeddings)
+        
+        with self._hnsw_lock:
+            self._hnsw_indexes[document_id] = (list(chunk_ids), index)
+            self._hnsw_indexes.move_to_end(document_id)
+            while len(self._hnsw_indexes) > HNSW_CACHE_DOCUMENTS:
+                self._hnsw_indexes.popitem(last=False)
+        return index
+    
     def answer_question(self, question_text: str, document: Document) -> Dict[str, Any]:
         """Answer a question using semantic search."""
         try:
@@ -278,12 +357,9 @@ class SemanticSearchEngine:
             # Create embeddings for all chunks
             embeddings = self.create_embeddings(chunk_texts)
             
-            # Calculate document embedding (mean of all chunk embeddings)
-            doc_embedding = np.mean(embeddings, axis=0)
-            
-            # Find most representative chunks (closest to document center)
-            similarities = cosine_similarity([doc_embedding], embeddings)[0]
-            top_indices = np.argsort(similarities)[-3:]  # Top 3 most representative
+            # Calculate document embedding (mean of all chunk embeddings) and find the
+            # most representative chunks (closest to document center) in one pass
+            doc_embedding, top_indices = top_k_representative(embeddings, 3)  # Top 3 most representative
             
             # Create summary from top chunks
             summary_chunks = [chunk_texts[i] for i in top_indices]
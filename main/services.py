@@ -10,11 +10,11 @@ from django.conf import settings
 from django.core.files.storage import default_storage
 from django.db import transaction
 
-from .models import Document, Analysis, DocumentChunk, UserSession, Clause, RedFlag
+from .models import Document, DocumentContent, Analysis, DocumentChunk, UserSession, Clause, RedFlag
 from .pdf_processor import PDFProcessor
 from .text_processor import TextProcessor, DocumentAnalyzer
 from .clause_detector import ClauseDetector, ClauseType, ImportanceLevel
-from .red_flag_detector import RedFlagDetector, RedFlagCategory, RiskLevel
+from .red_flag_detector import red_flag_detector, RedFlagCategory, RiskLevel
 from .cache_manager import CacheManager
 from .performance_monitor import monitor_performance, track_performance
 from .semantic_search import semantic_search_engine
@@ -521,13 +521,12 @@ class DocumentProcessingService:
             # Create chunks
             chunks = TextProcessor.split_into_chunks(cleaned_text)
             
-            # Initialize clause and red flag detectors
+            # Initialize clause detector, red flags use the shared detector
             clause_detector = ClauseDetector()
-            red_flag_detector = RedFlagDetector()
             
             # Detect clauses and red flags
             all_clauses = []
-            all_red_flags = []
+            red_flag_pages = []
             
             # Process each page for clauses and red flags
             for page_num, page_info in enumerate(result["pages"]):
@@ -537,9 +536,10 @@ class DocumentProcessingService:
                     detected_clauses = clause_detector.detect_clauses(page_text, page_num + 1)
                     all_clauses.extend(detected_clauses)
                     
-                    # Detect red flags
-                    detected_red_flags = red_flag_detector.detect_red_flags(page_text, page_num + 1)
-                    all_red_flags.extend(detected_red_flags)
+                    red_flag_pages.append((page_text, page_num + 1))
+            
+            # Detect red flags on all pages in parallel
+            all_red_flags = red_flag_detector.detect_red_flags_pages(red_flag_pages)
             
             # Save to database
             with transaction.atomic():
@@ -548,6 +548,12 @@ class DocumentProcessingService:
                 document.status = "processed"
                 document.save()
                 
+                # Store extracted text in its own table
+                DocumentContent.objects.update_or_create(
+                    document=document,
+                    defaults={"full_text": cleaned_text}
+                )
+                
                 # Create analysis record
                 analysis = Analysis.objects.create(
                     document=document,
@@ -571,7 +577,7 @@ class DocumentProcessingService:
                         chunk_index=i,
                         chunk_text=chunk_text,
                         page_number=0,  # Default page number
-                        embedding=embedding.tolist()
+                        embedding=DocumentChunk.encode_embedding(embedding)
                     )
                 
                 # Save detected clauses
@@ -595,7 +601,7 @@ class DocumentProcessingService:
                         document=document,
                         analysis=analysis,
                         category=detected_red_flag.category.value,
-                        risk_level=detected_red_flag.risk_level.value,
+                        risk_level=detected_red_flag.risk_level.label,
                         title=detected_red_flag.title,
                         description=detected_red_flag.description,
                         reason=detected_red_flag.reasoning,
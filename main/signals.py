@@ -0,0 +1,32 @@
+"""
+Signal handlers for the main app.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache_manager import record_popular_query
+from .models import Document, Question
+
+@receiver(post_save, sender=Question)
+def track_popular_question(sender, instance, created, **kwargs):
+    """Count newly asked questions towards the popular-queries ranking."""
+    if created:
+        record_popular_query(instance.question_text)
+
+@receiver(post_save, sender=Document)
+def invalidate_document_caches(sender, instance, **kwargs):
+    """Forget this process's cached answers and chunk ids for a document whenever it is saved (e.g. re-processed)."""
+    from .qa_service import qa_service
+    # Wait for the commit so the new chunks are visible when the cache is rebuilt. Other
+    # processes drop theirs when they see the document's new updated_at.
+    document_id = instance.id
+    transaction.on_commit(lambda: qa_service.invalidate_document_caches(document_id))
+
+@receiver(post_delete, sender=Document)
+def drop_document_caches(sender, instance, **kwargs):
+    """Free this process's cached answers for a deleted document."""
+    from .qa_service import qa_service
+    document_id = instance.id
+    transaction.on_commit(lambda: qa_service.invalidate_document_caches(document_id))
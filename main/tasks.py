@@ -0,0 +1,174 @@
+"""
+Background tasks for document processing and periodic performance optimization.
+Runs on Celery when a broker is configured, otherwise on an in-process thread pool
+so uploads never block the request thread on PDF extraction and OCR.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Document
+
+try:
+    from celery import shared_task
+except ImportError:  # Celery not installed - use the in-process executor
+    shared_task = None
+
+logger = logging.getLogger(__name__)
+
+# Fallback executor used when Celery is unavailable (tasks are CPU-heavy, keep it small)
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='document-processing')
+
+# Periodic optimization interval, matches CELERY_BEAT_SCHEDULE
+OPTIMIZATION_INTERVAL = 300  # seconds
+
+# In-process timer; runs every task when Celery beat is unavailable
+_optimization_timer = None
+_optimization_enabled = False
+_optimization_lock = threading.Lock()
+PERIODIC_OPTIMIZATION_DISPATCH_UID = 'main.tasks.start_periodic_optimization'
+
+def _task(func):
+    """Register func as a Celery task when Celery is installed."""
+    return shared_task(func) if shared_task is not None else func
+
+def _use_celery() -> bool:
+    """Check whether tasks should be dispatched to a Celery worker."""
+    return shared_task is not None and bool(getattr(settings, 'CELERY_BROKER_URL', ''))
+
+@_task
+def process_document_task(document_id: str) -> dict:
+    """Extract, analyze and index a document, tracking progress on Document.status."""
+    from .services import DocumentProcessingService
+
+    try:
+        updated = Document.objects.filter(pk=document_id).update(
+            status='processing',
+            processing_started=timezone.now(),
+            error_message=''
+        )
+        if not updated:
+            return {"error": "Document not found"}
+
+        result = DocumentProcessingService.process_document(document_id)
+
+        if result.get('success'):
+            Document.objects.filter(pk=document_id).update(processing_completed=timezone.now())
+        else:
+            Document.objects.filter(pk=document_id).update(
+                status='error',
+                processing_completed=timezone.now(),
+                error_message=result.get('error', 'Unknown error')
+            )
+
+        # Drop non-serializable values so the result can travel through a Celery backend
+        return {key: str(value) if key.endswith('_id') else value for key, value in result.items()}
+
+    except Exception as e:
+        logger.error(f"Error in background processing of document {document_id}: {e}")
+        Document.objects.filter(pk=document_id).update(status='error', error_message=str(e))
+        return {"error": str(e)}
+
+def _run_in_executor(document_id: str) -> None:
+    """Run the processing task on an executor thread and release its DB connection."""
+    try:
+        process_document_task(document_id)
+    finally:
+        # Each executor thread holds its own DB connection; close it after the task
+        connection.close()
+
+def enqueue_document_processing(document_id) -> None:
+    """Schedule background processing for a document and return immediately."""
+    document_id = str(document_id)
+    if _use_celery():
+        dispatch = lambda: process_document_task.delay(document_id)
+    else:
+        dispatch = lambda: _executor.submit(_run_in_executor, document_id)
+    # Wait for the Document row to be committed before a worker can pick it up
+    transaction.on_commit(dispatch)
+    logger.info(f"Queued document {document_id} for background processing")
+
+def _run_exclusive(name: str, func) -> bool:
+    """Run func unless another worker already ran it during this interval."""
+    # cache.add is an atomic SET NX, so with a shared cache only one worker wins each tick
+    if not cache.add(f"lock:{name}", True, timeout=OPTIMIZATION_INTERVAL - 10):
+        return False
+    func()
+    return True
+
+@_task
+def optimize_cache_task() -> bool:
+    """Check cache hit rates, re-size timeouts and preload frequently used data."""
+    from .performance_optimizer import performance_optimizer
+    return _run_exclusive('optimize_cache', performance_optimizer._optimize_cache)
+
+@_task
+def optimize_database_task() -> bool:
+    """Analyze slow queries and trim old Q&A data."""
+    from .performance_optimizer import performance_optimizer
+    return _run_exclusive('optimize_database', performance_optimizer._optimize_database)
+
+@_task
+def check_system_health_task() -> bool:
+    """Refresh memory, CPU and disk alerts."""
+    from .performance_optimizer import performance_optimizer
+    return _run_exclusive('check_system_health', performance_optimizer._check_system_health)
+
+def _run_periodic_optimization() -> None:
+    """Run one optimization tick on the timer thread and schedule the next."""
+    from .performance_optimizer import performance_optimizer
+    
+    # Request counts and slow queries are collected per process, so these passes
+    # always run here; Celery beat only takes over the shared tasks
+    performance_optimizer._optimize_process()
+    if not _use_celery():
+        for task in (optimize_cache_task, optimize_database_task, check_system_health_task):
+            try:
+                task()
+            except Exception as e:
+                logger.error(f"Error in periodic task {task.__name__}: {e}")
+    connection.close()
+    _schedule_periodic_optimization()
+
+def _schedule_periodic_optimization() -> None:
+    """Arm the timer for the next optimization tick."""
+    global _optimization_timer
+    with _optimization_lock:
+        if not _optimization_enabled:
+            return
+        _optimization_timer = threading.Timer(OPTIMIZATION_INTERVAL, _run_periodic_optimization)
+        _optimization_timer.daemon = True
+        _optimization_timer.start()
+
+def start_periodic_optimization() -> None:
+    """Start the in-process periodic optimization timer."""
+    global _optimization_enabled
+    if not getattr(settings, 'PERIODIC_OPTIMIZATION', True):
+        return
+    with _optimization_lock:
+        if _optimization_enabled:
+            return
+        _optimization_enabled = True
+    _schedule_periodic_optimization()
+    logger.info("Periodic performance optimization scheduled in-process")
+
+def start_periodic_optimization_on_request(sender, **kwargs) -> None:
+    """request_started receiver: start the timer in processes that serve requests."""
+    request_started.disconnect(dispatch_uid=PERIODIC_OPTIMIZATION_DISPATCH_UID)
+    start_periodic_optimization()
+
+def stop_periodic_optimization() -> None:
+    """Cancel the in-process optimization timer."""
+    global _optimization_timer, _optimization_enabled
+    with _optimization_lock:
+        _optimization_enabled = False
+        if _optimization_timer is not None:
+            _optimization_timer.cancel()
+            _optimization_timer = None
@@ -1,3 +1,304 @@
+"""
+Regression tests for the document processing hot paths.
+Each rewritten path is checked against the straightforward implementation it replaced.
+"""
+
+import dataclasses
+import importlib
+import itertools
+import random
+import re
+from unittest import mock
+
+import numpy as np
+from django.apps import apps
 from django.test import TestCase
 
-# Create your tests here.
+from . import red_flag_detector as red_flag_module
+from ._semantic_kernels import _top_k_representative_numpy, top_k_representative
+from .models import Document, DocumentChunk
+from .qa_service import SemanticAnswerCache, qa_service
+from .red_flag_detector import RedFlagDetector, _lowercase_pattern
+from .semantic_search import semantic_search_engine
+
+
+class RedFlagMatchingTestCase(TestCase):
+    """Test the combined red flag scan against one re.IGNORECASE search per pattern."""
+
+    PHRASES = [
+        'unlimited liability', 'Unlimited  Damages', 'liquidated damages shall exceed 20%',
+        'penalty of 5%', 'automatic renewal for 3 years', 'waiver of all rights',
+        'waive all claims', 'exclusive jurisdiction', 'immediate termination',
+        'terminate without notice', 'change terms unilaterally', 'assign without consent',
+        'perpetual license', 'non-compete unlimited', 'noncompete is unlimited',
+        'MOST FAVORED NATION', 'adverse publicity', 'no audit rights',
+    ]
+    # Characters where str and ASCII byte matching could disagree: Unicode case
+    # equivalents, non-ASCII digits and letters, and Unicode whitespace
+    FILLER = [
+        'the', 'party', 'shall', 'Agreement', '10%', '3 years', '.', ',', '\n', '\t', '\v',
+        '\x1c', '\x1f', ' ', 'LİABILITY', 'lıability', 'penalty of',
+        'waiver', 'ſhall', 'Key', '٣ years', 'été', 'ß', 'café',
+    ]
+
+    def setUp(self):
+        """Set up the detector and generated contract texts."""
+        self.detector = RedFlagDetector()
+        rng = random.Random(1234)
+        self.texts = [
+            ' '.join(
+                rng.choice(self.PHRASES) if rng.random() < 0.2 else rng.choice(self.FILLER)
+                for _ in range(rng.randint(0, 300))
+            )
+            for _ in range(200)
+        ]
+
+    def reference_spans(self, detector, text):
+        """Spans found by running each pattern over the text on its own."""
+        return [
+            [match.span() for match in re.finditer(pattern_info['pattern'], text, re.IGNORECASE)]
+            for _, pattern_info in detector._pattern_table
+        ]
+
+    def test_ascii_standin_codec(self):
+        """Test that non-ASCII characters encode to the ASCII class re treats them as."""
+        self.assertEqual('İıſK'.encode('ascii', 'red_flag_ascii'), b'iisk')
+        self.assertEqual('  '.encode('ascii', 'red_flag_ascii'), b'  ')
+        self.assertEqual('٣१'.encode('ascii', 'red_flag_ascii'), b'00')
+        self.assertEqual('éß中'.encode('ascii', 'red_flag_ascii'), b'___')
+        self.assertEqual('§—'.encode('ascii', 'red_flag_ascii'), b'##')
+        self.assertEqual('Penalty § 5'.encode('ascii', 'red_flag_ascii'), b'Penalty # 5')
+
+    def test_lowercase_pattern_keeps_escapes(self):
+        """Test that pattern letters are lowercased but escapes are not."""
+        self.assertEqual(_lowercase_pattern(r'\bMFN\S+\D'), r'\bmfn\S+\D')
+        self.assertEqual(_lowercase_pattern(r'\\N'), r'\\n')
+
+    def test_matches_equal_per_pattern_search(self):
+        """Test that the combined scan finds exactly the spans each pattern finds."""
+        for text in self.texts:
+            self.assertEqual(
+                self.detector._find_pattern_matches(text),
+                self.reference_spans(self.detector, text)
+            )
+
+    def test_detected_flags_equal_per_pattern_search(self):
+        """Test that detected red flags cover exactly the per-pattern matches."""
+        for text in self.texts[:50]:
+            expected = sorted(
+                (category.value, pattern_info['title'], start, end)
+                for (category, pattern_info), spans in zip(
+                    self.detector._pattern_table, self.reference_spans(self.detector, text)
+                )
+                for start, end in spans
+            )
+            flags = self.detector.detect_red_flags(text, page_number=3)
+            self.assertEqual(
+                sorted((flag.category.value, flag.title, flag.start_pos, flag.end_pos) for flag in flags),
+                expected
+            )
+            for flag in flags:
+                self.assertEqual(flag.text, text[flag.start_pos:flag.end_pos])
+                self.assertEqual(flag.page_number, 3)
+
+    def test_cached_flags_are_immutable(self):
+        """Test that flags served from the detection cache cannot be changed by a caller."""
+        flags = self.detector.detect_red_flags('The party has unlimited liability.')
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            flags[0].risk_level = red_flag_module.RiskLevel.LOW
+        self.assertIs(self.detector.detect_red_flags('The party has unlimited liability.')[0], flags[0])
+
+    def test_fallback_engines_match(self):
+        """Test that the re fallback finds the same flags as the installed engines."""
+        with mock.patch.multiple(red_flag_module, re2=None, regex=None, hyperscan=None, ahocorasick=None), \
+                mock.patch.dict(red_flag_module._COMPILED_MATCHERS, clear=True):
+            fallback = RedFlagDetector()
+
+        for text in self.texts[:50]:
+            self.assertEqual(fallback._find_pattern_matches(text), self.detector._find_pattern_matches(text))
+            self.assertEqual(
+                [(flag.title, flag.start_pos, flag.risk_level, flag.confidence) for flag in fallback.detect_red_flags(text)],
+                [(flag.title, flag.start_pos, flag.risk_level, flag.confidence) for flag in self.detector.detect_red_flags(text)]
+            )
+
+
+def reference_chunk_text(text, max_chunk_size=512, overlap=50):
+    """Original split-and-join implementation of chunk_text_semantic."""
+    sentences = text.split('. ')
+    chunks = []
+    current_chunk = ""
+    for sentence in sentences:
+        if len(current_chunk) + len(sentence) > max_chunk_size and current_chunk:
+            chunks.append(current_chunk.strip())
+            overlap_text = current_chunk[-overlap:] if overlap > 0 else ""
+            current_chunk = overlap_text + sentence + ". "
+        else:
+            current_chunk += sentence + ". "
+    if current_chunk.strip():
+        chunks.append(current_chunk.strip())
+    return chunks
+
+class SemanticChunkingTestCase(TestCase):
+    """Test chunk_text_semantic against the original split-and-join loop."""
+
+    def test_chunks_equal_reference(self):
+        """Test generated texts across chunk sizes and overlaps, including degenerate ones."""
+        rng = random.Random(7)
+        tokens = ['a', 'bb', 'word', ' ', '. ', '.', '  ', '\n', 'longer sentence here']
+        for _ in range(2000):
+            text = ''.join(rng.choice(tokens) for _ in range(rng.randint(0, 400)))
+            max_chunk_size = rng.choice([0, 1, 5, 20, 50, 512])
+            overlap = rng.choice([-1, 0, 1, 10, 50, 100])
+            self.assertEqual(
+                semantic_search_engine.chunk_text_semantic(text, max_chunk_size, overlap),
+                reference_chunk_text(text, max_chunk_size, overlap)
+            )
+
+    def test_default_arguments(self):
+        """Test a document-sized text with the default chunk size and overlap."""
+        text = 'This is a sentence of moderate length. ' * 500
+        self.assertEqual(semantic_search_engine.chunk_text_semantic(text), reference_chunk_text(text))
+        self.assertEqual(semantic_search_engine.chunk_text_semantic(''), reference_chunk_text(''))
+
+
+class RepresentativeChunksTestCase(TestCase):
+    """Test the representative chunk kernel against a NumPy argsort."""
+
+    def test_top_k_matches_argsort(self):
+        """Test that the kernel returns the mean and the k most central rows, least similar first."""
+        rng = np.random.default_rng(0)
+        for rows, k in [(1, 5), (5, 5), (40, 5), (300, 10), (1000, 1)]:
+            embeddings = rng.standard_normal((rows, 384)).astype(np.float32)
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+            doc_embedding, indices = top_k_representative(embeddings, k)
+            expected_embedding, expected_indices = _top_k_representative_numpy(embeddings, k)
+
+            np.testing.assert_allclose(doc_embedding, expected_embedding, rtol=1e-4, atol=1e-6)
+            self.assertEqual(list(indices), list(expected_indices))
+
+    def test_accepts_non_contiguous_float64(self):
+        """Test that other dtypes and layouts give the same result."""
+        rng = np.random.default_rng(1)
+        embeddings = rng.standard_normal((384, 50)).T
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        _, indices = top_k_representative(embeddings, 5)
+        _, expected = _top_k_representative_numpy(embeddings.astype(np.float32), 5)
+        self.assertEqual(list(indices), list(expected))
+
+
+class Float16EmbeddingMigrationTestCase(TestCase):
+    """Test the data migration that stores chunk embeddings as float16."""
+
+    def setUp(self):
+        """Set up a chunk with a float32 embedding and one without an embedding."""
+        self.migration = importlib.import_module('main.migrations.0011_documentchunk_float16_embedding')
+        self.document = Document.objects.create(title='Contract', file_size=1)
+        self.vector = np.linspace(-1, 1, 384).astype(np.float32)
+        self.chunk = DocumentChunk.objects.create(
+            document=self.document, chunk_text='Text', chunk_index=0, page_number=1,
+            embedding=self.vector.tobytes()
+        )
+        self.empty_chunk = DocumentChunk.objects.create(
+            document=self.document, chunk_text='Empty', chunk_index=1, page_number=1
+        )
+
+    def test_forward_converts_to_float16(self):
+        """Test that embeddings are halved in size and read back unchanged."""
+        self.migration.float32_to_float16(apps, None)
+        self.chunk.refresh_from_db()
+        self.assertEqual(len(bytes(self.chunk.embedding)), self.vector.size * 2)
+        np.testing.assert_allclose(self.chunk.get_embedding(), self.vector, atol=1e-3)
+
+        chunk_ids, embeddings = DocumentChunk.objects.embeddings_matrix(self.document.id)
+        self.assertEqual([str(chunk_id) for chunk_id in chunk_ids], [str(self.chunk.id)])
+        self.assertEqual(embeddings.shape, (1, 384))
+
+    def test_empty_embedding_untouched(self):
+        """Test that chunks without an embedding are skipped."""
+        self.migration.float32_to_float16(apps, None)
+        self.empty_chunk.refresh_from_db()
+        self.assertEqual(bytes(self.empty_chunk.embedding), b'')
+
+    def test_reverse_restores_float32(self):
+        """Test that reversing the migration restores float32 bytes."""
+        self.migration.float32_to_float16(apps, None)
+        self.migration.float16_to_float32(apps, None)
+        self.chunk.refresh_from_db()
+        restored = np.frombuffer(self.chunk.embedding, dtype=np.float32)
+        np.testing.assert_allclose(restored, self.vector, atol=1e-3)
+
+
+class SemanticAnswerCacheTestCase(TestCase):
+    """Test cases for the embedding similarity answer cache."""
+
+    def setUp(self):
+        """Set up a cache and unit-length question embeddings."""
+        self.cache = SemanticAnswerCache(threshold=0.92, max_entries=2, ttl=3600)
+        rng = np.random.default_rng(2)
+        self.embeddings = [SemanticAnswerCache.normalize(rng.standard_normal(384)) for _ in range(3)]
+
+    def test_same_question_hits(self):
+        """Test that an identical or near-identical question returns the cached answer."""
+        self.cache.set('doc', 1, self.embeddings[0], {'answer': 'A'})
+        self.assertEqual(self.cache.get('doc', 1, self.embeddings[0]), {'answer': 'A'})
+
+        nearby = SemanticAnswerCache.normalize(self.embeddings[0] + 0.05 * self.embeddings[1])
+        self.assertEqual(self.cache.get('doc', 1, nearby), {'answer': 'A'})
+
+    def test_different_question_misses(self):
+        """Test that dissimilar questions and other documents are not served."""
+        self.cache.set('doc', 1, self.embeddings[0], {'answer': 'A'})
+        self.assertIsNone(self.cache.get('doc', 1, self.embeddings[1]))
+        self.assertIsNone(self.cache.get('other', 1, self.embeddings[0]))
+
+    def test_version_change_drops_answers(self):
+        """Test that answers cached for an older document version are never served."""
+        self.cache.set('doc', 1, self.embeddings[0], {'answer': 'A'})
+        self.assertIsNone(self.cache.get('doc', 2, self.embeddings[0]))
+        self.assertIsNone(self.cache.get('doc', 1, self.embeddings[0]))
+
+        self.cache.set('doc', 2, self.embeddings[0], {'answer': 'B'})
+        self.assertEqual(self.cache.get('doc', 2, self.embeddings[0]), {'answer': 'B'})
+
+    def test_expired_answers_not_served(self):
+        """Test that answers older than the TTL are dropped."""
+        clock = itertools.count(1000.0, 10.0)
+        self.cache.ttl = 15
+        with mock.patch('main.qa_service.time.time', side_effect=lambda: next(clock)):
+            self.cache.set('doc', 1, self.embeddings[0], {'answer': 'A'})
+            self.assertEqual(self.cache.get('doc', 1, self.embeddings[0]), {'answer': 'A'})
+            self.assertIsNone(self.cache.get('doc', 1, self.embeddings[0]))
+
+    def test_least_recently_used_evicted(self):
+        """Test that a full cache replaces the answer used longest ago."""
+        clock = itertools.count(1000.0, 1.0)
+        with mock.patch('main.qa_service.time.time', side_effect=lambda: next(clock)):
+            self.cache.set('doc', 1, self.embeddings[0], {'answer': 'A'})
+            self.cache.set('doc', 1, self.embeddings[1], {'answer': 'B'})
+            self.cache.get('doc', 1, self.embeddings[0])
+            self.cache.set('doc', 1, self.embeddings[2], {'answer': 'C'})
+
+            self.assertEqual(self.cache.get('doc', 1, self.embeddings[0]), {'answer': 'A'})
+            self.assertIsNone(self.cache.get('doc', 1, self.embeddings[1]))
+            self.assertEqual(self.cache.get('doc', 1, self.embeddings[2]), {'answer': 'C'})
+
+    def test_least_recently_used_document_evicted(self):
+        """Test that the cache holds answers for at most max_documents documents."""
+        self.cache.max_documents = 2
+        self.cache.set('first', 1, self.embeddings[0], {'answer': 'A'})
+        self.cache.set('second', 1, self.embeddings[0], {'answer': 'B'})
+        self.cache.get('first', 1, self.embeddings[0])
+        self.cache.set('third', 1, self.embeddings[0], {'answer': 'C'})
+
+        self.assertEqual(self.cache.get('first', 1, self.embeddings[0]), {'answer': 'A'})
+        self.assertIsNone(self.cache.get('second', 1, self.embeddings[0]))
+        self.assertEqual(self.cache.get('third', 1, self.embeddings[0]), {'answer': 'C'})
+
+    def test_deleted_document_dropped(self):
+        """Test that deleting a document frees its cached answers."""
+        document = Document.objects.create(title='Contract', file_size=1)
+        qa_service.semantic_cache.set(document.id, 1, self.embeddings[0], {'answer': 'A'})
+        with self.captureOnCommitCallbacks(execute=True):
+            document.delete()
+        self.assertIsNone(qa_service.semantic_cache.get(document.id, 1, self.embeddings[0]))
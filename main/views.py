@@ -21,6 +21,7 @@ from .enhanced_qa_service import enhanced_qa_service
 from .advanced_semantic_search import advanced_semantic_search_engine
 from .performance_optimizer import performance_optimizer
 from .security import security_validator
+from .tasks import enqueue_document_processing
 
 logger = logging.getLogger(__name__)
 
@@ -95,13 +96,9 @@ def upload_document(request):
                 document.status = 'uploaded'
                 document.save()
                 
-                # Process document in background (for now, we'll do it synchronously)
-                processing_result = DocumentProcessingService.process_document(document.id)
-                
-                if processing_result.get('success'):
-                    messages.success(request, f'Document "{document.title}" uploaded and processed successfully!')
-                else:
-                    messages.warning(request, f'Document uploaded but processing failed: {processing_result.get("error")}')
+                # Process document in background so the request returns immediately
+                enqueue_document_processing(document.id)
+                messages.success(request, f'Document "{document.title}" uploaded successfully! Analysis is running in the background.')
                 
                 return redirect('main:document_detail', document_id=document.id)
                 
@@ -124,6 +121,18 @@ def document_detail(request, document_id):
         analysis_data = DocumentProcessingService.get_document_analysis(document_id)
         
         if 'error' in analysis_data:
+            # Analysis is written by the background task - show the processing state until then
+            document = Document.objects.filter(id=document_id).first()
+            if document and document.status in ('uploaded', 'processing', 'error'):
+                context = {
+                    'document': document,
+                    'analysis': None,
+                    'chunks': [],
+                    'clauses': [],
+                    'red_flags': [],
+                }
+                return render(request, 'main/document_detail_enhanced.html', context)
+            
             messages.error(request, analysis_data['error'])
             return redirect('main:home')
         
@@ -190,14 +199,10 @@ def upload_progress(request):
         }, status=400)
 
 def process_document(request, document_id):
-    """Process a document manually."""
+    """Queue a document for manual (re)processing."""
     try:
-        result = DocumentProcessingService.process_document(document_id)
-        
-        if result.get('success'):
-            messages.success(request, 'Document processed successfully!')
-        else:
-            messages.error(request, f'Processing failed: {result.get("error")}')
+        enqueue_document_processing(document_id)
+        messages.info(request, 'Document queued for processing.')
             
     except Exception as e:
         logger.error(f"Error processing document {document_id}: {e}")
@@ -18,7 +18,7 @@ from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db import connection, reset_queries
 
-from .models import Document, DocumentChunk, Question, Answer, Citation, Analysis
+from .models import Document, DocumentContent, DocumentChunk, Question, Answer, Citation, Analysis
 from .advanced_semantic_search import advanced_semantic_search_engine
 from .performance_optimizer import performance_optimizer
 from .enhanced_qa_service import enhanced_qa_service
@@ -44,13 +44,16 @@ class Week12AdvancedFeaturesTest(TestCase):
             file=SimpleUploadedFile('test.pdf', b'fake pdf content'),
             uploaded_by=self.user,
             status='processed',
-            extracted_text='This is a test legal contract. It contains important terms and conditions. '
-                          'The parties agree to the following terms: 1. Payment terms are net 30 days. '
-                          '2. Delivery must be completed within 60 days. 3. Force majeure clause applies. '
-                          '4. Governing law is the state of California. 5. Dispute resolution through arbitration.',
             word_count=50,
             page_count=2
         )
+        DocumentContent.objects.create(
+            document=self.document,
+            full_text='This is a test legal contract. It contains important terms and conditions. '
+                      'The parties agree to the following terms: 1. Payment terms are net 30 days. '
+                      '2. Delivery must be completed within 60 days. 3. Force majeure clause applies. '
+                      '4. Governing law is the state of California. 5. Dispute resolution through arbitration.'
+        )
         
         # Create document analysis
         self.analysis = Analysis.objects.create(
@@ -524,8 +527,11 @@ class Week12EndToEndTest(TestCase):
             # Step 2: Wait for processing (simulate)
             document = Document.objects.latest('created_at')
             document.status = 'processed'
-            document.extracted_text = 'This is a test contract with payment terms of net 30 days.'
             document.save()
+            DocumentContent.objects.update_or_create(
+                document=document,
+                defaults={'full_text': 'This is a test contract with payment terms of net 30 days.'}
+            )
             
             # Step 3: Access document detail
             response = self.client.get(reverse('document_detail', args=[document.id]))
@@ -0,0 +1,22 @@
+"""
+Celery application for the pdf_reader project.
+Celery is optional - when it is not installed (or no broker is configured)
+background tasks run on an in-process executor instead (see main/tasks.py).
+"""
+
+import os
+
+try:
+    from celery import Celery
+except ImportError:  # Celery not installed - tasks fall back to in-process execution
+    Celery = None
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pdf_reader.settings')
+
+app = None
+
+if Celery is not None:
+    app = Celery('pdf_reader')
+    # Read all CELERY_* settings from Django settings
+    app.config_from_object('django.conf:settings', namespace='CELERY')
+    app.autodiscover_tasks()
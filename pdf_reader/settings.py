@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from decouple import config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -89,6 +90,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'main.middleware.SlowQueryMiddleware',
 ]
 
 ROOT_URLCONF = 'pdf_reader.urls'
@@ -176,6 +178,82 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Celery Configuration (background document processing)
+# Leave CELERY_BROKER_URL empty to run tasks on an in-process executor
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='')
+CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='')
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1  # OCR tasks are CPU-heavy, take one at a time
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_ACCEPT_CONTENT = ['json']
+
+# Periodic performance optimization. The shared tasks below run on `celery beat`,
+# in-process otherwise; every server process also sizes its own cache timeouts and
+# analyzes its slow queries on an in-process timer started by its first request.
+PERIODIC_OPTIMIZATION = (
+    config('PERIODIC_OPTIMIZATION', default='True').lower() == 'true'
+    and sys.argv[1:2] != ['test']
+)
+CELERY_BEAT_SCHEDULE = {
+    'optimize-cache': {
+        'task': 'main.tasks.optimize_cache_task',
+        'schedule': 300.0,
+    },
+    'optimize-database': {
+        'task': 'main.tasks.optimize_database_task',
+        'schedule': 300.0,
+    },
+    'check-system-health': {
+        'task': 'main.tasks.check_system_health_task',
+        'schedule': 300.0,
+    },
+}
+
+# Cache Configuration
+# Set REDIS_URL to use Redis (requires django-redis). Eviction is left to Redis itself,
+# configure the server with:
+#   maxmemory 1gb
+#   maxmemory-policy allkeys-lfu
+# The 'preload' cache holds speculative background preloads apart from the interactive
+# cache, with a short timeout so unread preloads expire instead of evicting hot entries.
+REDIS_URL = config('REDIS_URL', default='')
+REDIS_PRELOAD_URL = config('REDIS_PRELOAD_URL', default=REDIS_URL)
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'hot',
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        },
+        'preload': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_PRELOAD_URL,
+            'KEY_PREFIX': 'warm:preload',
+            'TIMEOUT': 300,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                # Preloads are plain dicts/strings; msgpack is faster and smaller than pickle
+                'SERIALIZER': 'django_redis.serializers.msgpack.MSGPackSerializer',
+            },
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'pdf-reader-cache',
+        },
+        'preload': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'pdf-reader-preload',
+            'TIMEOUT': 300,
+        },
+    }
+
 # Logging configuration
 LOGGING = {
     'version': 1,